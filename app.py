@@ -1,6 +1,11 @@
+import time
+_T_START = time.perf_counter()
+
 import streamlit as st
-import pandas as pd
-from src import data_loader, stats_engine
+from src import data_loader
+
+# pandas e stats_engine vengono importati solo quando servono (calcolo / tabelle):
+# la prima pagina usa gli indici leggeri dello snapshot.
 
 # --- NEWS EFFECTS (copiato da dashboard.py) ---
 NEWS_EFFECTS = {
@@ -16,48 +21,201 @@ NEWS_EFFECTS = {
 }
 
 # --- CACHE DATI ---
-@st.cache_data
+@st.cache_resource(max_entries=1)
+def _load_snapshot(version):
+    # Snapshot precompilato (una sola lettura), condiviso tra le sessioni
+    return data_loader.load_snapshot()
+
+def load_snapshot():
+    # Chiave = mtime del file: uno snapshot ricostruito dallo scheduler viene ripreso senza riavvii
+    return _load_snapshot(data_loader.snapshot_version())
+
 def load_data():
-    return data_loader.load_all_data()
+    # DataFrame completo: decodificato dallo snapshot solo al primo calcolo
+    return data_loader.snapshot_dataframe(load_snapshot())
+
+def load_engine_index():
+    # Indice numpy del motore batch (precalcolato nello snapshot)
+    return data_loader.snapshot_engine_index(load_snapshot())
+
+def load_elo():
+    # Rating Elo di tutte le squadre (calcolati una volta con lo snapshot)
+    return data_loader.snapshot_elo(load_snapshot())
+
+@st.cache_resource
+def enable_market_grid():
+    # Griglia Dixon-Coles mappata in memoria (al primo calcolo, come stats_engine):
+    # i mercati dei match si prezzano con una lookup
+    from src import dc_grid
+    return dc_grid.enable()
+
+@st.cache_resource
+def odds_prefetcher():
+    # Cache condivisa delle quote bookmaker, riempita in background (vedi src/odds_prefetch.py)
+    from src.odds_prefetch import OddsPrefetcher
+    return OddsPrefetcher()
+
+def prefetch_odds(league, season, fixtures):
+    # Non blocca: il download parte in un thread, la pagina mostra solo lo stato
+    # Budget della sessione passato al job: il prefetcher è condiviso e non va modificato
+    prefetcher = odds_prefetcher()
+    prefetcher.prefetch(league, season, fixtures, credit_budget=st.session_state.get("odds_credit_budget"))
+    state, n_ready = prefetcher.status(league, season)
+    labels = {"running": "in download...", "ready": "pronte", "error": "non disponibili", "idle": ""}
+    st.caption(f"📡 Quote bookmaker {labels[state]} ({n_ready} match)")
 
-df = load_data()
+@st.cache_data(max_entries=1)
+def _load_upcoming(version):
+    from src import scheduler
+    return scheduler.load_upcoming_predictions()
+
+def load_upcoming():
+    # Previsioni precalcolate dallo scheduler; chiave = mtime del file, come per lo snapshot
+    import os
+    from src import scheduler
+    path = scheduler.PREDICTIONS_FILE
+    return _load_upcoming(os.path.getmtime(path) if os.path.exists(path) else 0.0)
+
+@st.cache_data(ttl=3600)
+def load_api_fixtures(league, season):
+    from src.api_football import FootballAPI
+    return FootballAPI().get_fixtures(league, season)
+
+snapshot = load_snapshot()
 
 st.title("📊 Strategia Calcio – Match Analyzer")
 
 # --- SELEZIONE LEGA / STAGIONE / MATCH ---
-if df.empty:
+if not snapshot["leagues"]:
     st.error("Nessun dato disponibile. Controlla il download CSV.")
     st.stop()
 
-leagues = sorted(df["League"].unique().tolist())
+leagues = snapshot["leagues"]
 sel_league = st.selectbox("Lega", leagues)
 
-df_league = df[df["League"] == sel_league]
-
-seasons = sorted(df_league["Season"].unique().tolist(), reverse=True)
+seasons = snapshot["seasons"][sel_league]
 sel_season = st.selectbox("Stagione", seasons)
 
-df_ls = df_league[df_league["Season"] == sel_season].sort_values(
-    "Date", ascending=False
-)
+# Match della lega/stagione, dal più recente: dict con 'label', 'date', 'home', 'away'
+matches = snapshot["matches"].get((sel_league, sel_season), [])
 
-if df_ls.empty:
+if not matches:
     st.warning("Nessun match trovato per questa combinazione.")
     st.stop()
 
-# Costruiamo mappa etichetta -> riga
-options = []
-label_to_row = {}
-for _, row in df_ls.iterrows():
-    dt_str = row["Date"].strftime("%Y-%m-%d")
-    label = f"{dt_str} | {row['HomeTeam']} vs {row['AwayTeam']}"
-    options.append(label)
-    label_to_row[label] = row
+st.sidebar.number_input(
+    "Budget crediti API (prefetch quote)", min_value=0, max_value=100, value=10, step=1, key="odds_credit_budget",
+    help="Crediti spendibili per scaricare in anticipo le quote dei match elencati (per lega/stagione)",
+)
+
+# --- MODALITÀ: MATCH SINGOLO / SLATE GIORNATA ---
+mode = st.radio("Modalità", ["Match Singolo", "Slate Giornata"], horizontal=True)
+
+# --- TEMPO DI AVVIO (prima pagina interattiva della sessione) ---
+if "startup_ms" not in st.session_state:
+    st.session_state["startup_ms"] = (time.perf_counter() - _T_START) * 1000
+    print(f"⏱️ Prima pagina pronta in {st.session_state['startup_ms']:.0f} ms")
+st.caption(f"⏱️ Prima pagina pronta in {st.session_state['startup_ms']:.0f} ms")
+
+if mode == "Slate Giornata":
+    st.subheader("🗓️ Slate Giornata")
+    source = st.radio("Selezione partite", ["Intervallo Date", "Giornata API-Football"], horizontal=True)
+
+    fixtures = []
+    if source == "Intervallo Date":
+        import datetime
+        last_day = datetime.date.fromisoformat(matches[0]["date"])
+        first_day = datetime.date.fromisoformat(matches[-1]["date"])
+        date_range = st.date_input(
+            "Intervallo date",
+            value=(max(first_day, last_day - datetime.timedelta(days=7)), last_day),
+            min_value=first_day,
+            max_value=last_day,
+        )
+        if len(date_range) == 2:
+            d_from, d_to = date_range[0].isoformat(), date_range[1].isoformat()
+            fixtures = [
+                {"date": m["date"], "home": m["home"], "away": m["away"]}
+                for m in reversed(matches) if d_from <= m["date"] <= d_to
+            ]
+    else:
+        api_fixtures = load_api_fixtures(sel_league, sel_season)
+        if not api_fixtures:
+            st.warning("Nessun calendario disponibile da API-Football per questa lega.")
+        else:
+            rounds = list(dict.fromkeys(m["round"] for m in api_fixtures))
+            sel_round = st.selectbox("Giornata", rounds)
+            # Nomi API -> nomi dei CSV (gli unici che il motore conosce)
+            from src import team_names
+            fixtures = team_names.resolve_fixtures(
+                [{"date": m["date"], "home": m["home"], "away": m["away"], "id": m["id"]}
+                 for m in api_fixtures if m["round"] == sel_round],
+                team_names.snapshot_teams(snapshot, sel_league),
+            )
+
+    st.caption(f"{len(fixtures)} partite nello slate.")
+    if fixtures:
+        prefetch_odds(sel_league, sel_season, fixtures)
+
+    if fixtures and st.button("🚀 Prezza Slate"):
+        import pandas as pd
+        from src import scheduler
+        from src.cli import results_to_frame
+
+        # Partite già prezzate dallo scheduler sullo stesso snapshot: lette dal parquet, non ricalcolate
+        cached = scheduler.cached_predictions(load_upcoming(), [fx["id"] for fx in fixtures if "id" in fx],
+                                              snapshot["built_at"])
+        missing = [fx for fx in fixtures if fx.get("id") not in cached]
+        priced = []
+        if missing:
+            from src import stats_engine
+            enable_market_grid()
+            with st.spinner("Calcolo slate in corso..."):
+                results = stats_engine.calculate_slate_predictions(load_data(), missing, load_engine_index(),
+                                                                   elo=load_elo())
+            priced = results_to_frame(missing, results).to_dict("records")
+        if cached:
+            st.caption(f"⚡ {len(cached)} partite dalle previsioni precalcolate.")
+
+        rows = []
+        for fx in fixtures:
+            rec = cached[fx["id"]] if fx.get("id") in cached else priced.pop(0)
+            row = {"Data": rec["date"], "Casa": rec["home"], "Ospite": rec["away"]}
+            if isinstance(rec.get("error"), str):
+                row["Note"] = rec["error"]
+            else:
+                row.update({
+                    "xG Casa": rec["xg_home"],
+                    "xG Ospite": rec["xg_away"],
+                    "1": rec["odd_1"],
+                    "X": rec["odd_X"],
+                    "2": rec["odd_2"],
+                    "GG": rec["odd_Gol"],
+                    "O2.5": rec["odd_Over2.5"],
+                    "Top Score": rec["top_score"],
+                    "Elo Casa": rec.get("elo_home"),
+                    "Elo Ospite": rec.get("elo_away"),
+                    "Note": "",
+                })
+                book = odds_prefetcher().lookup(sel_league, sel_season, rec["date"], rec["home"], rec["away"])
+                if book:
+                    row.update({f"Book {m}": book.get(m) for m in ("1", "X", "2")})
+            rows.append(row)
+
+        # st.dataframe è ordinabile cliccando sulle intestazioni delle colonne
+        st.dataframe(pd.DataFrame(rows), hide_index=True)
+
+    st.stop()
+
+# Mappa etichetta -> match (precalcolata nello snapshot)
+label_to_match = {m["label"]: m for m in matches}
+options = list(label_to_match)
 
 sel_match_label = st.selectbox("Match", options)
-match_row = label_to_row[sel_match_label]
+match_row = label_to_match[sel_match_label]
 
 st.markdown(f"**Match selezionato:** {sel_match_label}")
+prefetch_odds(sel_league, sel_season, matches)
 
 # --- NEWS HOME / AWAY ---
 st.subheader("📰 Pannello News (Delta Manuali)")
@@ -75,16 +233,21 @@ with col2:
     news_def_away = st.selectbox("News Difesa Ospite", list(NEWS_EFFECTS.keys()), key="nda")
 
 if st.button("🚀 Avvia Analisi"):
+    import pandas as pd
+    from src import stats_engine
+    enable_market_grid()
+
     with st.spinner("Calcolo in corso..."):
         res = stats_engine.calculate_match_prediction(
-            df,
-            date_match=match_row["Date"].strftime("%Y-%m-%d"),
-            home_team=match_row["HomeTeam"],
-            away_team=match_row["AwayTeam"],
+            load_data(),
+            date_match=match_row["date"],
+            home_team=match_row["home"],
+            away_team=match_row["away"],
             delta_att_home=NEWS_EFFECTS[news_att_home]["att"],
             delta_def_home=NEWS_EFFECTS[news_def_home]["def"],
             delta_att_away=NEWS_EFFECTS[news_att_away]["att"],
             delta_def_away=NEWS_EFFECTS[news_def_away]["def"],
+            elo=load_elo(),
         )
 
     if "error" in res:
@@ -108,16 +271,27 @@ if st.button("🚀 Avvia Analisi"):
         def_eval = lambda v: "FORTE" if v < 1.0 else "DEBOLE"
         att_eval = lambda v: "FORTE" if v > 1.0 else "DEBOLE"
 
-        df_forze = pd.DataFrame(
-            [
-                ["Attacco CASA", ts["home_raw_att"], att_eval(ts["home_raw_att"])],
-                ["Difesa CASA", ts["home_raw_def"], def_eval(ts["home_raw_def"])],
-                ["Attacco OSPITE", ts["away_raw_att"], att_eval(ts["away_raw_att"])],
-                ["Difesa OSPITE", ts["away_raw_def"], def_eval(ts["away_raw_def"])],
-            ],
-            columns=["Parametro", "Valore Raw", "Valutazione"],
-        )
+        forze = [
+            ["Attacco CASA", ts["home_raw_att"], att_eval(ts["home_raw_att"])],
+            ["Difesa CASA", ts["home_raw_def"], def_eval(ts["home_raw_def"])],
+            ["Attacco OSPITE", ts["away_raw_att"], att_eval(ts["away_raw_att"])],
+            ["Difesa OSPITE", ts["away_raw_def"], def_eval(ts["away_raw_def"])],
+        ]
+        elo = res.get("elo")
+        if elo:
+            from src.elo import ELO_START
+            elo_eval = lambda v: "FORTE" if v > ELO_START else "DEBOLE"
+            forze += [
+                ["Elo CASA", elo["home"], elo_eval(elo["home"])],
+                ["Elo OSPITE", elo["away"], elo_eval(elo["away"])],
+            ]
+        df_forze = pd.DataFrame(forze, columns=["Parametro", "Valore Raw", "Valutazione"])
         st.dataframe(df_forze, hide_index=True)
+        if elo and "model_expectancy" in elo:
+            st.caption(
+                f"Punteggio atteso casa: Elo {elo['home_expectancy']:.2f} | modello {elo['model_expectancy']:.2f} "
+                f"(scarto {elo['gap']:+.2f})"
+            )
 
         st.subheader("3️⃣ xG & Quote Fair")
         col_xg1, col_xg2 = st.columns(2)
@@ -136,6 +310,15 @@ if st.button("🚀 Avvia Analisi"):
             ],
             columns=["Segno", "Prob %", "Quota Fair"],
         )
+        # Quote book dal prefetch (già in memoria): nessuna chiamata API al click
+        book = odds_prefetcher().lookup(sel_league, sel_season, match_row["date"], match_row["home"], match_row["away"])
+        if book:
+            book_odds = [book.get(m) for m in ("1", "X", "2", "Gol", "Over2.5")]
+            df_odds["Quota Book"] = book_odds
+            df_odds["Edge %"] = [
+                round((p / 100 * b - 1) * 100, 1) if b else None
+                for p, b in zip(df_odds["Prob %"], book_odds)
+            ]
         st.table(df_odds)
 
         st.subheader("4️⃣ Top 5 Risultati Esatti")
@@ -0,0 +1,92 @@
+import pandas as pd
+import streamlit as st
+
+# Gli import registrano le metriche dei moduli (download CSV, API, archivio) nel registro del processo
+from src import api_football, api_store, data_loader  # noqa: F401
+from src.metrics import REGISTRY
+
+st.title("🩺 Diagnostica I/O")
+st.caption("Metriche del processo Streamlit dall'avvio: download, chiamate API, cache e lettura CSV.")
+
+metrics = REGISTRY.to_dict()
+
+def counter_frame(name):
+    """Serie di un contatore/gauge -> DataFrame (una colonna per etichetta + 'value')."""
+    metric = metrics.get(name)
+    if not metric or not metric['series']:
+        return pd.DataFrame()
+    return pd.DataFrame([dict(s['labels'], value=s['value']) for s in metric['series']])
+
+def total(name, **labels):
+    table = counter_frame(name)
+    for key, value in labels.items():
+        if table.empty:
+            break
+        table = table[table[key] == value]
+    return table['value'].sum() if not table.empty else 0
+
+def bucket_quantile(series, q):
+    """Quantile stimato dai bucket cumulativi (limite superiore del primo bucket che lo contiene)."""
+    target = q * series['count']
+    for bound, count in series['buckets'].items():
+        if count >= target:
+            return float(bound)
+    return float('inf')
+
+def histogram_frame(name):
+    metric = metrics.get(name)
+    if not metric or not metric['series']:
+        return pd.DataFrame()
+    rows = []
+    for s in metric['series']:
+        rows.append(dict(
+            s['labels'],
+            count=s['count'],
+            total_s=round(s['sum'], 3),
+            mean_ms=round(1000 * s['sum'] / s['count'], 1) if s['count'] else None,
+            p50_ms=1000 * bucket_quantile(s, 0.50),
+            p95_ms=1000 * bucket_quantile(s, 0.95),
+        ))
+    return pd.DataFrame(rows).sort_values('total_s', ascending=False)
+
+# --- RIEPILOGO ---
+hits = total('api_cache_lookups_total', result='hit')
+lookups = total('api_cache_lookups_total')
+remaining = counter_frame('api_daily_credits_remaining')
+mb = (total('csv_download_bytes_total') + total('api_response_bytes_total')) / 1e6
+errors = (total('csv_downloads_total', status='error') + total('csv_parse_errors_total')
+          + total('api_calls_total', status='error'))
+
+c1, c2, c3, c4, c5 = st.columns(5)
+c1.metric("Crediti API spesi", int(total('api_credits_used_total')))
+c2.metric("Crediti rimasti", int(remaining['value'].iloc[0]) if not remaining.empty else "n/d")
+c3.metric("Cache hit ratio", f"{100 * hits / lookups:.0f}%" if lookups else "n/d")
+c4.metric("MB scaricati", f"{mb:.1f}")
+c5.metric("Errori I/O", int(errors))
+
+# --- DETTAGLIO ---
+st.subheader("📡 API-Football")
+st.markdown("**Crediti per endpoint / lega**")
+st.dataframe(counter_frame('api_credits_used_total'), hide_index=True)
+st.markdown("**Chiamate per esito**")
+st.dataframe(counter_frame('api_calls_total'), hide_index=True)
+st.markdown("**Latenza**")
+st.dataframe(histogram_frame('api_request_seconds'), hide_index=True)
+
+st.subheader("🗄️ Cache")
+st.dataframe(counter_frame('api_cache_lookups_total'), hide_index=True)
+st.dataframe(counter_frame('snapshot_loads_total'), hide_index=True)
+
+st.subheader("📥 Download CSV")
+st.dataframe(counter_frame('csv_downloads_total'), hide_index=True)
+st.dataframe(histogram_frame('csv_download_seconds'), hide_index=True)
+
+st.subheader("📄 Lettura CSV")
+st.dataframe(histogram_frame('csv_parse_seconds'), hide_index=True)
+st.dataframe(counter_frame('csv_parse_errors_total'), hide_index=True)
+
+# --- ESPORTAZIONE ---
+st.subheader("💾 Esporta")
+e1, e2 = st.columns(2)
+e1.download_button("JSON", REGISTRY.to_json(indent=1), file_name="metrics.json", mime="application/json")
+e2.download_button("Prometheus", REGISTRY.to_prometheus(), file_name="metrics.prom", mime="text/plain")
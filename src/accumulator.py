@@ -0,0 +1,208 @@
+"""
+Ottimizzatore di multiple (accumulator): combinazioni da 2 a 6 partite sui mercati prezzati dal motore
+(1, X, 2, Gol, NoGol, Over2.5, Under2.5), confrontando la probabilità "giusta" combinata del modello
+con la quota combinata del bookmaker.
+
+Per una combinazione di legs indipendenti (una sola selezione per partita):
+    prob  = prod(p_i)           quota giusta = 1 / prob
+    quota = prod(o_i)           EV (edge)    = prob * quota - 1 = prod(p_i * o_i) - 1
+
+La ricerca è un branch-and-bound esatto sul log del rapporto r_i = p_i * o_i: le combinazioni crescono
+per livelli (una partita in più per livello, partite in ordine fisso così ogni combinazione nasce una
+sola volta) con prodotti vettoriali numpy; un prefisso viene scartato appena il suo limite superiore
+(prefisso + migliori selezioni delle partite restanti) non può più superare la soglia, che sale al
+top_n-esimo EV trovato.
+
+Esempio:
+    table = accumulator.attach_book_odds(table, accumulator.book_odds_from_lines(righe_quote))
+    legs = accumulator.legs_from_table(table)            # colonne prob_<mercato> e book_<mercato>
+    best = accumulator.optimize(legs, max_legs=4, min_edge=0.05, top_n=20)
+"""
+import numpy as np
+import pandas as pd
+
+MARKETS = ['1', 'X', '2', 'Gol', 'NoGol', 'Over2.5', 'Under2.5']
+
+# Mercati API-Football (righe in blocco di parse_odds_lines) -> mercati del motore
+BOOK_SELECTIONS = {
+    ('Match Winner', 'Home'): '1',
+    ('Match Winner', 'Draw'): 'X',
+    ('Match Winner', 'Away'): '2',
+    ('Both Teams Score', 'Yes'): 'Gol',
+    ('Both Teams Score', 'No'): 'NoGol',
+    ('Goals Over/Under', 'Over 2.5'): 'Over2.5',
+    ('Goals Over/Under', 'Under 2.5'): 'Under2.5',
+}
+
+MAX_LEGS = 6
+CHUNK = 4096                # Prefissi espansi per blocco (matrice prefissi x legs in memoria)
+MAX_FRONTIER = 500_000      # Tetto dei prefissi per livello (oltre: si tengono i limiti superiori migliori)
+BEAM_WIDTH = 200            # Prefissi per livello della beam search che fissa la soglia iniziale
+THRESHOLD_TOLERANCE = 1e-9  # Margine sulla soglia: i limiti superiori sommano i log in un altro ordine
+
+def book_odds_from_lines(lines):
+    """
+    Righe quota in blocco (api_store.odds_lines / parse_odds_lines) -> {fixture_id: {mercato: quota}},
+    miglior prezzo tra i bookmaker per ogni selezione.
+    """
+    book = {}
+    for line in lines:
+        market = BOOK_SELECTIONS.get((line['market'], line['selection']))
+        if market is None or not line['odd']:
+            continue
+        odds = book.setdefault(int(line['fixture_id']), {})
+        odds[market] = max(odds.get(market, 0.0), float(line['odd']))
+    return book
+
+def attach_book_odds(table, book):
+    """Aggiunge alla tabella del motore le colonne book_<mercato> dalle quote per fixture_id."""
+    table = table.copy()
+    for market in MARKETS:
+        table[f'book_{market}'] = [book.get(int(fid), {}).get(market) for fid in table['fixture_id']]
+    return table
+
+def legs_from_table(table, markets=None):
+    """
+    Tabella del motore (cli.results_to_frame: prob_<mercato> in %) con le quote del bookmaker in
+    colonne book_<mercato> -> una riga per selezione giocabile (fixture, match, market, prob, odd).
+    Le righe con errore del motore o senza quota vengono scartate.
+    """
+    markets = markets or MARKETS
+    ok = table['error'].isna() if 'error' in table else pd.Series(True, index=table.index)
+    parts = []
+    for market in markets:
+        prob_col, book_col = f'prob_{market}', f'book_{market}'
+        if prob_col not in table or book_col not in table:
+            continue
+        part = pd.DataFrame({
+            'fixture': table.index,
+            'match': table['home'] + ' - ' + table['away'],
+            'market': market,
+            'prob': table[prob_col].astype(float) / 100,
+            'odd': table[book_col].astype(float),
+        })
+        parts.append(part[ok.to_numpy()])
+    if not parts:
+        return pd.DataFrame(columns=['fixture', 'match', 'market', 'prob', 'odd'])
+    legs = pd.concat(parts, ignore_index=True)
+    valid = (legs['prob'] > 0) & (legs['prob'] < 1) & (legs['odd'] > 1)
+    return legs[valid].reset_index(drop=True)
+
+def _upper_bounds(logr, last, remaining, best_sorted, clipped_cum):
+    """
+    Miglior log-rapporto raggiungibile aggiungendo da 1 a `remaining` partite dopo `last`:
+    la migliore successiva (obbligatoria) + le seguenti solo se convenienti (log r > 0).
+    -inf se non c'è più nessuna partita da aggiungere.
+    """
+    n_fix = len(best_sorted)
+    nxt = last + 1
+    has_next = nxt < n_fix
+    nxt_c = np.minimum(nxt, n_fix - 1)
+    end = np.minimum(nxt + remaining, n_fix)
+    after = clipped_cum[end] - clipped_cum[np.minimum(nxt + 1, n_fix)]
+    return np.where(has_next, logr + best_sorted[nxt_c] + np.maximum(after, 0), -np.inf)
+
+def _search(fix, logr, best_sorted, clipped_cum, min_legs, max_legs, threshold, top_n, max_frontier):
+    """
+    Branch-and-bound per livelli. Restituisce (log-rapporti, indici delle legs) delle migliori top_n
+    multiple con log-rapporto >= threshold. Con max_frontier piccolo è una beam search (approssimata).
+    """
+    top_r = np.empty(0)
+    top_combos = np.empty((0, max_legs), dtype=np.intp)
+
+    # Livello 1: ogni selezione è un prefisso
+    f_r, f_last, f_legs = logr, fix, np.arange(len(logr))[:, None]
+    for size in range(2, max_legs + 1):
+        # Potatura: il prefisso deve poter raggiungere la soglia con le partite restanti
+        bound = _upper_bounds(f_r, f_last, max_legs - size + 1, best_sorted, clipped_cum)
+        keep = bound >= threshold
+        f_r, f_last, f_legs, bound = f_r[keep], f_last[keep], f_legs[keep], bound[keep]
+        if len(f_r) > max_frontier:
+            sel = np.argpartition(-bound, max_frontier)[:max_frontier]
+            f_r, f_last, f_legs = f_r[sel], f_last[sel], f_legs[sel]
+        if not len(f_r):
+            break
+
+        new_r, new_last, new_legs = [], [], []
+        for start in range(0, len(f_r), CHUNK):
+            r = f_r[start:start + CHUNK, None] + logr[None, :]
+            ok = (fix[None, :] > f_last[start:start + CHUNK, None])
+            # Serve o come multipla completa (r >= soglia) o come prefisso di multiple più lunghe
+            if size < max_legs:
+                ub = _upper_bounds(r, fix[None, :], max_legs - size, best_sorted, clipped_cum)
+                ok &= (r >= threshold) | (ub >= threshold)
+            else:
+                ok &= r >= threshold
+            rows, cols = np.nonzero(ok)
+            new_r.append(r[rows, cols])
+            new_last.append(fix[cols])
+            new_legs.append(np.column_stack([f_legs[start + rows], cols]))
+        f_r = np.concatenate(new_r)
+        f_last = np.concatenate(new_last)
+        f_legs = np.concatenate(new_legs)
+
+        # Multiple complete di questa dimensione -> classifica e soglia aggiornata
+        if size >= min_legs:
+            done = f_r >= threshold
+            padded = np.full((done.sum(), max_legs), -1, dtype=np.intp)
+            padded[:, :size] = f_legs[done]
+            top_r = np.concatenate([top_r, f_r[done]])
+            top_combos = np.concatenate([top_combos, padded])
+            if len(top_r) > top_n:
+                sel = np.argpartition(-top_r, top_n - 1)[:top_n]
+                top_r, top_combos = top_r[sel], top_combos[sel]
+            if len(top_r) == top_n:
+                threshold = max(threshold, top_r.min() - THRESHOLD_TOLERANCE)
+    return top_r, top_combos
+
+def optimize(legs, min_legs=2, max_legs=4, min_edge=0.0, top_n=20):
+    """
+    Migliori multiple per EV (vincoli: da min_legs a max_legs partite, una selezione per partita,
+    EV >= min_edge). `legs`: DataFrame di legs_from_table (fixture, match, market, prob, odd).
+    Restituisce un DataFrame ordinato per EV decrescente.
+    """
+    max_legs = min(max_legs, MAX_LEGS)
+    columns = ['legs', 'selections', 'prob', 'fair_odd', 'book_odd', 'edge']
+    if legs.empty or max_legs < min_legs:
+        return pd.DataFrame(columns=columns)
+
+    logr_all = np.log(legs['prob'].to_numpy(float) * legs['odd'].to_numpy(float))
+
+    # Partite ordinate per miglior rapporto (decrescente): il limite superiore diventa una somma cumulata
+    best_by_fixture = pd.Series(logr_all).groupby(legs['fixture'].to_numpy()).max().sort_values(ascending=False)
+    rank = pd.Series(np.arange(len(best_by_fixture)), index=best_by_fixture.index)
+    fix = rank.loc[legs['fixture'].to_numpy()].to_numpy()
+    best_sorted = best_by_fixture.to_numpy()
+    clipped_cum = np.concatenate([[0.0], np.cumsum(np.maximum(best_sorted, 0))])
+
+    order = np.argsort(fix, kind='stable')
+    fix, logr = fix[order], logr_all[order]
+    leg_ids = order                               # indice nella tabella legs originale
+
+    # Soglia iniziale da una beam search veloce: le sue top_n multiple esistono, quindi la
+    # top_n-esima è un limite inferiore valido e la ricerca esatta pota molto di più
+    threshold = np.log1p(min_edge)
+    seed_r, _ = _search(fix, logr, best_sorted, clipped_cum, min_legs, max_legs, threshold, top_n, BEAM_WIDTH)
+    if len(seed_r) == top_n:
+        # Con tolleranza: un arrotondamento nel limite superiore non deve potare una multipla alla pari
+        threshold = max(threshold, seed_r.min() - THRESHOLD_TOLERANCE)
+    top_r, top_combos = _search(fix, logr, best_sorted, clipped_cum, min_legs, max_legs, threshold, top_n,
+                                MAX_FRONTIER)
+
+    order_top = np.argsort(-top_r, kind='stable')
+    prob = legs['prob'].to_numpy(float)
+    odd = legs['odd'].to_numpy(float)
+    label = (legs['match'] + ': ' + legs['market']).to_numpy()
+    rows = []
+    for i in order_top:
+        ids = leg_ids[top_combos[i][top_combos[i] >= 0]]
+        p, o = prob[ids].prod(), odd[ids].prod()
+        rows.append({
+            'legs': len(ids),
+            'selections': ' | '.join(label[ids]),
+            'prob': round(100 * p, 2),
+            'fair_odd': round(1 / p, 2),
+            'book_odd': round(o, 2),
+            'edge': round(p * o - 1, 4),
+        })
+    return pd.DataFrame(rows, columns=columns)
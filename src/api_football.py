@@ -1,12 +1,13 @@
 import requests
-import json
 import os
-import pandas as pd
-from datetime import datetime, timedelta
+import time
+from datetime import date, timedelta
+
+from . import api_store, odds_history
+from .metrics import REGISTRY
 
 # Percorsi
 # --- CODICE AGGIORNATO PER I PERCORSI ---
-import os
 
 # Determina la cartella dove si trova QUESTO file (cioè src/)
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -19,11 +20,45 @@ CACHE_DIR = os.path.join(DATA_DIR, 'cache')
 # ORA CERCA LA CHIAVE NELLA CARTELLA CORRENTE (src)
 KEY_FILE = os.path.join(CURRENT_DIR, 'api_key.txt') 
 
-# Crea cartella cache se non esiste
-os.makedirs(CACHE_DIR, exist_ok=True)
+API_HOST = "v3.football.api-sports.io"
+BASE_URL = f"https://{API_HOST}"
+
+# Timeout (secondi) per ogni chiamata HTTP: evita che la UI resti bloccata
+REQUEST_TIMEOUT = 15
+
+# Aggiornamento incrementale calendari: finestra di date attorno a oggi e max ID per chiamata
+DELTA_DAYS_BACK = 2
+DELTA_DAYS_AHEAD = 7
+MAX_IDS_PER_CALL = 20
+
+# --- METRICHE I/O (condivise con il client asincrono) ---
+API_CALLS = REGISTRY.counter(
+    "api_calls_total", "Chiamate HTTP ad API-Football per esito (ok, http_<codice>, error)",
+    labelnames=("endpoint", "league", "status")
+)
+API_CREDITS = REGISTRY.counter(
+    "api_credits_used_total", "Crediti API-Football spesi (1 per risposta ricevuta)", labelnames=("endpoint", "league")
+)
+API_LATENCY = REGISTRY.histogram("api_request_seconds", "Latenza delle chiamate ad API-Football", labelnames=("endpoint",))
+API_BYTES = REGISTRY.counter("api_response_bytes_total", "Byte ricevuti da API-Football", labelnames=("endpoint",))
+API_CREDITS_REMAINING = REGISTRY.gauge(
+    "api_daily_credits_remaining", "Crediti giornalieri rimasti (header x-ratelimit-requests-remaining)"
+)
 
-# Crea cartella cache se non esiste
-os.makedirs(CACHE_DIR, exist_ok=True)
+def observe_api_call(endpoint, params, elapsed, response=None):
+    """Registra una chiamata ad API-Football: esito, credito speso, latenza, byte e crediti rimasti."""
+    league = (params or {}).get('league', '')
+    API_LATENCY.observe(elapsed, endpoint=endpoint)
+    if response is None:
+        API_CALLS.inc(endpoint=endpoint, league=league, status="error")
+        return
+    status = "ok" if response.status_code == 200 else f"http_{response.status_code}"
+    API_CALLS.inc(endpoint=endpoint, league=league, status=status)
+    API_CREDITS.inc(endpoint=endpoint, league=league)
+    API_BYTES.inc(len(response.content or b""), endpoint=endpoint)
+    remaining = response.headers.get('x-ratelimit-requests-remaining')
+    if remaining is not None and str(remaining).isdigit():
+        API_CREDITS_REMAINING.set(int(remaining))
 
 # MAPPING: Nome tuo progetto -> ID API-Football (v3)
 # ID presi da https://dashboard.api-football.com/
@@ -45,165 +80,380 @@ LEAGUE_MAP = {
     'Super League (Grecia)': 197
 }
 
+def load_api_key():
+    try:
+        with open(KEY_FILE, 'r') as f:
+            key = f.read().strip()
+            if len(key) < 10:
+                print("⚠️ ATTENZIONE: Chiave API sembra troppo corta o vuota.")
+            return key
+    except FileNotFoundError:
+        print("❌ ERRORE CRITICO: File 'api_key.txt' non trovato in /data/")
+        return ""
+
+def resolve_league_season(league_name, season_code):
+    """
+    Nome lega + codice stagione ('2526') -> (league_id, season_year) per l'API.
+    Restituisce None se la lega non è mappata.
+    """
+    if league_name not in LEAGUE_MAP:
+        print(f"⚠️ Lega '{league_name}' non mappata in api_football.py")
+        return None
+
+    league_id = LEAGUE_MAP[league_name]
+
+    # Conversione Stagione: '2526' -> 2025
+    try:
+        season_year = int("20" + season_code[:2])
+    except:
+        print(f"⚠️ Formato stagione errato: {season_code}, uso 2025 default")
+        season_year = 2025
+
+    return league_id, season_year
+
+def season_for_date(day):
+    """Codice stagione europea ('2425') di una data: la stagione inizia ad agosto."""
+    year = day.year if day.month >= 8 else day.year - 1
+    return f"{year % 100:02d}{(year + 1) % 100:02d}"
+
+def parse_fixtures(data):
+    """
+    Converte la risposta JSON di /fixtures nella lista di match usata dalla app.
+    Restituisce None se la risposta contiene errori.
+    """
+    # Gestione errori API
+    if 'errors' in data and data['errors']:
+        print(f"❌ Errore API: {data['errors']}")
+        return None
+
+    if 'response' not in data:
+        print("⚠️ Risposta vuota dall'API")
+        return None
+
+    # PARSING DEI DATI
+    clean_matches = []
+    for item in data['response']:
+        fixture = item['fixture']
+        teams = item['teams']
+        goals = item['goals']
+        league_info = item['league']
+
+        # short status: FT (Finito), NS (Not Started), PST (Postponed)
+        status = fixture['status']['short']
+        match_date_str = fixture['date'].split('T')[0] # YYYY-MM-DD
+
+        match_info = {
+            'id': fixture['id'],
+            'date': match_date_str,
+            'home': teams['home']['name'],
+            'away': teams['away']['name'],
+            'status': status,
+            'home_goals': goals['home'],
+            'away_goals': goals['away'],
+            'round': league_info['round']
+        }
+
+        # Creazione Etichetta per Menu a Tendina
+        if status in ['FT', 'AET', 'PEN']:
+            label = f"✅ {match_date_str} | {match_info['home']} {goals['home']}-{goals['away']} {match_info['away']}"
+            match_info['type'] = 'PAST'
+        elif status in ['NS', 'TBD']:
+            label = f"📅 {match_date_str} | {match_info['home']} vs {match_info['away']}"
+            match_info['type'] = 'FUTURE'
+        else:
+            # Live o Rinviata
+            label = f"⏱️ {match_date_str} ({status}) | {match_info['home']} vs {match_info['away']}"
+            match_info['type'] = 'FUTURE'
+
+        match_info['label'] = label
+        clean_matches.append(match_info)
+
+    # Ordiniamo per data decrescente (i più recenti/futuri in alto) o crescente?
+    # Meglio crescente (dal passato al futuro)
+    clean_matches.sort(key=lambda x: x['date'])
+    return clean_matches
+
+def odds_fixture_date(data):
+    """Data (YYYY-MM-DD) della partita nella risposta di /odds, se presente."""
+    try:
+        return data['response'][0]['fixture']['date'].split('T')[0]
+    except (KeyError, IndexError, TypeError, AttributeError):
+        return None
+
+def parse_match_odds(data):
+    """
+    Estrae le quote 1X2 ('Match Winner') del primo bookmaker dalla risposta di /odds.
+    Restituisce None se non ci sono quote.
+    """
+    if not data.get('response'):
+        print("⚠️ Nessuna quota disponibile per questo match.")
+        return None
+
+    # Cerchiamo un bookmaker affidabile (es. Bet365 id=1, o il primo disponibile)
+    bookmakers = data['response'][0]['bookmakers']
+    if not bookmakers: return None
+
+    # Prendiamo il primo bookmaker (spesso è Bet365 o Unibet)
+    bets = bookmakers[0]['bets']
+
+    odds_dict = {}
+
+    # Cerchiamo 'Match Winner' (id=1 di solito)
+    for bet in bets:
+        if bet['name'] == 'Match Winner':
+            for val in bet['values']:
+                if val['value'] == 'Home': odds_dict['1'] = float(val['odd'])
+                if val['value'] == 'Draw': odds_dict['X'] = float(val['odd'])
+                if val['value'] == 'Away': odds_dict['2'] = float(val['odd'])
+
+    return odds_dict
+
+def parse_odds_lines(data):
+    """
+    Converte una pagina della risposta di /odds in righe "lunghe":
+    partita x bookmaker x mercato x selezione (tutti i bookmaker, tutti i mercati).
+    Restituisce None se la risposta contiene errori.
+    """
+    if 'errors' in data and data['errors']:
+        print(f"❌ Errore API: {data['errors']}")
+        return None
+
+    lines = []
+    for item in data.get('response') or []:
+        fixture = item.get('fixture', {})
+        match_date = (fixture.get('date') or '').split('T')[0] or None
+        for rank, bookmaker in enumerate(item.get('bookmakers', [])):
+            for bet in bookmaker.get('bets', []):
+                for val in bet.get('values', []):
+                    try:
+                        odd = float(val['odd'])
+                    except (KeyError, TypeError, ValueError):
+                        continue
+                    lines.append({
+                        'fixture_id': fixture.get('id'),
+                        'date': match_date,
+                        'kickoff': fixture.get('date'),
+                        'bookmaker_id': bookmaker['id'],
+                        'bookmaker': bookmaker['name'],
+                        'bookmaker_rank': rank,
+                        'market_id': bet['id'],
+                        'market': bet['name'],
+                        'selection': str(val['value']),
+                        'odd': odd
+                    })
+    return lines
+
+def record_odds_history(lines):
+    """Aggiunge le righe quota allo storico (odds_history); un errore qui non blocca le quote."""
+    try:
+        odds_history.append(lines)
+    except Exception as e:
+        print(f"⚠️ Storico quote non aggiornato: {e}")
+
+def odds_pages(data):
+    """Numero totale di pagine dichiarato dalla risposta paginata (1 se assente)."""
+    try:
+        return max(1, int(data['paging']['total']))
+    except (KeyError, TypeError, ValueError):
+        return 1
+
+def odds_1x2_from_lines(lines):
+    """
+    Quote 1X2 nello stesso formato di get_match_odds a partire dalle righe in blocco:
+    primo bookmaker (ordine della risposta API) che quota 'Match Winner'.
+    """
+    match_winner = [l for l in lines if l['market'] == 'Match Winner']
+    if not match_winner:
+        return None
+    best_rank = min(l['bookmaker_rank'] for l in match_winner)
+    by_selection = {l['selection']: l['odd'] for l in match_winner if l['bookmaker_rank'] == best_rank}
+    mapping = {'Home': '1', 'Draw': 'X', 'Away': '2'}
+    return {key: by_selection[sel] for sel, key in mapping.items() if sel in by_selection}
+
 class FootballAPI:
-    def __init__(self):
-        self.api_key = self._load_key()
-        self.base_url = "https://v3.football.api-sports.io"
+    def __init__(self, store=None):
+        self.api_key = load_api_key()
+        self.base_url = BASE_URL
         self.headers = {
-            'x-rapidapi-host': "v3.football.api-sports.io",
+            'x-rapidapi-host': API_HOST,
             'x-rapidapi-key': self.api_key
         }
+        # Archivio SQLite condiviso delle risposte (TTL per endpoint + stale-while-revalidate)
+        self.store = store if store is not None else api_store.get_store()
 
-    def _load_key(self):
+    def _get(self, endpoint, params):
+        """GET su un endpoint API-Football, con metriche (latenza, crediti, byte, esito)."""
+        start = time.perf_counter()
         try:
-            with open(KEY_FILE, 'r') as f:
-                key = f.read().strip()
-                if len(key) < 10:
-                    print("⚠️ ATTENZIONE: Chiave API sembra troppo corta o vuota.")
-                return key
-        except FileNotFoundError:
-            print("❌ ERRORE CRITICO: File 'api_key.txt' non trovato in /data/")
-            return ""
-
-    def get_fixtures(self, league_name, season_code):
+            response = requests.get(f"{self.base_url}/{endpoint}", headers=self.headers, params=params,
+                                    timeout=REQUEST_TIMEOUT)
+        except Exception:
+            observe_api_call(endpoint, params, time.perf_counter() - start)
+            raise
+        observe_api_call(endpoint, params, time.perf_counter() - start, response)
+        return response
+
+    def get_fixtures(self, league_name, season_code, incremental=True):
         """
-        Scarica (o recupera da cache) TUTTO il calendario (Passato + Futuro)
-        Costo: 1 Chiamata API al giorno per Lega.
+        Scarica (o recupera dall'archivio locale) TUTTO il calendario (Passato + Futuro)
+        Costo: alla scadenza del TTL (24h, 30 giorni se tutto concluso) 1 Chiamata API per Lega;
+        se il calendario è già in archivio e incremental=True, solo l'aggiornamento incrementale
+        (vedi refresh_fixtures).
         """
-        if league_name not in LEAGUE_MAP:
-            print(f"⚠️ Lega '{league_name}' non mappata in api_football.py")
+        resolved = resolve_league_season(league_name, season_code)
+        if resolved is None:
             return []
+        league_id, season_year = resolved
 
-        league_id = LEAGUE_MAP[league_name]
-        
-        # Conversione Stagione: '2526' -> 2025
-        try:
-            season_year = int("20" + season_code[:2])
-        except:
-            print(f"⚠️ Formato stagione errato: {season_code}, uso 2025 default")
-            season_year = 2025
-
-        # --- GESTIONE CACHE ---
-        # Nome file cache: fixtures_135_2025.json
-        cache_file = os.path.join(CACHE_DIR, f"fixtures_{league_id}_{season_year}.json")
-        
-        # Controllo se file esiste ed è recente (< 24 ore)
-        if os.path.exists(cache_file):
-            file_time = datetime.fromtimestamp(os.path.getmtime(cache_file))
-            if datetime.now() - file_time < timedelta(hours=24):
-                # print(f"💾 Uso Cache locale per {league_name}") # Decommenta per debug
-                with open(cache_file, 'r') as f:
-                    return json.load(f)
-        
-        # --- CHIAMATA API (Se cache manca o vecchia) ---
-        print(f"📡 Chiamata API per {league_name} ({season_year})... (-1 Credito)")
-        
-        url = f"{self.base_url}/fixtures"
         # Scarichiamo TUTTO per quella stagione (Past & Future)
         querystring = {"league": str(league_id), "season": str(season_year)}
 
-        try:
-            response = requests.get(url, headers=self.headers, params=querystring)
-            data = response.json()
-            
-            # Gestione errori API
-            if 'errors' in data and data['errors']:
-                print(f"❌ Errore API: {data['errors']}")
-                return []
-            
-            if 'response' not in data:
-                print("⚠️ Risposta vuota dall'API")
+        def fetch():
+            if incremental and self.store.fixtures_for_league(league_id, season_year):
+                return self.refresh_fixtures(league_name, season_code)
+            # --- CHIAMATA API (Se archivio manca) ---
+            clean_matches = self._download_fixtures(querystring, f"{league_name} ({season_year})")
+            if clean_matches is not None:
+                self.store.upsert_fixtures(league_id, season_year, clean_matches)
+            return clean_matches
+
+        matches = self.store.fetch('fixtures', querystring, fetch, ttl_fn=api_store.fixtures_ttl)
+        return matches if matches is not None else []
+
+    def refresh_fixtures(self, league_name, season_code):
+        """
+        Aggiornamento INCREMENTALE del calendario in archivio (invece di riscaricare la stagione):
+        - 1 chiamata per le partite nella finestra [ultimo refresh - DELTA_DAYS_BACK, oggi + DELTA_DAYS_AHEAD];
+        - chiamate per ID (max 20 per chiamata) per le partite rimaste indietro non concluse (rinviate, sospese...).
+        Le partite concluse sono immutabili nell'archivio. Restituisce il calendario completo aggiornato.
+        """
+        resolved = resolve_league_season(league_name, season_code)
+        if resolved is None:
+            return []
+        league_id, season_year = resolved
+        querystring = {"league": str(league_id), "season": str(season_year)}
+        label = f"{league_name} ({season_year})"
+
+        if not self.store.fixtures_for_league(league_id, season_year):
+            # Niente in archivio: primo download completo
+            clean_matches = self._download_fixtures(querystring, label)
+            if clean_matches is None:
                 return []
+            self.store.upsert_fixtures(league_id, season_year, clean_matches)
+        else:
+            today = date.today()
+            state = self.store.get('fixtures_delta', querystring)
+            last_refresh = date.fromisoformat(state[0]['last_refresh']) if state else today
+            date_from = (min(last_refresh, today) - timedelta(days=DELTA_DAYS_BACK)).isoformat()
+            date_to = (today + timedelta(days=DELTA_DAYS_AHEAD)).isoformat()
 
-            # PARSING DEI DATI
-            clean_matches = []
-            for item in data['response']:
-                fixture = item['fixture']
-                teams = item['teams']
-                goals = item['goals']
-                league_info = item['league']
-                
-                # short status: FT (Finito), NS (Not Started), PST (Postponed)
-                status = fixture['status']['short']
-                match_date_str = fixture['date'].split('T')[0] # YYYY-MM-DD
-                
-                match_info = {
-                    'id': fixture['id'],
-                    'date': match_date_str,
-                    'home': teams['home']['name'],
-                    'away': teams['away']['name'],
-                    'status': status,
-                    'home_goals': goals['home'],
-                    'away_goals': goals['away'],
-                    'round': league_info['round']
-                }
-
-                # Creazione Etichetta per Menu a Tendina
-                if status in ['FT', 'AET', 'PEN']:
-                    label = f"✅ {match_date_str} | {match_info['home']} {goals['home']}-{goals['away']} {match_info['away']}"
-                    match_info['type'] = 'PAST'
-                elif status in ['NS', 'TBD']:
-                    label = f"📅 {match_date_str} | {match_info['home']} vs {match_info['away']}"
-                    match_info['type'] = 'FUTURE'
-                else:
-                    # Live o Rinviata
-                    label = f"⏱️ {match_date_str} ({status}) | {match_info['home']} vs {match_info['away']}"
-                    match_info['type'] = 'FUTURE'
-
-                match_info['label'] = label
-                clean_matches.append(match_info)
-
-            # Ordiniamo per data decrescente (i più recenti/futuri in alto) o crescente?
-            # Meglio crescente (dal passato al futuro)
-            clean_matches.sort(key=lambda x: x['date'])
-
-            # SALVATAGGIO CACHE
-            with open(cache_file, 'w') as f:
-                json.dump(clean_matches, f)
-            
-            return clean_matches
+            window = self._download_fixtures(dict(querystring, **{"from": date_from, "to": date_to}),
+                                             f"{label} {date_from} -> {date_to}")
+            if window is None:
+                return self.store.fixtures_for_league(league_id, season_year)
+            updates = list(window)
 
+            # Partite non concluse rimaste prima della finestra
+            seen = {m['id'] for m in window}
+            pending = [fid for fid in self.store.pending_fixture_ids(league_id, season_year, date_from)
+                       if fid not in seen]
+            for i in range(0, len(pending), MAX_IDS_PER_CALL):
+                chunk = pending[i:i + MAX_IDS_PER_CALL]
+                by_id = self._download_fixtures({"ids": "-".join(str(fid) for fid in chunk)},
+                                                f"{label} {len(chunk)} partite per ID")
+                if by_id:
+                    updates.extend(by_id)
+
+            self.store.upsert_fixtures(league_id, season_year, updates)
+
+        self.store.put('fixtures_delta', querystring, {'last_refresh': date.today().isoformat()})
+        matches = self.store.fixtures_for_league(league_id, season_year)
+        self.store.put('fixtures', querystring, matches, api_store.fixtures_ttl(matches))
+        return matches
+
+    def _download_fixtures(self, querystring, label):
+        """Una chiamata a /fixtures con i parametri dati; lista parsata o None in caso di errore."""
+        print(f"📡 Chiamata API per {label}... (-1 Credito)")
+        try:
+            response = self._get('fixtures', querystring)
+            return parse_fixtures(response.json())
         except Exception as e:
             print(f"❌ Eccezione API durante download: {e}")
-            return []
+            return None
 
     def get_match_odds(self, fixture_id):
         """
         Scarica le quote SOLO per un match specifico futuro.
-        Costo: 1 Chiamata API.
+        Costo: 1 Chiamata API (0 se la partita è già coperta da get_odds_bulk o dall'archivio).
         Da chiamare solo quando l'utente clicca 'Calcola'.
         """
-        print(f"📡 Scarico quote live per match {fixture_id}... (-1 Credito)")
-        url = f"{self.base_url}/odds"
+        # 1. Quote già scaricate in blocco (get_odds_bulk) e ancora valide
+        lines = self.store.odds_lines(fixture_ids=[fixture_id], max_age=api_store.ENDPOINT_TTL['odds'])
+        odds_dict = odds_1x2_from_lines(lines)
+        api_store.CACHE_LOOKUPS.inc(endpoint='odds_lines', result='hit' if odds_dict else 'miss')
+        if odds_dict:
+            return odds_dict
+
         querystring = {"fixture": str(fixture_id)}
-        
-        try:
-            response = requests.get(url, headers=self.headers, params=querystring)
-            data = response.json()
-            
-            if not data['response']:
-                print("⚠️ Nessuna quota disponibile per questo match.")
+
+        def fetch():
+            print(f"📡 Scarico quote live per match {fixture_id}... (-1 Credito)")
+            try:
+                response = self._get('odds', querystring)
+                data = response.json()
+                odds_dict = parse_match_odds(data)
+            except Exception as e:
+                print(f"❌ Errore scaricamento quote: {e}")
                 return None
-            
-            # Cerchiamo un bookmaker affidabile (es. Bet365 id=1, o il primo disponibile)
-            bookmakers = data['response'][0]['bookmakers']
-            if not bookmakers: return None
-            
-            # Prendiamo il primo bookmaker (spesso è Bet365 o Unibet)
-            bets = bookmakers[0]['bets']
-            
-            odds_dict = {}
-            
-            # Cerchiamo 'Match Winner' (id=1 di solito)
-            for bet in bets:
-                if bet['name'] == 'Match Winner':
-                    for val in bet['values']:
-                        if val['value'] == 'Home': odds_dict['1'] = float(val['odd'])
-                        if val['value'] == 'Draw': odds_dict['X'] = float(val['odd'])
-                        if val['value'] == 'Away': odds_dict['2'] = float(val['odd'])
-            
+            if odds_dict is not None:
+                self.store.upsert_odds(fixture_id, odds_dict, odds_fixture_date(data))
+                # Tutti i bookmaker e i mercati nello storico, non solo il primo bookmaker
+                record_odds_history(parse_odds_lines(data))
             return odds_dict
 
-        except Exception as e:
-            print(f"❌ Errore scaricamento quote: {e}")
-            return None
\ No newline at end of file
+        return self.store.fetch('odds', querystring, fetch)
+
+    def get_odds_bulk(self, league_name, season_code, date=None):
+        """
+        Quote di TUTTE le partite di una lega/stagione (opzionalmente di un solo giorno),
+        tutti i bookmaker e tutti i mercati, tramite il listing paginato di /odds.
+        Costo: 1 Credito per pagina (invece di 1 per partita). Le righe finiscono nell'archivio
+        locale, da cui get_match_odds serve poi le singole partite senza chiamate.
+        Restituisce un DataFrame con colonne api_store.ODDS_LINE_COLUMNS.
+        """
+        import pandas as pd
+
+        resolved = resolve_league_season(league_name, season_code)
+        if resolved is None:
+            return pd.DataFrame(columns=api_store.ODDS_LINE_COLUMNS)
+        league_id, season_year = resolved
+
+        querystring = {"league": str(league_id), "season": str(season_year)}
+        if date:
+            querystring["date"] = date
+
+        def fetch():
+            page, total_pages, n_lines = 1, 1, 0
+            try:
+                while page <= total_pages:
+                    print(f"📡 Quote in blocco {league_name} ({season_year}) pagina {page}/{total_pages}... (-1 Credito)")
+                    response = self._get('odds', dict(querystring, page=str(page)))
+                    data = response.json()
+                    lines = parse_odds_lines(data)
+                    if lines is None:
+                        return None
+                    self.store.upsert_odds_lines(league_id, season_year, lines)
+                    record_odds_history(lines)
+                    n_lines += len(lines)
+                    total_pages = odds_pages(data)
+                    page += 1
+            except Exception as e:
+                print(f"❌ Errore scaricamento quote in blocco: {e}")
+                return None
+            return {'pages': total_pages, 'lines': n_lines}
+
+        # Sincrono: il DataFrame va costruito dalle righe appena scaricate
+        self.store.fetch('odds_bulk', querystring, fetch, stale_while_revalidate=False)
+
+        rows = self.store.odds_lines(league_id=league_id, season=season_year, date=date)
+        return pd.DataFrame(rows, columns=api_store.ODDS_LINE_COLUMNS)
@@ -0,0 +1,262 @@
+"""
+Client asincrono per API-Football: calendari e quote di molte leghe/partite in parallelo.
+
+- concorrenza limitata da un semaforo (max_concurrency richieste in volo);
+- rate limiting a token bucket, ricalibrato sugli header di quota restituiti dall'API
+  (x-ratelimit-requests-remaining = crediti giornalieri, X-RateLimit-Remaining = richieste/minuto);
+- retry con backoff esponenziale su errori di rete, 429 e 5xx.
+
+Il parsing è lo stesso di FootballAPI (parse_fixtures / parse_match_odds), quindi l'output
+di get_fixtures / get_match_odds è identico e i chiamanti possono passare da un client all'altro.
+
+Esempio:
+    api = AsyncFootballAPI(max_concurrency=5)
+    calendari = api.run(api.get_fixtures_many([('Serie A', '2526'), ('Premier League', '2526')]))
+"""
+import asyncio
+import random
+import time
+
+import requests
+
+from . import api_store
+from .api_football import (
+    API_HOST, BASE_URL, REQUEST_TIMEOUT, load_api_key, resolve_league_season,
+    parse_fixtures, parse_match_odds, odds_fixture_date, parse_odds_lines, odds_pages,
+    record_odds_history, observe_api_call
+)
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """
+    Token bucket asincrono: `rate` token al secondo, al massimo `capacity` accumulati.
+    sync_remaining() allinea i token disponibili a quanto dichiarato dall'API.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def sync_remaining(self, remaining, limit=None, period=60.0):
+        """Aggiorna il bucket con gli header di quota (richieste rimaste / limite nel periodo)."""
+        self._refill()
+        if limit:
+            self.capacity = limit
+            self.rate = limit / period
+        self.tokens = min(self.tokens, remaining)
+
+class AsyncFootballAPI:
+    def __init__(self, max_concurrency=5, requests_per_minute=10, max_retries=3,
+                 backoff_base=1.0, base_url=BASE_URL, api_key=None, store=None, use_cache=True):
+        self.api_key = api_key if api_key is not None else load_api_key()
+        self.base_url = base_url
+        self.headers = {
+            'x-rapidapi-host': API_HOST,
+            'x-rapidapi-key': self.api_key
+        }
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.use_cache = use_cache
+        self.store = store if store is not None else api_store.get_store()
+
+        # Ultimi valori di quota letti dagli header (None finché non arriva una risposta)
+        self.quota = {'daily_remaining': None, 'daily_limit': None,
+                      'minute_remaining': None, 'minute_limit': None}
+        self.calls = 0
+
+        # Semaforo e bucket vanno creati dentro l'event loop che li usa
+        self._semaphore = None
+        self._bucket = None
+        self._loop = None
+
+    def run(self, coro):
+        """Esegue una coroutine del client da codice sincrono."""
+        return asyncio.run(coro)
+
+    def _ensure_loop_state(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._bucket = TokenBucket(self.requests_per_minute / 60.0, self.requests_per_minute)
+
+    def _read_quota_headers(self, headers):
+        def as_int(name):
+            value = headers.get(name)
+            try:
+                return int(value) if value is not None else None
+            except ValueError:
+                return None
+
+        daily_remaining = as_int('x-ratelimit-requests-remaining')
+        daily_limit = as_int('x-ratelimit-requests-limit')
+        minute_remaining = as_int('X-RateLimit-Remaining')
+        minute_limit = as_int('X-RateLimit-Limit')
+
+        if daily_remaining is not None:
+            self.quota['daily_remaining'] = daily_remaining
+            self.quota['daily_limit'] = daily_limit
+        if minute_remaining is not None:
+            self.quota['minute_remaining'] = minute_remaining
+            self.quota['minute_limit'] = minute_limit
+            self._bucket.sync_remaining(minute_remaining, minute_limit)
+
+    async def _request(self, endpoint, params):
+        """GET con semaforo, token bucket e retry. Restituisce il JSON o None."""
+        self._ensure_loop_state()
+        url = f"{self.base_url}/{endpoint}"
+
+        for attempt in range(self.max_retries + 1):
+            if self.quota['daily_remaining'] == 0:
+                print("❌ Crediti API giornalieri esauriti: richiesta saltata.")
+                return None
+
+            async with self._semaphore:
+                await self._bucket.acquire()
+                start = time.perf_counter()
+                response = None
+                try:
+                    response = await asyncio.to_thread(
+                        requests.get, url, headers=self.headers, params=params, timeout=REQUEST_TIMEOUT
+                    )
+                    observe_api_call(endpoint, params, time.perf_counter() - start, response)
+                    self.calls += 1
+                    self._read_quota_headers(response.headers)
+                    if response.status_code not in RETRY_STATUS:
+                        return response.json()
+                    error = f"HTTP {response.status_code}"
+                except (requests.RequestException, ValueError) as e:
+                    if response is None:
+                        observe_api_call(endpoint, params, time.perf_counter() - start)
+                    error = str(e)
+
+            if attempt < self.max_retries:
+                delay = self.backoff_base * (2 ** attempt) + random.uniform(0, self.backoff_base)
+                print(f"⚠️ {endpoint} {params}: {error}, nuovo tentativo tra {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+        print(f"❌ {endpoint} {params}: fallita dopo {self.max_retries + 1} tentativi ({error})")
+        return None
+
+    def _cached(self, endpoint, querystring):
+        """Risposta in archivio (payload, is_fresh) o None; conta hit/stale/miss come ApiStore.fetch."""
+        if not self.use_cache:
+            return None
+        cached = self.store.get(endpoint, querystring)
+        api_store.CACHE_LOOKUPS.inc(endpoint=endpoint,
+                                    result='miss' if cached is None else ('hit' if cached[1] else 'stale'))
+        return cached
+
+    async def get_fixtures(self, league_name, season_code):
+        """Come FootballAPI.get_fixtures (stesso archivio locale e stesso output)."""
+        resolved = resolve_league_season(league_name, season_code)
+        if resolved is None:
+            return []
+        league_id, season_year = resolved
+        querystring = {"league": str(league_id), "season": str(season_year)}
+
+        cached = self._cached('fixtures', querystring)
+        if cached is not None and cached[1]:
+            return cached[0]
+
+        print(f"📡 Chiamata API per {league_name} ({season_year})... (-1 Credito)")
+        data = await self._request("fixtures", querystring)
+        clean_matches = parse_fixtures(data) if data is not None else None
+        if clean_matches is None:
+            # Meglio un calendario scaduto che nessun calendario
+            return cached[0] if cached is not None else []
+        if self.use_cache:
+            self.store.upsert_fixtures(league_id, season_year, clean_matches)
+            self.store.put('fixtures', querystring, clean_matches, api_store.fixtures_ttl(clean_matches))
+        return clean_matches
+
+    async def get_match_odds(self, fixture_id):
+        """Come FootballAPI.get_match_odds: quote 1X2 del primo bookmaker o None."""
+        querystring = {"fixture": str(fixture_id)}
+
+        cached = self._cached('odds', querystring)
+        if cached is not None and cached[1]:
+            return cached[0]
+
+        data = await self._request("odds", querystring)
+        odds_dict = parse_match_odds(data) if data is not None else None
+        if odds_dict is None:
+            return cached[0] if cached is not None else None
+        if self.use_cache:
+            self.store.upsert_odds(fixture_id, odds_dict, odds_fixture_date(data))
+            self.store.put('odds', querystring, odds_dict)
+            record_odds_history(parse_odds_lines(data))
+        return odds_dict
+
+    async def get_fixtures_many(self, leagues_seasons):
+        """Calendari di più (lega, stagione) in parallelo -> {(lega, stagione): lista match}."""
+        keys = list(leagues_seasons)
+        results = await asyncio.gather(*(self.get_fixtures(league, season) for league, season in keys))
+        return dict(zip(keys, results))
+
+    async def get_odds_many(self, fixture_ids):
+        """Quote di più partite in parallelo -> {fixture_id: quote o None}."""
+        ids = list(fixture_ids)
+        results = await asyncio.gather(*(self.get_match_odds(fid) for fid in ids))
+        return dict(zip(ids, results))
+
+    async def get_odds_bulk(self, league_name, season_code, date=None):
+        """
+        Come FootballAPI.get_odds_bulk, ma dopo la prima pagina scarica le restanti in parallelo.
+        Restituisce un DataFrame con colonne api_store.ODDS_LINE_COLUMNS.
+        """
+        import pandas as pd
+
+        resolved = resolve_league_season(league_name, season_code)
+        if resolved is None:
+            return pd.DataFrame(columns=api_store.ODDS_LINE_COLUMNS)
+        league_id, season_year = resolved
+
+        querystring = {"league": str(league_id), "season": str(season_year)}
+        if date:
+            querystring["date"] = date
+
+        cached = self._cached('odds_bulk', querystring)
+        if cached is None or not cached[1]:
+            first = await self._request("odds", dict(querystring, page="1"))
+            pages = [first]
+            if first is not None and odds_pages(first) > 1:
+                pages += await asyncio.gather(*(
+                    self._request("odds", dict(querystring, page=str(p)))
+                    for p in range(2, odds_pages(first) + 1)
+                ))
+
+            n_lines, complete = 0, True
+            for data in pages:
+                lines = parse_odds_lines(data) if data is not None else None
+                if lines is None:
+                    complete = False
+                    continue
+                self.store.upsert_odds_lines(league_id, season_year, lines)
+                record_odds_history(lines)
+                n_lines += len(lines)
+            if complete:
+                self.store.put('odds_bulk', querystring, {'pages': len(pages), 'lines': n_lines})
+
+        rows = self.store.odds_lines(league_id=league_id, season=season_year, date=date)
+        return pd.DataFrame(rows, columns=api_store.ODDS_LINE_COLUMNS)
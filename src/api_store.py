@@ -0,0 +1,347 @@
+"""
+Archivio SQLite delle risposte API-Football (sostituisce i file fixtures_{id}_{anno}.json).
+
+- tabella `responses`: risposta parsata per (endpoint, parametri) con TTL per endpoint;
+- stale-while-revalidate: una risposta scaduta viene restituita subito e aggiornata in background;
+- single-flight: richieste concorrenti per la stessa risposta (anche da processi diversi)
+  producono una sola chiamata API;
+- tabelle `fixtures` e `odds` indicizzate per ID partita e data, interrogabili senza caricare
+  interi calendari.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from . import config, singleflight
+from .metrics import REGISTRY
+
+STORE_FILE = os.path.join(config.CACHE_DIR, 'api_store.sqlite')
+
+# TTL in secondi per endpoint
+HOUR = 3600
+ENDPOINT_TTL = {
+    'fixtures': 24 * HOUR,               # Calendario con partite ancora da giocare
+    'fixtures_finished': 30 * 24 * HOUR, # Calendario con sole partite concluse (non cambia più)
+    'fixtures_live': 60,                 # Partite in corso
+    'odds': 15 * 60,                     # Quote pre-match
+    'odds_bulk': 15 * 60,                # Quote in blocco per lega/stagione/giorno
+    'fixtures_delta': 365 * 24 * HOUR,   # Stato dell'aggiornamento incrementale (data ultimo refresh)
+}
+DEFAULT_TTL = HOUR
+
+CACHE_LOOKUPS = REGISTRY.counter(
+    "api_cache_lookups_total", "Richieste all'archivio API per esito (hit, stale, miss)",
+    labelnames=("endpoint", "result")
+)
+
+FINISHED_STATUS = ('FT', 'AET', 'PEN')
+LIVE_STATUS = ('1H', 'HT', '2H', 'ET', 'BT', 'P', 'INT', 'LIVE', 'SUSP')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    endpoint   TEXT NOT NULL,
+    params     TEXT NOT NULL,
+    payload    TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (endpoint, params)
+);
+CREATE TABLE IF NOT EXISTS fixtures (
+    fixture_id INTEGER PRIMARY KEY,
+    league_id  INTEGER,
+    season     INTEGER,
+    date       TEXT,
+    status     TEXT,
+    final      INTEGER NOT NULL DEFAULT 0,
+    payload    TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fixtures_date ON fixtures (date);
+CREATE INDEX IF NOT EXISTS idx_fixtures_league ON fixtures (league_id, season, date);
+CREATE TABLE IF NOT EXISTS odds (
+    fixture_id INTEGER PRIMARY KEY,
+    date       TEXT,
+    payload    TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_odds_date ON odds (date);
+CREATE TABLE IF NOT EXISTS odds_lines (
+    fixture_id     INTEGER NOT NULL,
+    league_id      INTEGER,
+    season         INTEGER,
+    date           TEXT,
+    bookmaker_id   INTEGER NOT NULL,
+    bookmaker      TEXT,
+    bookmaker_rank INTEGER,
+    market_id      INTEGER NOT NULL,
+    market         TEXT,
+    selection      TEXT NOT NULL,
+    odd            REAL NOT NULL,
+    updated_at     REAL NOT NULL,
+    PRIMARY KEY (fixture_id, bookmaker_id, market_id, selection)
+);
+CREATE INDEX IF NOT EXISTS idx_odds_lines_league ON odds_lines (league_id, season, date);
+CREATE INDEX IF NOT EXISTS idx_odds_lines_date ON odds_lines (date);
+"""
+
+# Colonne della tabella quote "lunga": partita x bookmaker x mercato x selezione
+ODDS_LINE_COLUMNS = [
+    'fixture_id', 'league_id', 'season', 'date', 'bookmaker_id', 'bookmaker',
+    'bookmaker_rank', 'market_id', 'market', 'selection', 'odd', 'updated_at'
+]
+
+def fixtures_ttl(matches):
+    """TTL di un calendario in base al contenuto: breve se ci sono partite live, lungo se tutto è concluso."""
+    statuses = {m.get('status') for m in matches}
+    if statuses & set(LIVE_STATUS):
+        return ENDPOINT_TTL['fixtures_live']
+    if matches and statuses <= set(FINISHED_STATUS):
+        return ENDPOINT_TTL['fixtures_finished']
+    return ENDPOINT_TTL['fixtures']
+
+class ApiStore:
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # Migrazione archivi creati prima della colonna 'final'
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(fixtures)")}
+            if 'final' not in columns:
+                conn.execute("ALTER TABLE fixtures ADD COLUMN final INTEGER NOT NULL DEFAULT 0")
+                conn.execute("UPDATE fixtures SET final = 1 WHERE status IN (%s)"
+                             % ",".join("?" * len(FINISHED_STATUS)), FINISHED_STATUS)
+
+    @contextmanager
+    def _connect(self):
+        # Una connessione per operazione: sicuro tra thread (refresh in background) e processi
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:  # commit / rollback automatico
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _params_key(params):
+        return json.dumps(params or {}, sort_keys=True)
+
+    # --- RISPOSTE (endpoint + parametri) ---
+
+    def get(self, endpoint, params):
+        """Restituisce (payload, is_fresh) oppure None se la risposta non è in archivio."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT payload, expires_at FROM responses WHERE endpoint = ? AND params = ?",
+                (endpoint, self._params_key(params))
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), time.time() < row[1]
+
+    def put(self, endpoint, params, payload, ttl=None):
+        if ttl is None:
+            ttl = ENDPOINT_TTL.get(endpoint, DEFAULT_TTL)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (endpoint, params, payload, fetched_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (endpoint, self._params_key(params), json.dumps(payload), now, now + ttl)
+            )
+
+    def fetch(self, endpoint, params, fetch_fn, ttl_fn=None, stale_while_revalidate=True):
+        """
+        Risposta per (endpoint, params):
+        - fresca in archivio -> restituita senza chiamate;
+        - scaduta -> restituita subito, aggiornamento lanciato in background (stale-while-revalidate);
+        - assente -> fetch_fn() sincrono.
+        fetch_fn restituisce il payload parsato o None in caso di errore (non salvato).
+        ttl_fn(payload) -> TTL in secondi (default: ENDPOINT_TTL dell'endpoint).
+        """
+        cached = self.get(endpoint, params)
+        CACHE_LOOKUPS.inc(endpoint=endpoint, result='miss' if cached is None else ('hit' if cached[1] else 'stale'))
+        if cached is not None:
+            payload, is_fresh = cached
+            if is_fresh:
+                return payload
+            if stale_while_revalidate:
+                self._refresh_in_background(endpoint, params, fetch_fn, ttl_fn)
+                return payload
+
+        payload = self._refresh(endpoint, params, fetch_fn, ttl_fn)
+        if payload is None and cached is not None:
+            return cached[0]  # Meglio un dato vecchio che nessun dato
+        return payload
+
+    def _refresh(self, endpoint, params, fetch_fn, ttl_fn):
+        # Single-flight: chiamanti concorrenti (thread o processi) per la stessa risposta -> 1 sola chiamata API
+        def run():
+            payload = fetch_fn()
+            if payload is not None:
+                self.put(endpoint, params, payload, ttl_fn(payload) if ttl_fn else None)
+            return payload
+
+        def reload():
+            cached = self.get(endpoint, params)
+            return cached[0] if cached is not None else None
+
+        key = f"api:{self.path}:{endpoint}:{self._params_key(params)}"
+        return singleflight.do(key, run, reload)
+
+    def _refresh_in_background(self, endpoint, params, fetch_fn, ttl_fn):
+        key = (endpoint, self._params_key(params))
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def worker():
+            try:
+                self._refresh(endpoint, params, fetch_fn, ttl_fn)
+            except Exception as e:
+                print(f"❌ Refresh in background fallito per {endpoint} {params}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    # --- FIXTURES (per ID e data) ---
+
+    def upsert_fixtures(self, league_id, season, matches):
+        """
+        Inserisce/aggiorna le partite per ID. Le partite concluse vengono marcate 'final'
+        e da quel momento non vengono più sovrascritte (immutabili).
+        """
+        now = time.time()
+        rows = [
+            (m['id'], league_id, season, m['date'], m['status'], int(m['status'] in FINISHED_STATUS),
+             json.dumps(m), now)
+            for m in matches
+        ]
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO fixtures (fixture_id, league_id, season, date, status, final, payload, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (fixture_id) DO UPDATE SET "
+                "league_id = excluded.league_id, season = excluded.season, date = excluded.date, "
+                "status = excluded.status, final = excluded.final, payload = excluded.payload, "
+                "updated_at = excluded.updated_at "
+                "WHERE fixtures.final = 0", rows
+            )
+
+    def fixtures_for_league(self, league_id, season):
+        """Calendario completo di una lega/stagione dall'archivio, ordinato per data."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT payload FROM fixtures WHERE league_id = ? AND season = ? ORDER BY date, fixture_id",
+                (league_id, season)
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def pending_fixture_ids(self, league_id, season, before_date):
+        """ID delle partite non concluse (NS, rinviate, live...) con data precedente a before_date."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT fixture_id FROM fixtures WHERE league_id = ? AND season = ? AND final = 0 AND date < ?",
+                (league_id, season, before_date)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def fixtures_by_id(self, fixture_ids):
+        ids = [int(i) for i in fixture_ids]
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT fixture_id, payload FROM fixtures WHERE fixture_id IN ({placeholders})", ids
+            ).fetchall()
+        return {fid: json.loads(payload) for fid, payload in rows}
+
+    def fixtures_by_date(self, date_from, date_to=None, league_id=None):
+        """Partite tra date_from e date_to (YYYY-MM-DD, estremi inclusi), opzionalmente di una lega."""
+        query = "SELECT payload FROM fixtures WHERE date >= ? AND date <= ?"
+        args = [date_from, date_to or date_from]
+        if league_id is not None:
+            query += " AND league_id = ?"
+            args.append(league_id)
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY date", args).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    # --- QUOTE (per ID e data) ---
+
+    def upsert_odds(self, fixture_id, odds, date=None):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO odds (fixture_id, date, payload, updated_at) VALUES (?, ?, ?, ?)",
+                (int(fixture_id), date, json.dumps(odds), time.time())
+            )
+
+    def odds_by_fixture(self, fixture_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT payload FROM odds WHERE fixture_id = ?", (int(fixture_id),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def odds_by_date(self, date):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT fixture_id, payload FROM odds WHERE date = ?", (date,)).fetchall()
+        return {fid: json.loads(payload) for fid, payload in rows}
+
+    # --- QUOTE IN BLOCCO (righe partita x bookmaker x mercato x selezione) ---
+
+    def upsert_odds_lines(self, league_id, season, lines):
+        now = time.time()
+        rows = [
+            (l['fixture_id'], league_id, season, l['date'], l['bookmaker_id'], l['bookmaker'],
+             l['bookmaker_rank'], l['market_id'], l['market'], l['selection'], l['odd'], now)
+            for l in lines
+        ]
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO odds_lines ({', '.join(ODDS_LINE_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(ODDS_LINE_COLUMNS))})", rows
+            )
+
+    def odds_lines(self, fixture_ids=None, league_id=None, season=None, date=None, max_age=None):
+        """Righe quota filtrate (tutti i filtri opzionali), come lista di dict ODDS_LINE_COLUMNS."""
+        clauses, args = [], []
+        if fixture_ids is not None:
+            ids = [int(i) for i in fixture_ids]
+            if not ids:
+                return []
+            clauses.append(f"fixture_id IN ({','.join('?' * len(ids))})")
+            args.extend(ids)
+        for column, value in (('league_id', league_id), ('season', season), ('date', date)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                args.append(value)
+        if max_age is not None:
+            clauses.append("updated_at >= ?")
+            args.append(time.time() - max_age)
+
+        query = f"SELECT {', '.join(ODDS_LINE_COLUMNS)} FROM odds_lines"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        with self._connect() as conn:
+            rows = conn.execute(query, args).fetchall()
+        return [dict(zip(ODDS_LINE_COLUMNS, r)) for r in rows]
+
+# --- ISTANZA CONDIVISA ---
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+def get_store(path=STORE_FILE):
+    """Un solo ApiStore per file nel processo (condivide lo stato dei refresh in background)."""
+    with _STORES_LOCK:
+        if path not in _STORES:
+            _STORES[path] = ApiStore(path)
+        return _STORES[path]
@@ -0,0 +1,376 @@
+"""
+Entry point a riga di comando (headless) per il motore statistico.
+
+Esempi:
+    python -m src.cli download
+    python -m src.cli build-cache
+    python -m src.cli predict --fixtures partite.csv --output previsioni.parquet
+    python -m src.cli predict --league "Serie A" --date-from 2025-01-01 --date-to 2025-01-31 --output out.csv
+    python -m src.cli tune --mode random --n-iter 200 --output tuning.csv
+    python -m src.cli schedule --days 3 --credit-budget 50
+    python -m src.cli live --replay live.jsonl
+    python -m src.cli acca --input data/cache/upcoming_predictions.parquet --max-legs 4 --min-edge 0.05
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from . import data_loader, stats_engine
+
+DELTA_COLUMNS = ['delta_att_home', 'delta_def_home', 'delta_att_away', 'delta_def_away']
+
+# --- STATO DEI WORKER (uno per processo) ---
+_WORKER_DF = None
+_WORKER_INDEX = None
+_WORKER_ELO = None
+
+def _init_worker(df, elo=None):
+    """Inizializzatore del pool: il dataset arriva una volta per processo e l'indice si costruisce una volta sola."""
+    global _WORKER_DF, _WORKER_INDEX, _WORKER_ELO
+    _WORKER_DF = df
+    _WORKER_INDEX = stats_engine.build_engine_index(df)
+    _WORKER_ELO = elo
+
+def _predict_chunk(fixtures):
+    return stats_engine.calculate_slate_predictions(_WORKER_DF, fixtures, _WORKER_INDEX, elo=_WORKER_ELO)
+
+def predict_fixtures(df, fixtures, workers=None, chunk_size=None, elo=None):
+    """
+    Prezza una lista di fixtures distribuendo il lavoro su un pool di processi.
+    Il risultato mantiene l'ordine delle fixtures in ingresso. elo: EloRatings opzionale (colonne elo_*).
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(fixtures) < 200:
+        return stats_engine.calculate_slate_predictions(df, fixtures, elo=elo)
+
+    if chunk_size is None:
+        # ~4 blocchi per worker: bilancia il carico senza moltiplicare l'overhead IPC
+        chunk_size = max(50, math.ceil(len(fixtures) / (workers * 4)))
+    chunks = [fixtures[i:i + chunk_size] for i in range(0, len(fixtures), chunk_size)]
+
+    # Con 'fork' i worker ereditano il DataFrame senza serializzarlo
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context('fork' if 'fork' in methods else None)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(df, elo)) as pool:
+        for chunk_res in pool.map(_predict_chunk, chunks):
+            results.extend(chunk_res)
+    return results
+
+def load_fixtures_file(path):
+    """Legge le fixtures da CSV o JSON (colonne: date, home, away + delta opzionali)."""
+    if path.lower().endswith('.json'):
+        with open(path, 'r') as f:
+            fx_df = pd.DataFrame(json.load(f))
+    else:
+        fx_df = pd.read_csv(path)
+
+    missing = {'date', 'home', 'away'} - set(fx_df.columns)
+    if missing:
+        raise ValueError(f"Colonne mancanti nel file fixtures: {sorted(missing)}")
+    return _fixtures_from_frame(fx_df)
+
+def _fixtures_from_frame(fx_df):
+    fx_df = fx_df.copy()
+    fx_df['date'] = pd.to_datetime(fx_df['date']).dt.strftime('%Y-%m-%d')
+    for col in DELTA_COLUMNS:
+        if col not in fx_df.columns:
+            fx_df[col] = 1.00
+        fx_df[col] = pd.to_numeric(fx_df[col], errors='coerce').fillna(1.00)
+    return fx_df[['date', 'home', 'away'] + DELTA_COLUMNS].to_dict('records')
+
+def fixtures_from_league(df, league, date_from, date_to, source='data', season=None):
+    """
+    Fixtures di una lega in un intervallo di date.
+    source='data': partite presenti nel dataset CSV; source='api': calendario API-Football.
+    """
+    d_from, d_to = pd.Timestamp(date_from), pd.Timestamp(date_to)
+
+    if source == 'api':
+        from .api_football import FootballAPI, season_for_date
+        from .team_names import dataframe_teams, resolve_fixtures
+        season = season or season_for_date(d_from)
+        # Nomi API -> nomi dei CSV, gli unici che il motore conosce
+        matches = resolve_fixtures(FootballAPI().get_fixtures(league, season), dataframe_teams(df, league))
+        fx_df = pd.DataFrame(matches, columns=['date', 'home', 'away'])
+    else:
+        sel = df[df['League'] == league]
+        fx_df = pd.DataFrame({'date': sel['Date'], 'home': sel['HomeTeam'], 'away': sel['AwayTeam']})
+
+    if fx_df.empty:
+        return []
+    dates = pd.to_datetime(fx_df['date'])
+    fx_df = fx_df[(dates >= d_from) & (dates <= d_to)]
+    return _fixtures_from_frame(fx_df)
+
+def results_to_frame(fixtures, results):
+    """Appiattisce i dizionari del motore in una tabella (una riga per fixture)."""
+    rows = []
+    for fx, res in zip(fixtures, results):
+        row = {'date': fx['date'], 'home': fx['home'], 'away': fx['away']}
+        row.update({col: fx.get(col, 1.00) for col in DELTA_COLUMNS})
+        if 'error' not in res:
+            row['xg_home'] = res['xg_prediction']['xg_home']
+            row['xg_away'] = res['xg_prediction']['xg_away']
+            for key, val in res['probabilities'].items():
+                row[f'prob_{key}'] = val
+            for key, val in res['odds'].items():
+                row[f'odd_{key}'] = val
+            row['top_score'] = res['exact_score_top5'][0]['score']
+            row['top_score_prob'] = res['exact_score_top5'][0]['prob']
+            if 'elo' in res:
+                row['elo_home'] = res['elo']['home']
+                row['elo_away'] = res['elo']['away']
+                row['elo_home_expectancy'] = res['elo']['home_expectancy']
+        row['error'] = res.get('error')
+        rows.append(row)
+
+    table = pd.DataFrame(rows)
+    return table[[c for c in table.columns if c != 'error'] + ['error']]
+
+def read_table(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.parquet':
+        return pd.read_parquet(path)
+    if ext == '.json':
+        return pd.read_json(path, orient='records')
+    return pd.read_csv(path)
+
+def write_output(table, path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.parquet':
+        table.to_parquet(path, index=False)
+    elif ext == '.json':
+        table.to_json(path, orient='records', indent=1)
+    else:
+        table.to_csv(path, index=False)
+
+# --- SOTTOCOMANDI ---
+
+def cmd_download(args):
+    data_loader.download_data()
+    return 0
+
+def cmd_build_cache(args):
+    data_loader.build_snapshot()
+    return 0
+
+def cmd_predict(args):
+    snapshot = data_loader.load_snapshot()
+    df = data_loader.snapshot_dataframe(snapshot)
+    if df.empty:
+        print("❌ Nessun dato disponibile. Esegui prima 'download'.")
+        return 1
+
+    if args.fixtures:
+        fixtures = load_fixtures_file(args.fixtures)
+    elif args.league and args.date_from and args.date_to:
+        fixtures = fixtures_from_league(df, args.league, args.date_from, args.date_to,
+                                        source=args.source, season=args.season)
+    else:
+        print("❌ Specifica --fixtures oppure --league con --date-from e --date-to.")
+        return 1
+
+    if not fixtures:
+        print("⚠️ Nessuna fixture da prezzare.")
+        return 1
+
+    if not args.exact_markets:
+        # Con 'fork' i worker ereditano anche la griglia già mappata
+        from . import dc_grid
+        dc_grid.enable()
+
+    print(f"⏳ Previsioni per {len(fixtures)} partite...")
+    results = predict_fixtures(df, fixtures, workers=args.workers, elo=data_loader.snapshot_elo(snapshot))
+    table = results_to_frame(fixtures, results)
+    write_output(table, args.output)
+
+    n_err = int(table['error'].notna().sum())
+    print(f"✅ Salvate {len(table)} previsioni in {args.output} ({n_err} con errore)")
+    return 0
+
+def cmd_screen(args):
+    from . import screener
+
+    df = data_loader.load_cached_data()
+    if df.empty:
+        print("❌ Nessun dato disponibile. Esegui prima 'download'.")
+        return 1
+
+    table = screener.scan(df, method=args.method)
+    table = screener.screen(table, rsi_below=args.rsi_below, rsi_above=args.rsi_above, cross=args.cross,
+                            within=args.within, league=args.league, season=args.season)
+    if args.output:
+        write_output(table, args.output)
+        print(f"✅ Salvate {len(table)} squadre in {args.output}")
+    else:
+        print(table.to_string(index=False))
+    return 0
+
+def cmd_tune(args):
+    from . import tuning
+
+    df = data_loader.load_cached_data()
+    if df.empty:
+        print("❌ Nessun dato disponibile. Esegui prima 'download'.")
+        return 1
+
+    if args.mode == 'grid':
+        candidates = tuning.grid_candidates()
+    else:
+        candidates = tuning.random_candidates(n=args.n_iter, seed=args.seed)
+    leagues = [args.league] if args.league else None
+    results = tuning.search(df, candidates, leagues=leagues, workers=args.workers)
+    best = tuning.best_per_league(results)
+
+    if args.output:
+        write_output(results, args.output)
+        print(f"✅ Salvati {len(results)} risultati in {args.output}")
+    print(best.to_string(index=False))
+    return 0
+
+def cmd_schedule(args):
+    from . import scheduler
+
+    sched = scheduler.Scheduler(scheduler.default_jobs(args.days, args.credit_budget), workers=args.workers)
+    if args.once:
+        sched.run_once()
+    else:
+        print("🕒 Scheduler avviato (Ctrl+C per uscire)")
+        try:
+            sched.run_forever()
+        except KeyboardInterrupt:
+            pass
+    failed = [name for name, s in sched.status().items() if s['last_status'] == 'error']
+    return 1 if failed else 0
+
+def cmd_acca(args):
+    from . import accumulator
+
+    table = read_table(args.input)
+    if not any(c.startswith('book_') for c in table.columns):
+        if 'fixture_id' not in table.columns:
+            print("❌ Servono le colonne book_<mercato> oppure fixture_id (quote dall'archivio API).")
+            return 1
+        from . import api_store
+        lines = api_store.get_store().odds_lines(fixture_ids=table['fixture_id'].dropna().tolist())
+        table = accumulator.attach_book_odds(table, accumulator.book_odds_from_lines(lines))
+
+    legs = accumulator.legs_from_table(table, markets=args.markets)
+    best = accumulator.optimize(legs, min_legs=args.min_legs, max_legs=args.max_legs,
+                                min_edge=args.min_edge, top_n=args.top)
+    if args.output:
+        write_output(best, args.output)
+        print(f"✅ Salvate {len(best)} multiple in {args.output}")
+    else:
+        print(best.to_string(index=False))
+    return 0
+
+def cmd_live(args):
+    import asyncio
+
+    from . import live
+
+    snapshot = data_loader.load_snapshot()
+    tracker = live.LiveTracker(df=data_loader.snapshot_dataframe(snapshot),
+                               engine_index=data_loader.snapshot_engine_index(snapshot))
+    if args.replay:
+        feed = live.ReplayFeed(args.replay, speed=args.speed)
+    else:
+        feed = live.ApiFeed(interval=args.interval, record_to=args.record)
+
+    def show(results):
+        rows = [{'match': f"{r['home']} - {r['away']}", 'min': r.get('minute'), 'score': r.get('score'),
+                 **r.get('probabilities', {}), 'error': r.get('error')} for r in results]
+        print(pd.DataFrame(rows).to_string(index=False) if rows else "⚽ Nessuna partita in corso")
+
+    asyncio.run(live.run(tracker, feed, on_update=show, max_ticks=args.ticks))
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m src.cli', description='Strategia Calcio - motore headless')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_dl = sub.add_parser('download', help='Scarica i CSV da football-data.co.uk')
+    p_dl.set_defaults(func=cmd_download)
+
+    p_cache = sub.add_parser('build-cache', help='Costruisce lo snapshot del dataset (dataset + indici)')
+    p_cache.set_defaults(func=cmd_build_cache)
+
+    p_pred = sub.add_parser('predict', help='Previsioni batch su un elenco di partite')
+    p_pred.add_argument('--fixtures', help='File CSV/JSON con colonne date, home, away (+ delta_* opzionali)')
+    p_pred.add_argument('--league', help='Nome lega (in alternativa a --fixtures)')
+    p_pred.add_argument('--date-from', help='Data iniziale YYYY-MM-DD')
+    p_pred.add_argument('--date-to', help='Data finale YYYY-MM-DD')
+    p_pred.add_argument('--source', choices=['data', 'api'], default='data',
+                        help='Origine fixtures per --league: dataset CSV o calendario API-Football')
+    p_pred.add_argument('--season', help="Codice stagione per --source api (es. '2526')")
+    p_pred.add_argument('--output', required=True, help='File di output (.csv, .json o .parquet)')
+    p_pred.add_argument('--workers', type=int, default=None, help='Numero di processi (default: tutti i core)')
+    p_pred.add_argument('--exact-markets', action='store_true',
+                        help='Mercati dal calcolo esatto invece che dalla griglia Dixon-Coles precompilata')
+    p_pred.set_defaults(func=cmd_predict)
+
+    p_scr = sub.add_parser('screen', help='Screener momentum (equity, SMA/EMA, RSI) su tutte le squadre')
+    p_scr.add_argument('--method', choices=['tick', 'points'], default='tick')
+    p_scr.add_argument('--rsi-below', type=float, help='Solo squadre con RSI sotto la soglia (es. 30)')
+    p_scr.add_argument('--rsi-above', type=float, help='Solo squadre con RSI sopra la soglia (es. 70)')
+    p_scr.add_argument('--cross', choices=['sma_up', 'sma_down', 'ema_up', 'ema_down'],
+                       help='Incrocio medie avvenuto nelle ultime --within partite')
+    p_scr.add_argument('--within', type=int, default=2)
+    p_scr.add_argument('--league', help='Solo questa lega')
+    p_scr.add_argument('--season', help="Solo questa stagione (es. '2526')")
+    p_scr.add_argument('--output', help='File di output (.csv, .json o .parquet); default: stampa a video')
+    p_scr.set_defaults(func=cmd_screen)
+
+    p_tune = sub.add_parser('tune', help='Ricerca dei parametri del motore (log-loss 1X2 walk-forward per lega)')
+    p_tune.add_argument('--mode', choices=['grid', 'random'], default='random')
+    p_tune.add_argument('--n-iter', type=int, default=100, help='Combinazioni per --mode random')
+    p_tune.add_argument('--seed', type=int, default=0)
+    p_tune.add_argument('--league', help='Solo questa lega')
+    p_tune.add_argument('--workers', type=int, default=None, help='Numero di processi (default: tutti i core)')
+    p_tune.add_argument('--output', help='File con tutti i risultati (.csv, .json o .parquet)')
+    p_tune.set_defaults(func=cmd_tune)
+
+    p_sched = sub.add_parser('schedule', help='Demone di aggiornamento: CSV, API, snapshot e previsioni dei prossimi giorni')
+    p_sched.add_argument('--once', action='store_true', help='Esegue una volta tutti i job ed esce')
+    p_sched.add_argument('--days', type=int, default=3, help='Giorni di partite da precalcolare')
+    p_sched.add_argument('--credit-budget', type=int, default=50, help='Crediti API per ogni esecuzione del job API')
+    p_sched.add_argument('--workers', type=int, default=3, help='Job eseguiti in parallelo')
+    p_sched.set_defaults(func=cmd_schedule)
+
+    p_live = sub.add_parser('live', help='Probabilità in-play delle partite in corso (API o replay registrato)')
+    p_live.add_argument('--replay', help='Registrazione JSONL da riprodurre al posto dell\'API')
+    p_live.add_argument('--speed', type=float, default=0.0, help='Velocità del replay (0 = senza pause)')
+    p_live.add_argument('--record', help='Registra le risposte API in questo file JSONL')
+    p_live.add_argument('--interval', type=float, default=60, help='Secondi tra due aggiornamenti API')
+    p_live.add_argument('--ticks', type=int, help='Numero massimo di aggiornamenti')
+    p_live.set_defaults(func=cmd_live)
+
+    p_acca = sub.add_parser('acca', help='Multiple a EV massimo su un palinsesto già prezzato dal motore')
+    p_acca.add_argument('--input', required=True,
+                        help='Previsioni (output di predict o dello scheduler) con colonne book_<mercato> o fixture_id')
+    p_acca.add_argument('--min-legs', type=int, default=2)
+    p_acca.add_argument('--max-legs', type=int, default=4, help='Partite per multipla (massimo 6)')
+    p_acca.add_argument('--min-edge', type=float, default=0.0, help='EV minimo della multipla (es. 0.05 = +5%%)')
+    p_acca.add_argument('--top', type=int, default=20)
+    p_acca.add_argument('--markets', nargs='+', help='Solo questi mercati (es. 1 X 2 Over2.5)')
+    p_acca.add_argument('--output', help='File di output (.csv, .json o .parquet); default: stampa a video')
+    p_acca.set_defaults(func=cmd_acca)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
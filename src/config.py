@@ -3,6 +3,10 @@ import os
 # --- PERCORSI FILE ---
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, 'data', 'raw')
+CACHE_DIR = os.path.join(BASE_DIR, 'data', 'cache')
+
+# Snapshot precompilato (dataset + indici lega/squadra) letto all'avvio da app, CLI e servizi
+SNAPSHOT_FILE = os.path.join(CACHE_DIR, 'snapshot.pkl')
 
 os.makedirs(DATA_DIR, exist_ok=True)
 
@@ -1,8 +1,7 @@
-import ipywidgets as widgets
-from IPython.display import display, HTML, clear_output
-import pandas as pd
 from . import stats_engine
 
+# ipywidgets / IPython vengono importati solo al primo utilizzo (avvio più rapido)
+
 # --- DIZIONARIO DELTA NEWS ---
 # Mappa le etichette ai valori (Attacco, Difesa)
 # Ricorda: Attacco > 1 (Bonus), Difesa > 1 (Malus/Danno)
@@ -20,6 +19,8 @@ NEWS_EFFECTS = {
 
 class StrategyDashboard:
     def __init__(self, df):
+        import ipywidgets as widgets
+
         self.df = df
         self.output_area = widgets.Output()
         
@@ -96,6 +97,8 @@ class StrategyDashboard:
 
     def display(self):
         """Mostra la Dashboard"""
+        import ipywidgets as widgets
+        from IPython.display import display
         
         # Layout Grafico
         match_box = widgets.VBox([
@@ -122,6 +125,8 @@ class StrategyDashboard:
 
     def _run_calculation(self, b):
         """Callback del bottone: Raccoglie dati e chiama StatsEngine"""
+        from IPython.display import clear_output
+
         match_val = self.dd_match.value
         
         if not match_val:
@@ -160,6 +165,8 @@ class StrategyDashboard:
 
     def _render_output(self, res):
         """Genera l'HTML e le tabelle finali"""
+        from IPython.display import display, HTML, clear_output
+
         clear_output()
         
         # Dati Estratti
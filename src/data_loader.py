@@ -1,12 +1,39 @@
-import pandas as pd
 import os
-import requests
-from . import config
+import pickle
+import time
+from datetime import datetime
+from . import config, singleflight
+from .metrics import REGISTRY
 
-def download_data():
+# pandas / requests vengono importati dentro le funzioni: l'import di questo modulo
+# (e la lettura degli indici dello snapshot) non paga il loro costo di avvio.
+
+# --- METRICHE I/O ---
+DOWNLOADS = REGISTRY.counter(
+    "csv_downloads_total", "Download CSV da football-data.co.uk per esito (ok, missing, error)",
+    labelnames=("league", "status")
+)
+DOWNLOAD_BYTES = REGISTRY.counter("csv_download_bytes_total", "Byte CSV scaricati", labelnames=("league",))
+DOWNLOAD_LATENCY = REGISTRY.histogram(
+    "csv_download_seconds", "Durata dei download CSV", labelnames=("league",)
+)
+CSV_PARSE_LATENCY = REGISTRY.histogram("csv_parse_seconds", "Durata della lettura di un CSV", labelnames=("league",))
+CSV_ROWS = REGISTRY.counter("csv_rows_total", "Righe lette dai CSV", labelnames=("league",))
+CSV_PARSE_ERRORS = REGISTRY.counter("csv_parse_errors_total", "CSV scartati per errore di lettura", labelnames=("league",))
+SNAPSHOT_LOADS = REGISTRY.counter(
+    "snapshot_loads_total", "Letture dello snapshot: 'hit' (valido su disco) o 'rebuild'", labelnames=("result",)
+)
+
+def download_data(seasons=None):
     """
     Scarica SIA i campionati Europei (Stagionali) SIA quelli Extra (MLS, Brasile, ecc).
+    seasons: solo queste stagioni europee (es. [config.SEASONS[-1]] per la stagione corrente).
+    Download concorrenti (più sessioni o processi) vengono accorpati in uno solo.
     """
+    seasons = list(seasons) if seasons else list(config.SEASONS)
+    singleflight.do(f"download_data:{','.join(seasons)}", lambda: _download_all(seasons))
+
+def _download_all(seasons):
     base_url_euro = "https://www.football-data.co.uk/mmz4281/"
     base_url_extra = "https://www.football-data.co.uk/new/"
     
@@ -15,10 +42,10 @@ def download_data():
     # 1. DOWNLOAD EUROPA (Ciclo su Stagioni)
     print(">> Scarico Leghe Europee...")
     for league_name, league_code in config.LEAGUES.items():
-        for season in config.SEASONS:
+        for season in seasons:
             url = f"{base_url_euro}{season}/{league_code}.csv"
             filename = f"{league_code}_{season}.csv"
-            _download_file(url, filename, f"{league_name} ({season})")
+            _download_file(url, filename, f"{league_name} ({season})", league=league_name)
 
     # 2. DOWNLOAD EXTRA (MLS, Brasile - Anno Solare)
     # Questi file su football-data si aggiornano sovrascrivendosi, contengono l'anno corrente
@@ -27,27 +54,35 @@ def download_data():
         url = f"{base_url_extra}{league_code}.csv"
         # Aggiungiamo un suffisso per riconoscerli
         filename = f"{league_code}_current.csv" 
-        _download_file(url, filename, league_name)
+        _download_file(url, filename, league_name, league=league_name)
 
-def _download_file(url, filename, label):
+def _download_file(url, filename, label, league=""):
     """Funzione helper per scaricare un singolo file"""
+    import requests
+
     file_path = os.path.join(config.DATA_DIR, filename)
+    start = time.perf_counter()
     try:
         response = requests.get(url, timeout=10) # Timeout per evitare blocchi
+        DOWNLOAD_LATENCY.observe(time.perf_counter() - start, league=league)
         if response.status_code == 200:
-            with open(file_path, 'wb') as f:
-                f.write(response.content)
+            singleflight.atomic_write(file_path, response.content)
+            DOWNLOADS.inc(league=league, status="ok")
+            DOWNLOAD_BYTES.inc(len(response.content), league=league)
             print(f"✅ OK: {label}")
         else:
             # Molti vecchi campionati minori potrebbero non esserci per tutte le stagioni
-            pass 
+            DOWNLOADS.inc(league=league, status="missing")
     except Exception as e:
+        DOWNLOADS.inc(league=league, status="error")
         print(f"❌ Errore {label}: {e}")
 
 def load_all_data():
     """
     Carica Europa + Extra e unifica tutto.
     """
+    import pandas as pd
+
     all_files = [f for f in os.listdir(config.DATA_DIR) if f.endswith('.csv')]
     
     if not all_files:
@@ -65,18 +100,20 @@ def load_all_data():
     
     for filename in all_files:
         file_path = os.path.join(config.DATA_DIR, filename)
+
+        # Identificazione Lega
+        code = filename.split('_')[0]
+        if code in euro_map:
+            league_name = euro_map[code]
+        elif code in extra_map:
+            league_name = extra_map[code]
+        else:
+            league_name = code # Fallback
+
+        start = time.perf_counter()
         try:
             # Gestione encoding per file con caratteri strani (accenti brasiliani, ecc)
             df = pd.read_csv(file_path, encoding='latin1') 
-            
-            # Identificazione Lega
-            code = filename.split('_')[0]
-            if code in euro_map:
-                league_name = euro_map[code]
-            elif code in extra_map:
-                league_name = extra_map[code]
-            else:
-                league_name = code # Fallback
 
             # Standardizzazione Colonne
             cols_to_use = {v: k for k, v in config.COL_MAPPING.items() if v in df.columns}
@@ -92,10 +129,12 @@ def load_all_data():
                 df['Season'] = filename.split('_')[1].replace('.csv', '')
 
             df_list.append(df)
-            
+            CSV_PARSE_LATENCY.observe(time.perf_counter() - start, league=league_name)
+            CSV_ROWS.inc(len(df), league=league_name)
+
         except Exception as e:
-            # print(f"Skip {filename}: {e}") # Decommenta per debug
-            pass
+            CSV_PARSE_ERRORS.inc(league=league_name)
+            print(f"⚠️ Skip {filename}: {e}")
 
     if not df_list:
         return pd.DataFrame()
@@ -118,6 +157,144 @@ def load_all_data():
     
     return full_df
 
+# --- SNAPSHOT PRECOMPILATO ---
+# Un unico file pickle con:
+#   - indici leggeri (leghe, stagioni, match per lega/stagione, squadre) in tipi Python puri,
+#     leggibili senza importare pandas/numpy -> la prima pagina della app è subito pronta;
+#   - 'payload': DataFrame + indice del motore + rating Elo serializzati a parte, decodificati solo al primo uso.
+SNAPSHOT_VERSION = 3     # 2: colonne implied_xg_* (xG implicite nelle quote); 3: rating Elo nel payload
+
+def build_snapshot(df=None):
+    """
+    Costruisce e salva lo snapshot (dataset + indici lega/squadra) in config.SNAPSHOT_FILE.
+    """
+    from . import implied_xg, stats_engine
+    from .elo import EloRatings
+
+    if df is None:
+        df = load_all_data()
+    if df.empty:
+        return _empty_snapshot()
+
+    df = df.sort_values('Date', kind='mergesort').reset_index(drop=True)
+    df = implied_xg.add_columns(df)
+    engine_index = stats_engine.build_engine_index(df)
+    elo = EloRatings.from_frame(df)
+
+    seasons = {}
+    matches = {}
+    teams = {}
+    for (league, season), group in df.groupby(['League', 'Season'], sort=False):
+        seasons.setdefault(league, []).append(season)
+        group = group.iloc[::-1]  # Dal più recente
+        matches[(league, season)] = [
+            {
+                'label': f"{d.strftime('%Y-%m-%d')} | {h} vs {a}",
+                'date': d.strftime('%Y-%m-%d'),
+                'home': h,
+                'away': a,
+            }
+            for d, h, a in zip(group['Date'], group['HomeTeam'], group['AwayTeam'])
+        ]
+        teams[(league, season)] = sorted(set(group['HomeTeam']) | set(group['AwayTeam']))
+
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'built_at': datetime.now().isoformat(timespec='seconds'),
+        'n_matches': len(df),
+        'leagues': sorted(seasons),
+        'seasons': {league: sorted(s_list, reverse=True) for league, s_list in seasons.items()},
+        'matches': matches,
+        'teams': teams,
+        'payload': pickle.dumps((df, engine_index, elo), protocol=pickle.HIGHEST_PROTOCOL),
+    }
+
+    singleflight.atomic_write(config.SNAPSHOT_FILE, pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL))
+    print(f"💾 Snapshot salvato: {config.SNAPSHOT_FILE} ({len(df)} partite)")
+    return snapshot
+
+def load_snapshot():
+    """
+    Legge lo snapshot con una sola lettura; se manca, è di una versione diversa
+    o è più vecchio dei CSV in data/raw, lo ricostruisce.
+    """
+    if _snapshot_is_fresh():
+        snapshot = _read_snapshot()
+        if snapshot is not None:
+            SNAPSHOT_LOADS.inc(result="hit")
+            return snapshot
+    SNAPSHOT_LOADS.inc(result="rebuild")
+    # Ricostruzioni concorrenti accorpate: chi aspetta rilegge lo snapshot appena scritto
+    return singleflight.do("build_snapshot", build_snapshot, _reload_snapshot)
+
+def snapshot_version():
+    """Versione dello snapshot su disco (mtime, 0 se manca): chiave per le cache delle UI."""
+    try:
+        return os.path.getmtime(config.SNAPSHOT_FILE)
+    except OSError:
+        return 0
+
+def snapshot_dataframe(snapshot):
+    """DataFrame completo dello snapshot (decodificato al primo accesso)."""
+    return _decode_payload(snapshot)[0]
+
+def snapshot_engine_index(snapshot):
+    """Indice del motore batch dello snapshot (decodificato al primo accesso)."""
+    return _decode_payload(snapshot)[1]
+
+def snapshot_elo(snapshot):
+    """Rating Elo (EloRatings) di tutte le squadre dello snapshot (decodificati al primo accesso)."""
+    return _decode_payload(snapshot)[2]
+
+def load_cached_data():
+    """
+    Dataset completo letto dallo snapshot (ricostruito dai CSV se necessario).
+    """
+    return snapshot_dataframe(load_snapshot())
+
+def _decode_payload(snapshot):
+    if '_decoded' not in snapshot:
+        if snapshot['payload'] is None:
+            import pandas as pd
+            snapshot['_decoded'] = (pd.DataFrame(), None, None)
+        else:
+            snapshot['_decoded'] = pickle.loads(snapshot['payload'])
+    return snapshot['_decoded']
+
+def _read_snapshot():
+    """Snapshot su disco se esiste ed è della versione corrente, altrimenti None."""
+    if not os.path.exists(config.SNAPSHOT_FILE):
+        return None
+    with open(config.SNAPSHOT_FILE, 'rb') as f:
+        snapshot = pickle.load(f)
+    return snapshot if snapshot.get('version') == SNAPSHOT_VERSION else None
+
+def _reload_snapshot():
+    """Snapshot scritto da un altro processo; vuoto se quella build non ha trovato CSV (nessun file scritto)."""
+    snapshot = _read_snapshot()
+    return snapshot if snapshot is not None else _empty_snapshot()
+
+def _empty_snapshot():
+    return {
+        'version': SNAPSHOT_VERSION,
+        'built_at': datetime.now().isoformat(timespec='seconds'),
+        'n_matches': 0,
+        'leagues': [],
+        'seasons': {},
+        'matches': {},
+        'teams': {},
+        'payload': None,
+    }
+
+def _snapshot_is_fresh():
+    """Lo snapshot è valido se esiste ed è più recente di tutti i CSV."""
+    if not os.path.exists(config.SNAPSHOT_FILE):
+        return False
+    snap_mtime = os.path.getmtime(config.SNAPSHOT_FILE)
+    with os.scandir(config.DATA_DIR) as entries:
+        csv_mtimes = [e.stat().st_mtime for e in entries if e.name.endswith('.csv')]
+    return bool(csv_mtimes) and max(csv_mtimes) <= snap_mtime
+
 if __name__ == "__main__":
     download_data()
     # df = load_all_data()
\ No newline at end of file
@@ -0,0 +1,144 @@
+"""
+Rating Elo di tutte le squadre di tutte le leghe, con vantaggio casa e moltiplicatore sulla
+differenza reti (schema World Football Elo).
+
+Un solo passaggio cronologico sul DataFrame di load_all_data: per ogni squadra si salvano
+la data e il rating DOPO ogni partita, in ordine. Il rating "alla data D" è quello dopo
+l'ultima partita strettamente precedente a D (stesso "muro" del motore): una ricerca binaria.
+
+    ratings = EloRatings.from_frame(df)
+    ratings.rating('Inter', '2025-03-01')
+    ratings.update(nuove_partite)   # incrementale (partite successive all'ultima data)
+"""
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+ELO_START = 1500.0      # Rating iniziale (squadra mai vista)
+ELO_K = 20.0            # Fattore K
+ELO_HOME_ADV = 65.0     # Punti Elo di vantaggio per la squadra di casa
+
+def goal_multiplier(goal_diff):
+    """Moltiplicatore di K per la differenza reti: 1, 1.5, poi (11 + diff) / 8."""
+    goal_diff = abs(goal_diff)
+    if goal_diff <= 1:
+        return 1.0
+    if goal_diff == 2:
+        return 1.5
+    return (11.0 + goal_diff) / 8.0
+
+def expected_home(rating_home, rating_away, home_adv=ELO_HOME_ADV):
+    """Punteggio atteso della squadra di casa (vittoria = 1, pareggio = 0.5)."""
+    return 1.0 / (1.0 + 10 ** ((rating_away - rating_home - home_adv) / 400.0))
+
+def _to_ns(date):
+    return pd.Timestamp(date).value
+
+class EloRatings:
+    def __init__(self, k=ELO_K, home_adv=ELO_HOME_ADV, start=ELO_START):
+        self.k = k
+        self.home_adv = home_adv
+        self.start = start
+        # squadra -> date (ns, crescenti) e rating dopo ogni partita
+        self._dates = {}
+        self._ratings = {}
+        self.last_date = None
+        self.n_matches = 0
+
+    @classmethod
+    def from_frame(cls, df, **kwargs):
+        ratings = cls(**kwargs)
+        ratings.update(df)
+        return ratings
+
+    def copy(self):
+        """Copia indipendente: update sulla copia non tocca l'originale (es. i rating dello snapshot)."""
+        other = type(self)(k=self.k, home_adv=self.home_adv, start=self.start)
+        other._dates = {team: list(dates) for team, dates in self._dates.items()}
+        other._ratings = {team: list(ratings) for team, ratings in self._ratings.items()}
+        other.last_date = self.last_date
+        other.n_matches = self.n_matches
+        return other
+
+    def current(self, team):
+        """Rating dopo l'ultima partita giocata."""
+        ratings = self._ratings.get(team)
+        return ratings[-1] if ratings else self.start
+
+    def update(self, df):
+        """
+        Elabora le partite (colonne Date, HomeTeam, AwayTeam, home_goals, away_goals) in ordine di data.
+        Le partite devono essere successive all'ultima data già elaborata (append cronologico).
+        """
+        if df is None or len(df) == 0:
+            return 0
+        df = df.dropna(subset=['Date', 'home_goals', 'away_goals'])
+        df = df.sort_values('Date', kind='mergesort')
+        dates = pd.to_datetime(df['Date']).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        if self.last_date is not None and len(dates) and dates[0] < self.last_date:
+            raise ValueError("Partite precedenti all'ultima data elaborata: ricostruire con EloRatings.from_frame")
+
+        home_goals = df['home_goals'].to_numpy(dtype=float)
+        away_goals = df['away_goals'].to_numpy(dtype=float)
+        for date, home, away, hg, ag in zip(dates.tolist(), df['HomeTeam'], df['AwayTeam'], home_goals, away_goals):
+            r_home, r_away = self.current(home), self.current(away)
+            score = 1.0 if hg > ag else (0.5 if hg == ag else 0.0)
+            delta = self.k * goal_multiplier(hg - ag) * (score - expected_home(r_home, r_away, self.home_adv))
+            self._append(home, date, r_home + delta)
+            self._append(away, date, r_away - delta)
+
+        self.n_matches += len(dates)
+        if len(dates):
+            self.last_date = int(dates[-1])
+        return len(dates)
+
+    def _append(self, team, date, rating):
+        self._dates.setdefault(team, []).append(date)
+        self._ratings.setdefault(team, []).append(rating)
+
+    def rating(self, team, date):
+        """Rating della squadra prima della data (ultima partita con data < date)."""
+        dates = self._dates.get(team)
+        if not dates:
+            return self.start
+        i = bisect_left(dates, _to_ns(date))
+        return self._ratings[team][i - 1] if i > 0 else self.start
+
+    def history(self, team):
+        """Serie temporale del rating (indice = data partita)."""
+        dates = self._dates.get(team, [])
+        return pd.Series(self._ratings.get(team, []), index=pd.to_datetime(dates), name=team)
+
+    def match(self, home, away, date):
+        """Rating delle due squadre alla data e punteggio atteso della squadra di casa."""
+        r_home, r_away = float(self.rating(home, date)), float(self.rating(away, date))
+        return {
+            "home": round(r_home, 1),
+            "away": round(r_away, 1),
+            "diff": round(r_home + self.home_adv - r_away, 1),
+            "home_expectancy": round(expected_home(r_home, r_away, self.home_adv), 4),
+        }
+
+    def table(self, date=None):
+        """Classifica Elo di tutte le squadre (alla data, o attuale)."""
+        teams = sorted(self._ratings)
+        values = [self.rating(t, date) if date is not None else self.current(t) for t in teams]
+        table = pd.DataFrame({'team': teams, 'elo': values})
+        return table.sort_values('elo', ascending=False, kind='mergesort').reset_index(drop=True)
+
+def attach(result, elo, home, away, date):
+    """
+    Aggiunge a un risultato del motore il blocco 'elo' (rating alla data, punteggio atteso Elo)
+    e, come controllo di coerenza, il punteggio atteso del modello: P(1) + P(X) / 2.
+    """
+    if elo is None or 'error' in result:
+        return result
+    block = elo.match(home, away, date)
+    probs = result.get('probabilities')
+    if probs:
+        model = (probs['1'] + probs['X'] / 2) / 100
+        block['model_expectancy'] = round(model, 4)
+        block['gap'] = round(model - block['home_expectancy'], 4)
+    result['elo'] = block
+    return result
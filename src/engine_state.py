@@ -0,0 +1,251 @@
+"""
+Stato incrementale del motore: quando arrivano nuovi risultati (es. una giornata in più nel CSV
+della stagione corrente) aggiorna solo ciò che cambia invece di ripartire da zero.
+
+- indice del motore (build_engine_index): le nuove righe vengono accodate e solo le squadre
+  coinvolte ricevono nuovi indici di riga;
+- finestra Lega (ultime N_GAMES_LEAGUE righe del dataset, come nel motore): somme e conteggi
+  correnti aggiornati riga per riga (entra la nuova, esce la più vecchia);
+- finestre squadra (ultime N_GAMES_TEAM partite): medie pesate ricalcolate solo per le squadre coinvolte;
+- versione: `version` del dataset, incrementata a ogni ingest. Niente versioni per squadra/lega:
+  la finestra Lega è globale (vedi Nota), quindi le cache a valle invalidano per data (server.ingest).
+
+Le previsioni di partite successive all'ultima data del dataset (predict) usano lo stato
+incrementale; le altre passano dal motore batch sull'indice. L'output è lo stesso di
+calculate_slate_predictions.
+
+Nota: come nel motore, la finestra "Lega" è quella del DataFrame passato (tutto il dataset
+nella app), quindi ogni ingest la sposta per tutte le partite successive alle nuove righe.
+"""
+import numpy as np
+import pandas as pd
+
+from . import implied_xg, stats_engine
+from .stats_engine import LEAGUE_MEAN_COLUMNS, N_GAMES_LEAGUE, N_GAMES_TEAM
+
+MATCH_KEY = ['Date', 'HomeTeam', 'AwayTeam']     # Una partita: righe con la stessa chiave sono duplicati
+
+class EngineState:
+    def __init__(self, df, engine_index=None, elo=None):
+        self.df = df.sort_values('Date', kind='mergesort').reset_index(drop=True)
+        index = engine_index if engine_index is not None else stats_engine.build_engine_index(self.df)
+        # Copia dei dizionari che ingest modifica: l'indice passato (es. quello dello snapshot) resta intatto
+        self.index = dict(index, cols=dict(index['cols']), team_rows=dict(index['team_rows']))
+        # EloRatings opzionale (src/elo.py): aggiornato a ogni ingest (su una copia), blocco 'elo' nelle previsioni
+        self.elo = elo.copy() if elo is not None else None
+
+        self.version = 0
+
+        self._rebuild_derived()
+
+    # --- STATO DERIVATO ---
+
+    def _rebuild_derived(self):
+        """Somme della finestra Lega e componenti di tutte le squadre, da zero."""
+        n = self.index['n_rows']
+        start = max(0, n - N_GAMES_LEAGUE)
+        values = stats_engine._league_window_values(self.index['cols'], slice(start, n))
+        self._league_sum = {col: float(np.nansum(v)) for col, v in values.items()}
+        self._league_count = {col: int((~np.isnan(v)).sum()) for col, v in values.items()}
+        self._team_components = {}
+        for team in self.index['team_rows']:
+            self._update_team(team)
+
+    def _update_team(self, team):
+        rows = self.index['team_rows'].get(team)
+        window = rows[-N_GAMES_TEAM:] if rows is not None else ()
+        if len(window) < 5:
+            self._team_components.pop(team, None)
+            return
+        self._team_components[team] = stats_engine._team_window_components(self.index, team, window)
+
+    def _shift_league_window(self, new_rows):
+        """Finestra Lega: entrano le righe nuove, escono quelle oltre N_GAMES_LEAGUE."""
+        cols = self.index['cols']
+        n_after = self.index['n_rows']
+        n_before = n_after - len(new_rows)
+        old_start = max(0, n_before - N_GAMES_LEAGUE)
+        new_start = max(0, n_after - N_GAMES_LEAGUE)
+
+        for rows, sign in ((new_rows, 1), (np.arange(old_start, new_start), -1)):
+            if len(rows) == 0:
+                continue
+            for col, v in stats_engine._league_window_values(cols, rows).items():
+                valid = ~np.isnan(v)
+                self._league_sum[col] += sign * float(v[valid].sum())
+                self._league_count[col] += sign * int(valid.sum())
+
+    def league_params(self):
+        """Calibrazione Lega all'ultima data del dataset (dalle somme correnti, O(1))."""
+        means = {
+            col: (np.float64(self._league_sum[col]) / self._league_count[col]) if self._league_count[col] else np.nan
+            for col in LEAGUE_MEAN_COLUMNS
+        }
+        n = self.index['n_rows']
+        return stats_engine._league_params_from_means(means, int(n - max(0, n - N_GAMES_LEAGUE)))
+
+    # --- INGEST ---
+
+    def ingest(self, rows):
+        """
+        Aggiunge nuove partite (DataFrame con le colonne del dataset) e aggiorna solo lo stato coinvolto.
+        Righe già presenti (stessa Date, HomeTeam, AwayTeam) vengono ignorate.
+        Righe più vecchie dell'ultima data già presente -> ricostruzione completa (dati corretti a ritroso).
+        Restituisce un riepilogo: version, teams, leagues, league_seasons, min_date, rows, rebuilt.
+        """
+        if rows is None or len(rows) == 0:
+            return self._empty_summary()
+
+        rows = rows.copy()
+        rows['Date'] = pd.to_datetime(rows['Date'])
+        # Righe già presenti (retry di /ingest, giornata del CSV riletta) contate una volta sola
+        rows = rows.drop_duplicates(MATCH_KEY, keep='last')
+        recent = self.df[self.df['Date'] >= rows['Date'].min()]
+        rows = rows[~pd.MultiIndex.from_frame(rows[MATCH_KEY]).isin(pd.MultiIndex.from_frame(recent[MATCH_KEY]))]
+        if rows.empty:
+            return self._empty_summary()
+        if 'implied_xg_home' in self.df.columns and 'implied_xg_home' not in rows.columns:
+            rows = implied_xg.add_columns(rows)
+        rows = rows.sort_values('Date', kind='mergesort').reset_index(drop=True)
+
+        last_date = self.index['dates'][-1] if self.index['n_rows'] else None
+        rebuilt = last_date is not None and rows['Date'].min() < pd.Timestamp(last_date)
+
+        self.df = pd.concat([self.df, rows], ignore_index=True)
+        if rebuilt:
+            self.df = self.df.sort_values('Date', kind='mergesort').reset_index(drop=True)
+            self.index = stats_engine.build_engine_index(self.df)
+            self._rebuild_derived()
+            if self.elo is not None:
+                self.elo = type(self.elo).from_frame(self.df, k=self.elo.k, home_adv=self.elo.home_adv,
+                                                     start=self.elo.start)
+        else:
+            if self.elo is not None:
+                self.elo.update(rows)
+            new_rows = self._append_to_index(rows)
+            self._shift_league_window(new_rows)
+
+        teams = set(rows['HomeTeam']) | set(rows['AwayTeam'])
+        if not rebuilt:
+            for team in teams:
+                self._update_team(team)
+
+        self.version += 1
+        leagues = set(rows['League']) if 'League' in rows else set()
+        league_seasons = set(zip(rows['League'], rows['Season'])) if {'League', 'Season'} <= set(rows.columns) else set()
+
+        return {
+            'version': self.version,
+            'teams': teams,
+            'leagues': leagues,
+            'league_seasons': league_seasons,
+            'min_date': rows['Date'].min(),
+            'rows': len(rows),
+            'rebuilt': rebuilt,
+        }
+
+    def _empty_summary(self):
+        return {'version': self.version, 'teams': set(), 'leagues': set(), 'league_seasons': set(),
+                'min_date': None, 'rows': 0, 'rebuilt': False}
+
+    def _append_to_index(self, rows):
+        """Accoda le righe (già in ordine di data, non precedenti all'ultima) all'indice; ritorna i loro indici."""
+        index = self.index
+        n_before = index['n_rows']
+        n_new = len(rows)
+        new_idx = np.arange(n_before, n_before + n_new)
+
+        for col in stats_engine.ENGINE_COLUMNS:
+            if col in rows.columns:
+                values = pd.to_numeric(rows[col], errors='coerce').to_numpy(dtype=float)
+            else:
+                values = np.full(n_new, np.nan)
+            index['cols'][col] = np.concatenate([index['cols'][col], values])
+
+        home = rows['HomeTeam'].to_numpy(dtype=object)
+        away = rows['AwayTeam'].to_numpy(dtype=object)
+        index['home'] = np.concatenate([index['home'], home])
+        index['away'] = np.concatenate([index['away'], away])
+        index['dates'] = np.concatenate([index['dates'], rows['Date'].to_numpy(dtype='datetime64[ns]')])
+        index['n_rows'] = n_before + n_new
+
+        # Solo le squadre coinvolte ricevono nuove righe
+        for team in set(home) | set(away):
+            mine = new_idx[(home == team) | (away == team)]
+            current = index['team_rows'].get(team)
+            index['team_rows'][team] = mine if current is None else np.concatenate([current, mine])
+        return new_idx
+
+    # --- PREVISIONI ---
+
+    def predict(self, fixtures):
+        """
+        Come calculate_slate_predictions sul dataset corrente. Le partite successive all'ultima data
+        usano finestra Lega e finestre squadra incrementali; le altre il motore batch.
+        """
+        if not fixtures:
+            return []
+        if self.index['n_rows'] == 0:
+            return stats_engine.calculate_slate_predictions(self.df, fixtures, self.index)
+
+        last_date = self.index['dates'][-1]
+        target_dts = pd.to_datetime([fx['date'] for fx in fixtures]).values.astype('datetime64[ns]')
+        latest = target_dts > last_date
+
+        results = [None] * len(fixtures)
+        others = [i for i in range(len(fixtures)) if not latest[i]]
+        if others:
+            computed = stats_engine.calculate_slate_predictions(self.df, [fixtures[i] for i in others], self.index,
+                                                                elo=self.elo)
+            for i, res in zip(others, computed):
+                results[i] = res
+
+        latest_idx = [i for i in range(len(fixtures)) if latest[i]]
+        if latest_idx:
+            league = self.league_params()
+            for i, res in zip(latest_idx, self._predict_latest([fixtures[i] for i in latest_idx], league)):
+                results[i] = res
+                if self.elo is not None:
+                    from .elo import attach
+                    attach(res, self.elo, fixtures[i]['home'], fixtures[i]['away'], fixtures[i]['date'])
+        return results
+
+    def _predict_latest(self, fixtures, league):
+        b, c, d = league['coef_b'], league['coef_c'], league['coef_d']
+        std = league['anchor_std']
+        results = [None] * len(fixtures)
+        valid, xg_home_list, xg_away_list = [], [], []
+
+        for i, fx in enumerate(fixtures):
+            match_info = {"date": fx['date'], "home": fx['home'], "away": fx['away']}
+            comp_home = self._team_components.get(fx['home'])
+            if comp_home is None:
+                results[i] = {"error": f"Dati insufficienti per {fx['home']}", "match_info": match_info}
+                continue
+            comp_away = self._team_components.get(fx['away'])
+            if comp_away is None:
+                results[i] = {"error": f"Dati insufficienti per {fx['away']}", "match_info": match_info}
+                continue
+            home_stats = stats_engine._team_stats_from_components(comp_home, b, c, d)
+            away_stats = stats_engine._team_stats_from_components(comp_away, b, c, d)
+
+            att_home_adj = home_stats['attacco_raw'] * fx.get('delta_att_home', 1.00)
+            def_home_adj = home_stats['difesa_raw'] * fx.get('delta_def_home', 1.00)
+            att_away_adj = away_stats['attacco_raw'] * fx.get('delta_att_away', 1.00)
+            def_away_adj = away_stats['difesa_raw'] * fx.get('delta_def_away', 1.00)
+
+            xg_home = (att_home_adj / std) * (def_away_adj / std) * league['anchor_home']
+            xg_away = (att_away_adj / std) * (def_home_adj / std) * league['anchor_away']
+
+            results[i] = stats_engine._prediction_payload(match_info, league, home_stats, away_stats, xg_home, xg_away)
+            valid.append(i)
+            xg_home_list.append(xg_home)
+            xg_away_list.append(xg_away)
+
+        if valid:
+            probs_list = stats_engine._calculate_probabilities_batch(np.array(xg_home_list), np.array(xg_away_list))
+            for i, probs_data in zip(valid, probs_list):
+                results[i]["odds"] = probs_data['odds']
+                results[i]["probabilities"] = probs_data['probs_pct']
+                results[i]["exact_score_top5"] = probs_data['top_5_scores']
+        return results
@@ -1,15 +1,111 @@
+import asyncio
+from collections import OrderedDict
+
 import pandas as pd
 import numpy as np
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import ipywidgets as widgets
-from IPython.display import display, clear_output
-from .data_loader import load_all_data
+from .data_loader import load_cached_data
+from .indicators import IndicatorStore
+
+# plotly / ipywidgets vengono importati solo al primo utilizzo (avvio più rapido)
+
+# Rendering grafico: oltre MAX_PLOT_POINTS partite la serie viene ridotta (min/max per blocco),
+# oltre WEBGL_THRESHOLD punti si usa Scattergl (WebGL) invece di Scatter (SVG)
+MAX_PLOT_POINTS = 1500
+WEBGL_THRESHOLD = 500
+OUTCOME_COLORS = {'W': '#00cc00', 'D': '#ffcc00', 'L': '#ff0000'}
+
+# Widget: cache degli stadi (voci) e attesa prima di ridisegnare dopo una raffica di eventi (secondi)
+STAGE_CACHE_SIZE = 64
+FIGURE_CACHE_SIZE = 16
+DEBOUNCE_SECONDS = 0.25
+
+def _lru_get(cache, key):
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key]
+    return None
+
+def _lru_put(cache, key, value, max_size):
+    cache[key] = value
+    while len(cache) > max_size:
+        cache.popitem(last=False)
+
+class Debouncer:
+    """
+    Chiama fn una sola volta, `wait` secondi dopo l'ultimo di una raffica di eventi.
+    Usa l'event loop del kernel Jupyter (fn gira nel thread principale, come i callback dei widget);
+    senza un loop attivo chiama fn subito.
+    """
+
+    def __init__(self, fn, wait=DEBOUNCE_SECONDS):
+        self.fn = fn
+        self.wait = wait
+        self._handle = None
+
+    def __call__(self, *args):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        try:
+            loop = asyncio.get_event_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None or not loop.is_running():
+            self.fn()
+            return
+        self._handle = loop.call_later(self.wait, self._fire)
+
+    def _fire(self):
+        self._handle = None
+        self.fn()
+
+def team_equity(df, method):
+    """
+    Curve di equity dal punto di vista di ogni squadra, per (League, Season, Team), in un passaggio:
+    ogni partita GIOCATA diventa due righe (casa e trasferta), esito con np.select,
+    Equity con somma cumulata e MatchNum con contatore per gruppo.
+    Righe ordinate per League, Season, Team, Date; colonne originali + Team, Opponent, Outcome, Equity, MatchNum.
+    """
+    # --- FILTRO AGGIUNTIVO: Solo partite GIOCATE (gol presenti, data non futura) ---
+    df = df.dropna(subset=['home_goals', 'away_goals'])
+    df = df[df['Date'] <= pd.Timestamp.now()]
+    if df.empty:
+        return pd.DataFrame()
+
+    # Reshape punto di vista squadra: prima tutte le righe "casa", poi tutte le "trasferta"
+    is_home = np.concatenate([np.ones(len(df), dtype=bool), np.zeros(len(df), dtype=bool)])
+    long = pd.concat([df, df], ignore_index=True)
+    long['Team'] = np.where(is_home, long['HomeTeam'], long['AwayTeam'])
+    long['Opponent'] = np.where(is_home, long['AwayTeam'], long['HomeTeam'])
+
+    gh = long['home_goals'].to_numpy()
+    ga = long['away_goals'].to_numpy()
+    goal_diff = np.where(is_home, gh - ga, ga - gh)
+    long['Outcome'] = np.select([goal_diff > 0, goal_diff < 0], ['W', 'L'], default='D')
+    if method == 'points':
+        values = np.select([goal_diff > 0, goal_diff < 0], [3, 0], default=1)
+    else:
+        values = np.select([goal_diff > 0, goal_diff < 0], [1, -1], default=0)
+    long['_val'] = values
+
+    keys = ['League', 'Season', 'Team']
+    long = long.sort_values(keys + ['Date'], kind='mergesort')
+    grouped = long.groupby(keys, sort=False)
+    long['Equity'] = grouped['_val'].cumsum()
+    long['MatchNum'] = grouped.cumcount() + 1
+    return long.drop(columns=['_val'])
 
 class DashboardTecnica:
     def __init__(self):
-        self.df = load_all_data()
-        
+        self.df = load_cached_data()
+        # (lega, stagione, metodo) -> {squadra: DataFrame con Equity/Outcome/MatchNum/Opponent}
+        self._equity_cache = {}
+        # Stato SMA/EMA/RSI per squadra, persistito accanto allo snapshot del dataset
+        self.indicator_store = IndicatorStore()
+        # Cache degli stadi della dashboard (vedi _stage_team / _stage_figure)
+        self._stage_cache = OrderedDict()
+        self._figure_cache = OrderedDict()
+
     def _calculate_rsi_wilder(self, series, period=5):
         delta = series.diff()
         gain = delta.where(delta > 0, 0)
@@ -21,72 +117,118 @@ class DashboardTecnica:
         return rsi.fillna(50)
 
     def _prepare_team_data(self, team, league, season, method):
-        # Filtro base
-        mask = (self.df['League'] == league) & \
-               (self.df['Season'] == season) & \
-               ((self.df['HomeTeam'] == team) | (self.df['AwayTeam'] == team))
-        
-        tdf = self.df[mask].sort_values('Date').copy().reset_index(drop=True)
-        if tdf.empty: return pd.DataFrame()
+        # Le curve di tutta la lega/stagione sono calcolate una volta sola: qui è una lookup
+        tdf = self._league_equity(league, season, method).get(team)
+        if tdf is None: return pd.DataFrame()
+        return tdf.copy()  # _add_indicators aggiunge colonne: la cache resta intatta
 
-        # --- FILTRO AGGIUNTIVO: Solo partite GIOCATE ---
-        # 1. Elimina righe dove mancano i gol (partite future nel calendario)
-        tdf = tdf.dropna(subset=['home_goals', 'away_goals'])
-        
-        # 2. Elimina partite con data futura rispetto ad oggi (sicurezza extra)
-        tdf = tdf[tdf['Date'] <= pd.Timestamp.now()]
-        
-        # Se dopo il filtro è vuoto, ritorna
-        if tdf.empty: return pd.DataFrame()
-        
-        equity_vals = []
-        outcomes = []
-        curr_eq = 0
-        
-        for _, row in tdf.iterrows():
-            is_home = (row['HomeTeam'] == team)
-            gh = row['home_goals']
-            ga = row['away_goals']
-            
-            if gh == ga: res = 'D'
-            elif gh > ga: res = 'H'
-            else: res = 'A'
-            
-            val = 0
-            outcome = 'D'
-            
-            if res == 'D':
-                val = 1 if method == 'points' else 0
-                outcome = 'D'
-            elif (is_home and res == 'H') or (not is_home and res == 'A'):
-                val = 3 if method == 'points' else 1
-                outcome = 'W'
-            else:
-                val = 0 if method == 'points' else -1
-                outcome = 'L'
-            
-            curr_eq += val
-            equity_vals.append(curr_eq)
-            outcomes.append(outcome)
-            
-        tdf['Equity'] = equity_vals
-        tdf['Outcome'] = outcomes
-        tdf['MatchNum'] = range(1, len(tdf) + 1)
-        tdf['Opponent'] = np.where(tdf['HomeTeam'] == team, tdf['AwayTeam'], tdf['HomeTeam'])
-        
-        return tdf
+    def _league_equity(self, league, season, method):
+        """
+        Equity, Outcome, MatchNum e Opponent di TUTTE le squadre di una lega/stagione in un passaggio
+        (team_equity). Cache per (lega, stagione, metodo) -> {squadra: DataFrame}.
+        """
+        key = (league, season, method)
+        if key in self._equity_cache:
+            return self._equity_cache[key]
+
+        mask = (self.df['League'] == league) & (self.df['Season'] == season)
+        long = team_equity(self.df[mask], method)
+        if long.empty:
+            self._equity_cache[key] = {}
+            return self._equity_cache[key]
+
+        teams = {team: tdf.drop(columns=['Team']).reset_index(drop=True) for team, tdf in long.groupby('Team', sort=False)}
+        self._equity_cache[key] = teams
+        return teams
 
-    def _add_indicators(self, df, params):
+    def ingest(self, rows):
+        """
+        Aggiunge nuove partite al dataset della dashboard e invalida solo le cache delle
+        (lega, stagione) coinvolte; lo stato degli indicatori (IndicatorStore) elabora poi
+        solo le partite nuove di ogni serie.
+        """
+        if rows is None or len(rows) == 0:
+            return set()
+        rows = rows.copy()
+        rows['Date'] = pd.to_datetime(rows['Date'])
+        self.df = pd.concat([self.df, rows], ignore_index=True).sort_values('Date', kind='mergesort').reset_index(drop=True)
+        affected = set(zip(rows['League'], rows['Season']))
+        self.invalidate(affected)
+        return affected
+
+    def invalidate(self, league_seasons):
+        """Rimuove curve, stadi e figure delle (lega, stagione) indicate."""
+        for key in [k for k in self._equity_cache if k[:2] in league_seasons]:
+            del self._equity_cache[key]
+        for key in [k for k in self._stage_cache if k[:2] in league_seasons]:
+            del self._stage_cache[key]
+        # Le chiavi figura contengono le chiavi degli stadi squadra
+        for key in [k for k in self._figure_cache
+                    if any(sk is not None and sk[:2] in league_seasons for sk in k[:2])]:
+            del self._figure_cache[key]
+
+    def _add_indicators(self, df, params, key=None):
+        # Indicatori incrementali (src/indicators.py): con `key` lo stato della serie è riusato
+        # e salvato, quindi solo le partite nuove vengono elaborate. Valori identici a pandas
+        # rolling / ewm / _calculate_rsi_wilder.
         if df.empty: return df
-        eq = df['Equity']
-        if params['sma_s_on']: df['SMA_S'] = eq.rolling(window=params['sma_s_val']).mean()
-        if params['sma_m_on']: df['SMA_M'] = eq.rolling(window=params['sma_m_val']).mean()
-        if params['ema_s_on']: df['EMA_S'] = eq.ewm(span=params['ema_s_val'], adjust=False).mean()
-        if params['ema_m_on']: df['EMA_M'] = eq.ewm(span=params['ema_m_val'], adjust=False).mean()
-        if params['rsi_on']: df['RSI'] = self._calculate_rsi_wilder(eq, period=5)
+        eq = df['Equity'].tolist()
+        if key is None:
+            key = ('_temp', id(df))
+            store = IndicatorStore(path=None)
+        else:
+            store = self.indicator_store
+
+        def values(kind, param):
+            return np.asarray(store.values(key, eq, kind, param), dtype=float)
+
+        if params['sma_s_on']: df['SMA_S'] = values('sma', params['sma_s_val'])
+        if params['sma_m_on']: df['SMA_M'] = values('sma', params['sma_m_val'])
+        if params['ema_s_on']: df['EMA_S'] = values('ema', params['ema_s_val'])
+        if params['ema_m_on']: df['EMA_M'] = values('ema', params['ema_m_val'])
+        if params['rsi_on']: df['RSI'] = values('rsi', 5)
+        store.save()
         return df
 
+    @staticmethod
+    def _downsample(df, max_points=MAX_PLOT_POINTS):
+        """
+        Riduce una serie lunga a circa max_points righe: per ogni blocco tiene prima, ultima,
+        minimo e massimo di Equity (la forma della curva resta visibile). Serie corte invariate.
+        """
+        n = len(df)
+        if n <= max_points:
+            return df
+        n_blocks = max(1, max_points // 4)
+        block = np.arange(n) * n_blocks // n
+        eq = df['Equity'].to_numpy()
+        starts = np.flatnonzero(np.r_[True, block[1:] != block[:-1]])
+        ends = np.r_[starts[1:], n] - 1
+        mins = starts + np.array([eq[a:b + 1].argmin() for a, b in zip(starts, ends)])
+        maxs = starts + np.array([eq[a:b + 1].argmax() for a, b in zip(starts, ends)])
+        keep = np.unique(np.concatenate([starts, ends, mins, maxs]))
+        return df.iloc[keep]
+
+    @staticmethod
+    def _outcome_segments(x, y, outcomes, outcome):
+        """Segmenti (k -> k+1) che terminano con `outcome`, in un'unica serie separata da NaN."""
+        sel = np.flatnonzero(outcomes[1:] == outcome)
+        gap = np.full(len(sel), np.nan)
+        xs = np.column_stack([x[sel], x[sel + 1], gap]).ravel()
+        ys = np.column_stack([y[sel], y[sel + 1], gap]).ravel()
+        return xs, ys
+
     def _plot_graph(self, data1, name1, data2=None, name2=None, params=None):
+        from IPython.display import display
+
+        fig = self._build_figure(data1, name1, data2, name2, params)
+        if fig is not None:
+            display(fig)
+
+    def _build_figure(self, data1, name1, data2=None, name2=None, params=None):
+        import plotly.graph_objects as go
+        from plotly.subplots import make_subplots
+
         rows_config = []
         rows_config.append(('eq', data1, name1))
         if params['rsi_on']: rows_config.append(('rsi', data1, ""))
@@ -96,7 +238,7 @@ class DashboardTecnica:
             if params['rsi_on']: rows_config.append(('rsi', data2, ""))
             
         n_rows = len(rows_config)
-        if n_rows == 0: return
+        if n_rows == 0: return None
 
         # Layout Respiro: 70% Equity, 30% RSI
         specs = []
@@ -124,16 +266,23 @@ class DashboardTecnica:
             row_idx = i + 1
             
             if r_type == 'eq':
-                colors = {'W': '#00cc00', 'D': '#ffcc00', 'L': '#ff0000'}
-                for k in range(len(df)-1):
-                    curr, nxt = df.iloc[k], df.iloc[k+1]
-                    fig.add_trace(go.Scatter(
-                        x=[curr['MatchNum'], nxt['MatchNum']], y=[curr['Equity'], nxt['Equity']],
-                        mode='lines', line=dict(color=colors.get(nxt['Outcome'], '#888'), width=3),
-                        showlegend=False, hoverinfo='skip'
+                full_df = df
+                df = self._downsample(df)
+                Scatter = go.Scattergl if len(df) > WEBGL_THRESHOLD else go.Scatter
+
+                # Linea colorata per esito: una traccia per colore (numero di tracce costante)
+                x = df['MatchNum'].to_numpy(dtype=float)
+                y = df['Equity'].to_numpy(dtype=float)
+                outcomes = df['Outcome'].to_numpy()
+                for outcome, color in OUTCOME_COLORS.items():
+                    xs, ys = self._outcome_segments(x, y, outcomes, outcome)
+                    if len(xs) == 0: continue
+                    fig.add_trace(Scatter(
+                        x=xs, y=ys, mode='lines', line=dict(color=color, width=3),
+                        connectgaps=False, showlegend=False, hoverinfo='skip'
                     ), row=row_idx, col=1)
                 
-                fig.add_trace(go.Scatter(
+                fig.add_trace(Scatter(
                     x=df['MatchNum'], y=df['Equity'], mode='markers',
                     marker=dict(color='black', size=6, line=dict(width=1, color='white')),
                     text=df['Date'].dt.strftime('%d/%m') + " vs " + df['Opponent'],
@@ -141,27 +290,67 @@ class DashboardTecnica:
                     showlegend=False
                 ), row=row_idx, col=1)
                 
-                if params['sma_s_on'] and 'SMA_S' in df: fig.add_trace(go.Scatter(x=df['MatchNum'], y=df['SMA_S'], line=dict(color='royalblue', width=1.5), name=f"SMA {params['sma_s_val']}", showlegend=(row_idx==1)), row=row_idx, col=1)
-                if params['sma_m_on'] and 'SMA_M' in df: fig.add_trace(go.Scatter(x=df['MatchNum'], y=df['SMA_M'], line=dict(color='orange', width=1.5), name=f"SMA {params['sma_m_val']}", showlegend=(row_idx==1)), row=row_idx, col=1)
-                if params['ema_s_on'] and 'EMA_S' in df: fig.add_trace(go.Scatter(x=df['MatchNum'], y=df['EMA_S'], line=dict(color='cyan', width=1, dash='dot'), name=f"EMA {params['ema_s_val']}", showlegend=(row_idx==1)), row=row_idx, col=1)
-                if params['ema_m_on'] and 'EMA_M' in df: fig.add_trace(go.Scatter(x=df['MatchNum'], y=df['EMA_M'], line=dict(color='magenta', width=1, dash='dot'), name=f"EMA {params['ema_m_val']}", showlegend=(row_idx==1)), row=row_idx, col=1)
+                if params['sma_s_on'] and 'SMA_S' in df: fig.add_trace(Scatter(x=df['MatchNum'], y=df['SMA_S'], line=dict(color='royalblue', width=1.5), name=f"SMA {params['sma_s_val']}", showlegend=(row_idx==1)), row=row_idx, col=1)
+                if params['sma_m_on'] and 'SMA_M' in df: fig.add_trace(Scatter(x=df['MatchNum'], y=df['SMA_M'], line=dict(color='orange', width=1.5), name=f"SMA {params['sma_m_val']}", showlegend=(row_idx==1)), row=row_idx, col=1)
+                if params['ema_s_on'] and 'EMA_S' in df: fig.add_trace(Scatter(x=df['MatchNum'], y=df['EMA_S'], line=dict(color='cyan', width=1, dash='dot'), name=f"EMA {params['ema_s_val']}", showlegend=(row_idx==1)), row=row_idx, col=1)
+                if params['ema_m_on'] and 'EMA_M' in df: fig.add_trace(Scatter(x=df['MatchNum'], y=df['EMA_M'], line=dict(color='magenta', width=1, dash='dot'), name=f"EMA {params['ema_m_val']}", showlegend=(row_idx==1)), row=row_idx, col=1)
 
-                ymin, ymax = df['Equity'].min(), df['Equity'].max()
+                ymin, ymax = full_df['Equity'].min(), full_df['Equity'].max()
                 delta = ymax - ymin if ymax != ymin else 1
                 pad = delta * 0.25
                 fig.update_yaxes(range=[ymin - pad, ymax + pad], row=row_idx, col=1)
 
             else:
-                fig.add_trace(go.Scatter(x=df['MatchNum'], y=df['RSI'], line=dict(color='#8e44ad', width=2), showlegend=False), row=row_idx, col=1)
+                rsi_df = self._downsample(df)
+                Scatter = go.Scattergl if len(rsi_df) > WEBGL_THRESHOLD else go.Scatter
+                fig.add_trace(Scatter(x=rsi_df['MatchNum'], y=rsi_df['RSI'], line=dict(color='#8e44ad', width=2), showlegend=False), row=row_idx, col=1)
                 fig.add_shape(type="line", x0=0, x1=len(df)+1, y0=70, y1=70, line=dict(color="red", dash="dot"), row=row_idx, col=1)
                 fig.add_shape(type="line", x0=0, x1=len(df)+1, y0=30, y1=30, line=dict(color="green", dash="dot"), row=row_idx, col=1)
                 fig.update_yaxes(range=[0, 100], row=row_idx, col=1)
 
         total_h = 500 if data2 is None else 900
         fig.update_layout(template="plotly_white", height=total_h, margin=dict(t=40, b=30, l=50, r=40), hovermode="x unified")
-        display(fig)
+        return fig
+
+    # --- PIPELINE A STADI (squadra -> indicatori -> figura) ---
+    # Ogni stadio ha la sua cache: una modifica invalida solo gli stadi successivi
+    # (es. cambiare il periodo EMA ricalcola indicatori e figura, non i dati squadra).
+
+    @staticmethod
+    def _indicator_key(params):
+        """Solo i parametri degli indicatori attivi: un periodo di un indicatore spento non invalida nulla."""
+        key = []
+        for name in ('sma_s', 'sma_m', 'ema_s', 'ema_m'):
+            if params[f'{name}_on']:
+                key.append((name, params[f'{name}_val']))
+        if params['rsi_on']:
+            key.append(('rsi', 5))
+        return tuple(key)
+
+    def _stage_team(self, team, league, season, method, params):
+        """Stadi 1+2: dati squadra con indicatori, in cache per (squadra, parametri indicatori attivi)."""
+        key = (league, season, method, team, self._indicator_key(params))
+        df = _lru_get(self._stage_cache, key)
+        if df is None:
+            df = self._prepare_team_data(team, league, season, method)
+            if not df.empty:
+                df = self._add_indicators(df, params, key=(league, season, method, team))
+            _lru_put(self._stage_cache, key, df, STAGE_CACHE_SIZE)
+        return key, df
+
+    def _stage_figure(self, key1, df1, name1, key2=None, df2=None, name2=None, params=None):
+        """Stadio 3: figura, in cache per (chiavi degli stadi precedenti)."""
+        key = (key1, key2, name2, params['rsi_on'])
+        fig = _lru_get(self._figure_cache, key)
+        if fig is None:
+            fig = self._build_figure(df1, name1, df2, name2, params)
+            _lru_put(self._figure_cache, key, fig, FIGURE_CACHE_SIZE)
+        return fig
 
     def show_interface(self):
+        import ipywidgets as widgets
+        from IPython.display import display, clear_output
+
         if self.df.empty:
             print("❌ Nessun dato caricato.")
             return
@@ -199,7 +388,7 @@ class DashboardTecnica:
             
         def toggle_team2(*args): w_team2.disabled = not w_show_team2.value; update_graph()
 
-        def update_graph(*args):
+        def render():
             with out:
                 clear_output(wait=True)
                 if not w_team1.value: return
@@ -209,27 +398,31 @@ class DashboardTecnica:
                           'ema_s_on': w_chk_ema_s.value, 'ema_s_val': w_sli_ema_s.value,
                           'ema_m_on': w_chk_ema_m.value, 'ema_m_val': w_sli_ema_m.value,
                           'rsi_on': w_chk_rsi.value}
-                
-                # 1. Carica dati
-                df1 = self._prepare_team_data(w_team1.value, w_league.value, w_season.value, w_method.value)
-                
-                # 2. SE i dati esistono, calcola indicatori (QUESTO MANCAVA PRIMA!)
+                league, season, method = w_league.value, w_season.value, w_method.value
+
+                # 1-2. Dati squadra + indicatori (in cache per squadra e parametri degli indicatori attivi)
+                key1, df1 = self._stage_team(w_team1.value, league, season, method, params)
                 if not df1.empty:
-                    df1 = self._add_indicators(df1, params)
                     d_start = df1['Date'].iloc[0].strftime('%d/%m/%Y')
                     d_end = df1['Date'].iloc[-1].strftime('%d/%m/%Y')
                     print(f"📊 {w_team1.value}: {len(df1)} partite giocate ({d_start} -> {d_end})")
-                
-                df2 = None
+
+                key2, df2, name2 = None, None, None
                 if w_show_team2.value and w_team2.value:
-                    df2 = self._prepare_team_data(w_team2.value, w_league.value, w_season.value, w_method.value)
+                    name2 = w_team2.value
+                    key2, df2 = self._stage_team(name2, league, season, method, params)
                     if not df2.empty:
-                        df2 = self._add_indicators(df2, params) # Anche qui
                         d_start2 = df2['Date'].iloc[0].strftime('%d/%m/%Y')
                         d_end2 = df2['Date'].iloc[-1].strftime('%d/%m/%Y')
-                        print(f"📊 {w_team2.value}: {len(df2)} partite giocate ({d_start2} -> {d_end2})")
-                
-                self._plot_graph(df1, w_team1.value, df2, w_team2.value if w_show_team2.value else None, params)
+                        print(f"📊 {name2}: {len(df2)} partite giocate ({d_start2} -> {d_end2})")
+
+                # 3. Figura (in cache per le chiavi degli stadi precedenti)
+                fig = self._stage_figure(key1, df1, w_team1.value, key2, df2, name2, params)
+                if fig is not None:
+                    display(fig)
+
+        # Raffiche di eventi (trascinamento slider, cambio lega -> stagione -> squadre) -> un solo render
+        update_graph = Debouncer(render)
 
         w_league.observe(update_seasons, 'value')
         w_season.observe(update_teams, 'value')
@@ -249,7 +442,7 @@ class DashboardTecnica:
         ])
 
         display(widgets.VBox([box_data, widgets.HTML("<hr>"), box_tech, out]))
-        update_graph()
+        render()
 
 def mostra_dashboard():
     d = DashboardTecnica()
@@ -0,0 +1,163 @@
+"""
+xG implicite nelle quote: per ogni partita la coppia (lambda, mu) che, con lo stesso modello
+Poisson + Dixon-Coles del motore, riproduce le probabilità senza margine di 1X2 e Over/Under 2.5
+delle quote B365 dei CSV.
+
+    margine: probabilità implicite 1/quota normalizzate a somma 1 per mercato (1X2 e O/U separati)
+    sistema: P(1), P(2), P(Over2.5) del modello = quelle del mercato (3 equazioni, 2 incognite)
+    soluzione: minimi quadrati con Levenberg-Marquardt su (log lambda, log mu), tutte le partite insieme
+
+Ogni iterazione valuta le matrici di tutte le righe ancora attive in un colpo solo
+(stats_engine._score_matrix_batch); lo jacobiano è a differenze finite (2 valutazioni in più).
+Senza quote O/U la partita si risolve sul solo 1X2 (2 equazioni, 2 incognite).
+
+Colonne aggiunte al dataset (snapshot): implied_xg_home, implied_xg_away, implied_fit_error
+(scarto quadratico medio residuo sulle probabilità; NaN se mancano le quote 1X2).
+
+Esempio:
+    df = implied_xg.add_columns(df)
+    gap = implied_xg.compare(df.tail(100), stats_engine.calculate_slate_predictions(df, fixtures))
+"""
+import numpy as np
+
+from . import stats_engine
+
+IMPLIED_COLUMNS = ['implied_xg_home', 'implied_xg_away', 'implied_fit_error']
+
+MAX_ITER = 30
+TOLERANCE = 1e-9        # Passo massimo (in log-xG) sotto cui una riga è risolta
+STEP = 1e-6             # Incremento delle differenze finite
+CHUNK = 50_000          # Righe per blocco (memoria: blocco x MAX_GOALS^2 float)
+XG_BOUNDS = (0.05, 6.0)
+
+def demargin(odds):
+    """Quote (N, k) di un mercato -> probabilità senza margine (normalizzazione proporzionale)."""
+    inv = 1.0 / np.asarray(odds, dtype=float)
+    return inv / inv.sum(axis=1, keepdims=True)
+
+def _model(log_l, log_m):
+    """P(1), P(2), P(Over2.5) del modello del motore, (N, 3)."""
+    markets = stats_engine._market_probabilities_batch(
+        stats_engine._score_matrix_batch(np.exp(log_l), np.exp(log_m))
+    )
+    return np.column_stack([markets['1'], markets['2'], markets['Over2.5']])
+
+def _solve_chunk(targets, weights):
+    n = len(targets)
+    # Partenza: 2.6 gol totali, divisi secondo la differenza P(1) - P(2)
+    supremacy = 2.2 * (targets[:, 0] - targets[:, 1])
+    log_l = np.log(np.clip(1.3 + supremacy / 2, *XG_BOUNDS))
+    log_m = np.log(np.clip(1.3 - supremacy / 2, *XG_BOUNDS))
+
+    resid = (_model(log_l, log_m) - targets) * weights
+    cost = (resid ** 2).sum(axis=1)
+    damping = np.full(n, 1e-3)
+    active = np.arange(n)
+    lo, hi = np.log(XG_BOUNDS[0]), np.log(XG_BOUNDS[1])
+
+    for _ in range(MAX_ITER):
+        if not len(active):
+            break
+        a, b, w, t = log_l[active], log_m[active], weights[active], targets[active]
+        r = resid[active]
+        j_a = (_model(a + STEP, b) - t) * w - r
+        j_b = (_model(a, b + STEP) - t) * w - r
+        j_a /= STEP
+        j_b /= STEP
+
+        # Sistema normale 2x2 per riga (J'J + damping * diag) delta = -J'r, risolto in forma chiusa
+        h11 = (j_a * j_a).sum(axis=1)
+        h22 = (j_b * j_b).sum(axis=1)
+        h12 = (j_a * j_b).sum(axis=1)
+        g1 = (j_a * r).sum(axis=1)
+        g2 = (j_b * r).sum(axis=1)
+        d = damping[active]
+        m11, m22 = h11 * (1 + d) + 1e-12, h22 * (1 + d) + 1e-12
+        det = m11 * m22 - h12 * h12
+        delta_a = -(m22 * g1 - h12 * g2) / det
+        delta_b = -(m11 * g2 - h12 * g1) / det
+
+        new_a = np.clip(a + delta_a, lo, hi)
+        new_b = np.clip(b + delta_b, lo, hi)
+        new_r = (_model(new_a, new_b) - t) * w
+        new_cost = (new_r ** 2).sum(axis=1)
+
+        better = new_cost <= cost[active]
+        idx = active[better]
+        log_l[idx], log_m[idx] = new_a[better], new_b[better]
+        resid[idx], cost[idx] = new_r[better], new_cost[better]
+        damping[idx] /= 3
+        damping[active[~better]] *= 4
+
+        step = np.maximum(np.abs(delta_a), np.abs(delta_b))
+        done = (better & (step < TOLERANCE)) | (damping[active] > 1e8)
+        active = active[~done]
+
+    n_eq = weights.sum(axis=1)
+    return np.exp(log_l), np.exp(log_m), np.sqrt(cost / n_eq)
+
+def solve(odds_1x2, odds_ou=None):
+    """
+    xG implicite per N partite.
+    odds_1x2: (N, 3) quote 1, X, 2; odds_ou: (N, 2) quote Over, Under 2.5 (NaN ammessi).
+    Restituisce (xg_home, xg_away, fit_error), array di lunghezza N (NaN dove mancano le quote 1X2).
+    """
+    odds_1x2 = np.asarray(odds_1x2, dtype=float)
+    n = len(odds_1x2)
+    odds_ou = np.full((n, 2), np.nan) if odds_ou is None else np.asarray(odds_ou, dtype=float)
+
+    xg_home, xg_away, fit = np.full(n, np.nan), np.full(n, np.nan), np.full(n, np.nan)
+    valid = np.isfinite(odds_1x2).all(axis=1) & (odds_1x2 > 1).all(axis=1)
+    rows = np.flatnonzero(valid)
+    if not len(rows):
+        return xg_home, xg_away, fit
+
+    p_1x2 = demargin(odds_1x2[rows])
+    has_ou = np.isfinite(odds_ou[rows]).all(axis=1) & (odds_ou[rows] > 1).all(axis=1)
+    p_over = np.where(has_ou, demargin(np.where(has_ou[:, None], odds_ou[rows], 2.0))[:, 0], 0.0)
+    targets = np.column_stack([p_1x2[:, 0], p_1x2[:, 2], p_over])
+    weights = np.column_stack([np.ones(len(rows)), np.ones(len(rows)), has_ou.astype(float)])
+
+    for start in range(0, len(rows), CHUNK):
+        part = slice(start, start + CHUNK)
+        l, m, e = _solve_chunk(targets[part], weights[part])
+        xg_home[rows[part]], xg_away[rows[part]], fit[rows[part]] = l, m, e
+    return xg_home, xg_away, fit
+
+def add_columns(df):
+    """Aggiunge al DataFrame (colonne odds_* di config.COL_MAPPING) le colonne IMPLIED_COLUMNS."""
+    df = df.copy()
+    if not {'odds_1', 'odds_X', 'odds_2'} <= set(df.columns):
+        for col in IMPLIED_COLUMNS:
+            df[col] = np.nan
+        return df
+    odds_1x2 = df[['odds_1', 'odds_X', 'odds_2']].to_numpy(dtype=float)
+    odds_ou = (df[['odds_over25', 'odds_under25']].to_numpy(dtype=float)
+               if {'odds_over25', 'odds_under25'} <= set(df.columns) else None)
+    df['implied_xg_home'], df['implied_xg_away'], df['implied_fit_error'] = solve(odds_1x2, odds_ou)
+    return df
+
+def compare(rows, results):
+    """
+    xG del modello (risultati del motore, allineati a `rows`) contro xG implicite nelle quote:
+    una riga per partita con le due coppie e le differenze modello - mercato.
+    """
+    import pandas as pd
+
+    if not set(IMPLIED_COLUMNS) <= set(rows.columns):
+        rows = add_columns(rows)
+    model = [(r['xg_prediction']['xg_home'], r['xg_prediction']['xg_away']) if 'error' not in r else (np.nan, np.nan)
+             for r in results]
+    model = np.array(model, dtype=float).reshape(-1, 2)
+    table = pd.DataFrame({
+        'date': rows['Date'].to_numpy(),
+        'home': rows['HomeTeam'].to_numpy(),
+        'away': rows['AwayTeam'].to_numpy(),
+        'model_xg_home': model[:, 0],
+        'model_xg_away': model[:, 1],
+        'implied_xg_home': rows['implied_xg_home'].to_numpy(),
+        'implied_xg_away': rows['implied_xg_away'].to_numpy(),
+    })
+    table['gap_home'] = table['model_xg_home'] - table['implied_xg_home']
+    table['gap_away'] = table['model_xg_away'] - table['implied_xg_away']
+    return table
@@ -0,0 +1,164 @@
+"""
+Indicatori incrementali (SMA, EMA, RSI di Wilder) per le curve di equity.
+
+Ogni indicatore è uno stato che si aggiorna in O(1) per ogni nuova partita:
+- SMA: finestra scorrevole con somma corrente;
+- EMA: media esponenziale (stessa ricorrenza di pandas ewm(adjust=False));
+- RSI: medie esponenziali di guadagni/perdite con alpha = 1/period (Wilder).
+I valori coincidono con l'implementazione pandas di DashboardTecnica
+(rolling(window).mean(), ewm(span, adjust=False).mean(), _calculate_rsi_wilder).
+
+IndicatorStore tiene per ogni serie (es. lega, stagione, metodo, squadra) la equity già vista
+e lo stato degli indicatori, salvati in config.CACHE_DIR accanto allo snapshot del dataset:
+quando la serie cresce (nuove partite) vengono elaborate solo le partite nuove.
+"""
+import math
+import os
+import pickle
+from collections import deque
+
+from . import config, singleflight
+
+INDICATORS_FILE = os.path.join(config.CACHE_DIR, 'indicators.pkl')
+INDICATORS_VERSION = 1
+
+class SMA:
+    def __init__(self, window):
+        self.window = window
+        self.buffer = deque()
+        self.total = 0.0
+
+    def update(self, x):
+        self.buffer.append(x)
+        self.total += x
+        if len(self.buffer) > self.window:
+            self.total -= self.buffer.popleft()
+        return self.total / self.window if len(self.buffer) == self.window else math.nan
+
+class EMA:
+    """
+    Media esponenziale con la stessa aritmetica di pandas ewm(adjust=False):
+    y = ((1-alpha) * y + alpha * x) / ((1-alpha) + alpha); NaN finché le osservazioni sono < min_periods.
+    """
+
+    def __init__(self, alpha, min_periods=0):
+        self.old_wt = 1.0 - alpha
+        self.new_wt = alpha
+        self.min_periods = max(min_periods, 1)
+        self.value = None
+        self.count = 0
+
+    @classmethod
+    def from_span(cls, span):
+        return cls(2.0 / (span + 1.0))
+
+    def update(self, x):
+        self.count += 1
+        if self.value is None:
+            self.value = float(x)
+        elif self.value != x:
+            self.value = (self.old_wt * self.value + self.new_wt * x) / (self.old_wt + self.new_wt)
+        return self.value if self.count >= self.min_periods else math.nan
+
+class RSI:
+    """RSI di Wilder: come DashboardTecnica._calculate_rsi_wilder (valori mancanti -> 50)."""
+
+    def __init__(self, period=5):
+        self.period = period
+        self.prev = None
+        self.avg_gain = EMA(1.0 / period, min_periods=period)
+        self.avg_loss = EMA(1.0 / period, min_periods=period)
+
+    def update(self, x):
+        delta = x - self.prev if self.prev is not None else math.nan
+        self.prev = x
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        avg_gain = self.avg_gain.update(gain)
+        avg_loss = self.avg_loss.update(loss)
+
+        if math.isnan(avg_gain) or math.isnan(avg_loss):
+            return 50.0
+        if avg_loss == 0:
+            if avg_gain == 0:
+                return 50.0  # 0/0 -> NaN -> 50
+            return 100.0
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+def new_indicator(kind, param):
+    """Stato vuoto per ('sma', finestra), ('ema', span) o ('rsi', periodo)."""
+    if kind == 'sma':
+        return SMA(param)
+    if kind == 'ema':
+        return EMA.from_span(param)
+    if kind == 'rsi':
+        return RSI(param)
+    raise ValueError(f"Indicatore sconosciuto: {kind}")
+
+class SeriesIndicators:
+    """Equity di una serie + stato e valori di ogni indicatore richiesto finora."""
+
+    def __init__(self):
+        self.equity = []
+        self.indicators = {}  # (kind, param) -> [stato, valori]
+
+    def append(self, x):
+        self.equity.append(x)
+        for entry in self.indicators.values():
+            entry[1].append(entry[0].update(x))
+
+    def values(self, kind, param):
+        """Valori dell'indicatore per tutta la serie (al primo uso calcolato sulla equity già vista)."""
+        key = (kind, param)
+        if key not in self.indicators:
+            state = new_indicator(kind, param)
+            self.indicators[key] = [state, [state.update(x) for x in self.equity]]
+        return self.indicators[key][1]
+
+class IndicatorStore:
+    def __init__(self, path=INDICATORS_FILE):
+        self.path = path
+        self.series = {}
+        self._dirty = False
+        # path=None: stato solo in memoria (niente lettura/salvataggio su disco)
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    stored = pickle.load(f)
+                if stored.get('version') == INDICATORS_VERSION:
+                    self.series = stored['series']
+            except Exception as e:
+                print(f"⚠️ Stato indicatori non leggibile, verrà ricalcolato: {e}")
+
+    def sync(self, key, equity):
+        """
+        Allinea la serie `key` alla equity data e restituisce il suo SeriesIndicators.
+        Se la equity salvata è un prefisso di quella nuova si elaborano solo le partite nuove,
+        altrimenti (dati corretti a ritroso) la serie riparte da zero.
+        """
+        equity = [float(x) for x in equity]
+        entry = self.series.get(key)
+        n_known = len(entry.equity) if entry is not None else 0
+        if entry is None or n_known > len(equity) or entry.equity != equity[:n_known]:
+            entry = self.series[key] = SeriesIndicators()
+            n_known = 0
+        if n_known < len(equity):
+            for x in equity[n_known:]:
+                entry.append(x)
+            self._dirty = True
+        return entry
+
+    def values(self, key, equity, kind, param):
+        entry = self.sync(key, equity)
+        if (kind, param) not in entry.indicators:
+            self._dirty = True
+        return entry.values(kind, param)
+
+    def save(self):
+        """Salva lo stato (solo se cambiato) con scrittura atomica."""
+        if not self._dirty or self.path is None:
+            return
+        data = pickle.dumps({'version': INDICATORS_VERSION, 'series': self.series},
+                            protocol=pickle.HIGHEST_PROTOCOL)
+        singleflight.atomic_write(self.path, data)
+        self._dirty = False
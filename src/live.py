@@ -0,0 +1,269 @@
+"""
+Probabilità in-play delle partite in corso: dagli xG pre-partita del motore, dal minuto e dal
+risultato corrente si ricalcolano le matrici Poisson + Dixon-Coles dei gol NEL TEMPO RESTANTE
+e si aggregano sul risultato finale (1X2, Gol/NoGol, Over/Under 2.5).
+
+    xG restanti = xG pre-partita * (minuti restanti / minuti totali, recupero incluso)
+    risultato finale = risultato attuale + gol del tempo restante
+
+La correzione Dixon-Coles (punteggi bassi) si applica solo se la partita è ancora 0-0; a risultato
+sbloccato i gol restanti sono Poisson indipendenti. Tempi supplementari e rigori non contano: i
+mercati sono sui 90 minuti, da ET in poi il risultato è considerato definitivo.
+
+Ogni tick (una risposta di /fixtures?live=all) aggiorna TUTTE le partite live con un solo calcolo
+vettoriale. La sorgente è intercambiabile:
+    ApiFeed     polling asincrono di API-Football (opzionale: registra le risposte su file JSONL)
+    ReplayFeed  riproduce una registrazione, senza API (test e analisi)
+
+Esempio:
+    tracker = live.LiveTracker(df=df, engine_index=index)
+    asyncio.run(live.run(tracker, live.ReplayFeed('live.jsonl'), on_update=print))
+"""
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from . import stats_engine
+from .api_store import LIVE_STATUS
+from .metrics import REGISTRY
+
+HALF_MINUTES = 45
+FIRST_HALF_ADDED = 2        # Recupero medio del primo tempo (minuti)
+SECOND_HALF_ADDED = 4       # Recupero medio del secondo tempo (minuti)
+MATCH_MINUTES = 2 * HALF_MINUTES + FIRST_HALF_ADDED + SECOND_HALF_ADDED
+
+POLL_SECONDS = 60           # Intervallo di polling (TTL 'fixtures_live' dell'archivio API)
+
+ENDED_STATUS = ('ET', 'BT', 'P', 'AET', 'PEN', 'FT')
+
+LIVE_TICKS = REGISTRY.counter("live_ticks_total", "Aggiornamenti in-play elaborati", labelnames=("source",))
+LIVE_LATENCY = REGISTRY.histogram("live_tick_seconds", "Durata del ricalcolo in-play di un tick",
+                                  buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1))
+
+def parse_live_fixtures(data):
+    """Risposta di /fixtures?live=all -> lista di dict (id, lega, squadre, stato, minuto, gol)."""
+    if not data or data.get('errors'):
+        if data and data.get('errors'):
+            print(f"❌ Errore API: {data['errors']}")
+        return []
+    matches = []
+    for item in data.get('response') or []:
+        fixture, teams, goals = item['fixture'], item['teams'], item['goals']
+        status = fixture['status']['short']
+        if status not in LIVE_STATUS:
+            continue
+        matches.append({
+            'id': fixture['id'],
+            'league_id': item.get('league', {}).get('id'),
+            'date': (fixture.get('date') or '').split('T')[0],
+            'home': teams['home']['name'],
+            'away': teams['away']['name'],
+            'status': status,
+            'minute': fixture['status'].get('elapsed') or 0,
+            'home_goals': goals['home'] or 0,
+            'away_goals': goals['away'] or 0,
+        })
+    return matches
+
+def remaining_fraction(minute, status):
+    """Frazione della partita (recupero medio incluso) ancora da giocare, vettoriale."""
+    minute = np.asarray(minute, dtype=float)
+    status = np.asarray(status, dtype=object)
+    # Nel recupero 'elapsed' supera 45/90: il recupero medio residuo si consuma minuto per minuto
+    first_half = (np.maximum(HALF_MINUTES - minute, 0) + np.maximum(FIRST_HALF_ADDED - np.maximum(minute - HALF_MINUTES, 0), 0)
+                  + HALF_MINUTES + SECOND_HALF_ADDED)
+    end = 2 * HALF_MINUTES
+    second_half = np.maximum(end - minute, 0) + np.maximum(SECOND_HALF_ADDED - np.maximum(minute - end, 0), 0)
+    in_first = (status == '1H') | ((minute < HALF_MINUTES) & ~np.isin(status, ('HT', '2H')))
+    remaining = np.where(in_first, first_half, np.minimum(second_half, HALF_MINUTES + SECOND_HALF_ADDED))
+    remaining = np.where(status == 'HT', HALF_MINUTES + SECOND_HALF_ADDED, remaining)
+    remaining = np.where(np.isin(status, ENDED_STATUS), 0.0, remaining)
+    return remaining / MATCH_MINUTES
+
+def live_probabilities(xg_home, xg_away, minute, home_goals, away_goals, status, rho=stats_engine.RHO):
+    """
+    Mercati sul risultato finale per N partite in corso (array di lunghezza N per ogni mercato),
+    più gli xG restanti usati.
+    """
+    xg_home = np.asarray(xg_home, dtype=float)
+    xg_away = np.asarray(xg_away, dtype=float)
+    hg = np.asarray(home_goals, dtype=float)
+    ag = np.asarray(away_goals, dtype=float)
+
+    frac = remaining_fraction(minute, status)
+    lambs, mus = xg_home * frac, xg_away * frac
+    rho_eff = np.where((hg == 0) & (ag == 0), rho, 0.0)
+    matrix = stats_engine._score_matrix_batch(lambs, mus, rho_eff)
+
+    i, j = np.indices(matrix.shape[1:])
+    diff = (hg - ag)[:, None, None] + (i - j)[None]
+    total = (hg + ag)[:, None, None] + (i + j)[None]
+    both = ((hg[:, None, None] + i[None]) > 0) & ((ag[:, None, None] + j[None]) > 0)
+
+    def mass(mask):
+        return (matrix * mask).reshape(len(matrix), -1).sum(axis=1)
+
+    gol = mass(both)
+    over = mass(total > 2.5)
+    markets = {
+        '1': mass(diff > 0),
+        'X': mass(diff == 0),
+        '2': mass(diff < 0),
+        'Gol': gol,
+        'NoGol': 1 - gol,
+        'Over2.5': over,
+        'Under2.5': 1 - over,
+    }
+    return markets, lambs, mus
+
+class LiveTracker:
+    """
+    Stato delle partite live. Gli xG pre-partita vengono da `prematch` ({fixture_id: (xg_casa, xg_trasf)})
+    o, per le partite nuove, dal motore sul DataFrame storico (una sola volta per partita, con i nomi
+    API tradotti nei nomi dei CSV; i risultati mostrano i nomi API).
+    """
+
+    def __init__(self, prematch=None, df=None, engine_index=None):
+        self.prematch = dict(prematch or {})
+        self.df = df
+        self.engine_index = engine_index
+        self.errors = {}
+        self.matches = {}
+        self.ticks = 0
+
+    def _ensure_prematch(self, matches):
+        missing = [m for m in matches if m['id'] not in self.prematch and m['id'] not in self.errors]
+        if not missing or self.df is None:
+            return
+        results = stats_engine.calculate_slate_predictions(self.df, self._engine_fixtures(missing), self.engine_index)
+        for m, res in zip(missing, results):
+            if 'error' in res:
+                self.errors[m['id']] = res['error']
+            else:
+                xg = res['xg_prediction']
+                self.prematch[m['id']] = (float(xg['xg_home']), float(xg['xg_away']))
+
+    def _engine_fixtures(self, matches):
+        """
+        Partite live per il motore: nomi API tradotti nei nomi dei CSV della lega (team_names),
+        cercati tra tutte le squadre se la lega non è mappata o non è nello storico.
+        """
+        from . import team_names
+        from .api_football import LEAGUE_MAP
+
+        leagues = {league_id: league for league, league_id in LEAGUE_MAP.items()}
+        known = set(self.df['League'].unique())
+        resolved = {}
+        for league_id in dict.fromkeys(m['league_id'] for m in matches):
+            league = leagues.get(league_id)
+            in_league = [m for m in matches if m['league_id'] == league_id]
+            fixtures = team_names.resolve_fixtures(
+                [{'date': m['date'], 'home': m['home'], 'away': m['away']} for m in in_league],
+                team_names.dataframe_teams(self.df, league if league in known else None),
+            )
+            resolved.update(zip((m['id'] for m in in_league), fixtures))
+        return [resolved[m['id']] for m in matches]
+
+    def update(self, data, source='api'):
+        """Un tick: ricalcola in blocco tutte le partite live della risposta. Restituisce la lista dei risultati."""
+        start = time.perf_counter()
+        matches = parse_live_fixtures(data)
+        self._ensure_prematch(matches)
+        priced = [m for m in matches if m['id'] in self.prematch]
+
+        results = []
+        if priced:
+            xg = np.array([self.prematch[m['id']] for m in priced])
+            markets, lambs, mus = live_probabilities(
+                xg[:, 0], xg[:, 1],
+                [m['minute'] for m in priced],
+                [m['home_goals'] for m in priced],
+                [m['away_goals'] for m in priced],
+                [m['status'] for m in priced],
+            )
+            for n, m in enumerate(priced):
+                probs = {key: float(p[n]) for key, p in markets.items()}
+                results.append({
+                    'fixture_id': m['id'],
+                    'home': m['home'],
+                    'away': m['away'],
+                    'status': m['status'],
+                    'minute': m['minute'],
+                    'score': f"{m['home_goals']}-{m['away_goals']}",
+                    'xg_prematch': {'xg_home': round(xg[n, 0], 4), 'xg_away': round(xg[n, 1], 4)},
+                    'xg_remaining': {'xg_home': round(float(lambs[n]), 4), 'xg_away': round(float(mus[n]), 4)},
+                    'probabilities': {k: round(p * 100, 1) for k, p in probs.items()},
+                    'odds': {k: round(1 / p, 2) if p > 0.001 else 999.00 for k, p in probs.items()},
+                })
+        results += [{'fixture_id': m['id'], 'home': m['home'], 'away': m['away'], 'status': m['status'],
+                     'minute': m['minute'], 'score': f"{m['home_goals']}-{m['away_goals']}",
+                     'error': self.errors[m['id']]}
+                    for m in matches if m['id'] in self.errors]
+
+        # Le partite uscite dal feed (finite) non restano nello stato
+        self.matches = {r['fixture_id']: r for r in results}
+        self.ticks += 1
+        LIVE_TICKS.inc(source=source)
+        LIVE_LATENCY.observe(time.perf_counter() - start)
+        return results
+
+# --- SORGENTI ---
+
+class ApiFeed:
+    """Polling di /fixtures?live=all (tutte le leghe o solo `league_ids`); opzionale registrazione JSONL."""
+    source = 'api'
+
+    def __init__(self, api=None, league_ids=None, interval=POLL_SECONDS, record_to=None):
+        if api is None:
+            from .api_football_async import AsyncFootballAPI
+            api = AsyncFootballAPI(use_cache=False)
+        self.api = api
+        self.params = {'live': '-'.join(str(i) for i in league_ids) if league_ids else 'all'}
+        self.interval = interval
+        self.record_to = record_to
+
+    async def next(self):
+        data = await self.api._request('fixtures', self.params)
+        if data is not None and self.record_to:
+            with open(self.record_to, 'a') as f:
+                f.write(json.dumps({'ts': time.time(), 'data': data}) + '\n')
+        return data if data is not None else {}     # Richiesta fallita: tick saltato, stato invariato
+
+class ReplayFeed:
+    """Riproduce una registrazione JSONL ({'ts', 'data'} per riga); `speed` 0 = senza pause."""
+    source = 'replay'
+
+    def __init__(self, path, speed=0.0):
+        with open(path) as f:
+            self.frames = [json.loads(line) for line in f if line.strip()]
+        self.speed = speed
+        self.position = 0
+        self.interval = 0.0
+
+    async def next(self):
+        if self.position >= len(self.frames):
+            return None
+        frame = self.frames[self.position]
+        self.position += 1
+        nxt = self.frames[self.position] if self.position < len(self.frames) else None
+        # Pausa pari al tempo reale tra i frame registrati, accelerato di `speed` volte
+        self.interval = (nxt['ts'] - frame['ts']) / self.speed if (nxt and self.speed) else 0.0
+        return frame['data']
+
+async def run(tracker, feed, on_update=None, max_ticks=None):
+    """Ciclo di polling: un tick per risposta del feed, fino alla fine del replay o a max_ticks."""
+    ticks = 0
+    while max_ticks is None or ticks < max_ticks:
+        data = await feed.next()
+        if data is None:
+            break
+        if data:
+            results = tracker.update(data, source=feed.source)
+            if on_update is not None:
+                on_update(results)
+        ticks += 1
+        if max_ticks is None or ticks < max_ticks:
+            await asyncio.sleep(feed.interval)
+    return tracker.matches
@@ -0,0 +1,174 @@
+"""
+Registro metriche in-process (contatori, gauge, istogrammi di latenza) esportabile
+in formato Prometheus (to_prometheus) e JSON (to_dict / to_json).
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Bucket di latenza in secondi (da 1 ms a 10 s)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = [f'{k}="{v}"' for k, v in labels]
+    return "{" + ",".join(parts) + "}"
+
+class Counter:
+    """Contatore monotono (stile Prometheus) con etichette opzionali."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        # chiave etichette -> valore
+        self._series = {}
+
+    def _key(self, labels):
+        return tuple((name, str(labels.get(name, ""))) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+    def total(self):
+        """Somma su tutte le etichette."""
+        with self._lock:
+            return sum(self._series.values())
+
+    def to_prometheus(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._series.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return "\n".join(lines)
+
+    def to_dict(self):
+        with self._lock:
+            series = [{'labels': dict(key), 'value': value} for key, value in sorted(self._series.items())]
+        return {'type': self.kind, 'help': self.help_text, 'series': series}
+
+class Gauge(Counter):
+    """Valore istantaneo (es. crediti API rimasti): set() sovrascrive."""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+class Histogram:
+    """Istogramma cumulativo (stile Prometheus) con etichette opzionali."""
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        # chiave etichette -> [conteggi per bucket..., somma, conteggio totale]
+        self._series = {}
+
+    def _key(self, labels):
+        return tuple((name, str(labels.get(name, ""))) for name in self.labelnames)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Misura la durata del blocco with e la registra nell'istogramma."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def to_prometheus(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series['counts']):
+                    lines.append(f"{self.name}_bucket{_format_labels(key + (('le', repr(bound)),))} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return "\n".join(lines)
+
+    def to_dict(self):
+        with self._lock:
+            series = [
+                {
+                    'labels': dict(key),
+                    'buckets': dict(zip((repr(b) for b in self.buckets), series['counts'])),
+                    'sum': series['sum'],
+                    'count': series['count'],
+                }
+                for key, series in sorted(self._series.items())
+            ]
+        return {'type': 'histogram', 'help': self.help_text, 'series': series}
+
+class MetricsRegistry:
+    """Contenitore delle metriche del processo (get-or-create per nome)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def histogram(self, name, help_text="", buckets=DEFAULT_BUCKETS, labelnames=()):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, help_text, buckets, labelnames)
+            return self._metrics[name]
+
+    def counter(self, name, help_text="", labelnames=()):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, help_text, labelnames)
+            return self._metrics[name]
+
+    def gauge(self, name, help_text="", labelnames=()):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Gauge(name, help_text, labelnames)
+            return self._metrics[name]
+
+    def get(self, name):
+        with self._lock:
+            return self._metrics.get(name)
+
+    def to_prometheus(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(m.to_prometheus() for m in metrics) + "\n"
+
+    def to_dict(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+        return {name: m.to_dict() for name, m in sorted(metrics.items())}
+
+    def to_json(self, indent=None):
+        return json.dumps(self.to_dict(), indent=indent)
+
+# Registro globale condiviso dai moduli
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,278 @@
+"""
+Storico quote multi-bookmaker: log append-only in Parquet, partizionato per data partita.
+
+    data/cache/odds_history/date=YYYY-MM-DD/part-<timestamp>-<id>.parquet
+
+Ogni riga è uno snapshot di una quota:
+    ts (istante di rilevazione, UTC), fixture_id, date, kickoff, bookmaker_id, bookmaker,
+    market_id, market, selection, price
+
+Le righe non vengono mai modificate: ogni download aggiunge un nuovo file alla partizione,
+così il movimento delle linee resta ricostruibile. Sopra il log:
+- latest():        ultima quota per (partita, bookmaker, mercato, selezione), opzionalmente a un istante dato;
+- closing_lines(): ultima quota rilevata prima del calcio d'inizio;
+- consensus():     quota di consenso (mediana tra bookmaker delle probabilità senza margine).
+
+Esempio:
+    df = odds_history.load(date_from='2025-09-01', date_to='2025-09-30', market_id=1)
+    cons = odds_history.consensus(odds_history.closing_lines(df))
+"""
+import io
+import json
+import os
+import time
+import uuid
+
+from . import config, singleflight
+
+HISTORY_DIR = os.path.join(config.CACHE_DIR, 'odds_history')
+
+HISTORY_COLUMNS = [
+    'ts', 'fixture_id', 'date', 'kickoff', 'bookmaker_id', 'bookmaker',
+    'market_id', 'market', 'selection', 'price'
+]
+
+# Chiave di una singola linea di quota
+LINE_KEY = ['fixture_id', 'bookmaker_id', 'market_id', 'selection']
+
+# Mercati API-Football con più linee nella stessa scommessa: il margine si toglie linea per linea.
+# Totali ('Over 2.5' / 'Under 2.5'): goal, goal 1°/2° tempo, goal casa/ospite, corner.
+TOTAL_MARKETS = {5, 6, 16, 17, 26, 45}
+# Handicap ('Home -1' / 'Draw -1' / 'Away -1'): stesso valore, dal punto di vista della squadra di casa
+HANDICAP_MARKETS = {4, 9}
+
+COMPACT_PREFIX = 'part-compact-'
+COMPACTED_FROM_KEY = b'odds_history.compacted_from'     # Metadati parquet: file sorgente di un file compattato
+
+def _partition_dir(match_date, root=HISTORY_DIR):
+    return os.path.join(root, f"date={match_date or 'unknown'}")
+
+def _to_frame(lines, ts):
+    """Righe di parse_odds_lines -> DataFrame con le colonne e i tipi dello storico."""
+    import pandas as pd
+
+    df = pd.DataFrame(lines)
+    df = df[df['fixture_id'].notna()]
+    if 'kickoff' not in df:
+        df['kickoff'] = None
+    out = pd.DataFrame({
+        'ts': pd.Timestamp(ts, unit='s', tz='UTC'),
+        'fixture_id': df['fixture_id'].astype('int64'),
+        'date': df['date'].astype('string'),
+        'kickoff': pd.to_datetime(df['kickoff'], utc=True, errors='coerce'),
+        'bookmaker_id': df['bookmaker_id'].astype('int64'),
+        'bookmaker': df['bookmaker'].astype('string'),
+        'market_id': df['market_id'].astype('int64'),
+        'market': df['market'].astype('string'),
+        'selection': df['selection'].astype('string'),
+        'price': df['odd'].astype('float64'),
+    }, index=df.index)
+    return out[HISTORY_COLUMNS]
+
+def append(lines, ts=None, root=HISTORY_DIR):
+    """
+    Aggiunge allo storico le righe di parse_odds_lines (un file nuovo per partizione toccata).
+    ts: istante della rilevazione (epoch secondi, default adesso). Restituisce le righe scritte.
+    """
+    if not lines:
+        return 0
+    ts = time.time() if ts is None else ts
+    df = _to_frame(lines, ts)
+
+    stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime(ts))
+    for match_date, part in df.groupby(df['date'].fillna('unknown'), sort=False):
+        buffer = io.BytesIO()
+        part.to_parquet(buffer, index=False)
+        path = os.path.join(_partition_dir(match_date, root), f"part-{stamp}-{uuid.uuid4().hex[:8]}.parquet")
+        singleflight.atomic_write(path, buffer.getvalue())
+    return len(df)
+
+def _partition_files(date_from=None, date_to=None, root=HISTORY_DIR):
+    if not os.path.isdir(root):
+        return []
+    files = []
+    for entry in sorted(os.listdir(root)):
+        if not entry.startswith('date='):
+            continue
+        match_date = entry[len('date='):]
+        # Le date ISO si confrontano come stringhe; 'unknown' solo senza filtri
+        if (date_from or date_to) and match_date == 'unknown':
+            continue
+        if date_from and match_date < date_from:
+            continue
+        if date_to and match_date > date_to:
+            continue
+        folder = os.path.join(root, entry)
+        files.extend(os.path.join(folder, f) for f in sorted(os.listdir(folder)) if f.endswith('.parquet'))
+    return files
+
+def _dataset(root=HISTORY_DIR):
+    """Dataset pyarrow sull'intera cartella (partizioni hive date=...), schema fisso dello storico."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    timestamp = pa.timestamp('ns', tz='UTC')
+    schema = pa.schema([
+        ('ts', timestamp), ('fixture_id', pa.int64()), ('date', pa.string()), ('kickoff', timestamp),
+        ('bookmaker_id', pa.int64()), ('bookmaker', pa.string()), ('market_id', pa.int64()),
+        ('market', pa.string()), ('selection', pa.string()), ('price', pa.float64()),
+    ])
+    partitioning = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+    return ds.dataset(root, format='parquet', schema=schema, partitioning=partitioning)
+
+def load(date_from=None, date_to=None, fixture_ids=None, market_id=None, bookmaker_ids=None,
+         columns=None, root=HISTORY_DIR):
+    """
+    Legge lo storico delle sole partizioni nel range di date (YYYY-MM-DD, estremi inclusi),
+    con filtri e colonne applicati già in scansione (pyarrow.dataset: le partizioni fuori range
+    non vengono aperte). Restituisce un DataFrame HISTORY_COLUMNS (o `columns`).
+    """
+    import pandas as pd
+    import pyarrow.dataset as ds
+
+    if not os.path.isdir(root):
+        return pd.DataFrame(columns=columns or HISTORY_COLUMNS)
+
+    conditions = []
+    # Le date ISO si confrontano come stringhe; la partizione 'unknown' solo senza filtri di data
+    if date_from or date_to:
+        conditions.append(ds.field('date') != 'unknown')
+    if date_from:
+        conditions.append(ds.field('date') >= date_from)
+    if date_to:
+        conditions.append(ds.field('date') <= date_to)
+    if fixture_ids is not None:
+        conditions.append(ds.field('fixture_id').isin([int(i) for i in fixture_ids]))
+    if market_id is not None:
+        conditions.append(ds.field('market_id') == int(market_id))
+    if bookmaker_ids is not None:
+        conditions.append(ds.field('bookmaker_id').isin([int(i) for i in bookmaker_ids]))
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+
+    df = _dataset(root).to_table(columns=columns, filter=expression).to_pandas()
+    if 'date' in df:
+        # Il valore della partizione 'unknown' torna mancante, come nei file
+        df['date'] = df['date'].where(df['date'] != 'unknown')
+    return df
+
+def latest(df, at=None):
+    """Ultima quota per (partita, bookmaker, mercato, selezione); con `at` solo rilevazioni fino a quell'istante."""
+    import pandas as pd
+
+    if at is not None:
+        at = pd.Timestamp(at)
+        df = df[df['ts'] <= (at.tz_localize('UTC') if at.tzinfo is None else at)]
+    if df.empty:
+        return df.reset_index(drop=True)
+    return df.sort_values('ts', kind='mergesort').drop_duplicates(LINE_KEY, keep='last').reset_index(drop=True)
+
+def closing_lines(df):
+    """
+    Quota di chiusura: ultima rilevazione prima del calcio d'inizio per ogni linea.
+    Le righe senza orario di inizio usano l'ultima rilevazione disponibile.
+    """
+    before_kickoff = df['kickoff'].isna() | (df['ts'] < df['kickoff'])
+    return latest(df[before_kickoff])
+
+def _market_lines(df):
+    """Linea di ogni quota ('2.5', '-1') per i mercati a più linee, '' per gli altri."""
+    import pandas as pd
+
+    line = pd.Series('', index=df.index, dtype=object)
+    totals = df['market_id'].isin(TOTAL_MARKETS)
+    handicaps = df['market_id'].isin(HANDICAP_MARKETS)
+    line[totals] = df.loc[totals, 'selection'].str.extract(r'(\d+(?:\.\d+)?)$', expand=False)
+    line[handicaps] = df.loc[handicaps, 'selection'].str.extract(r'([+-]?\d+(?:\.\d+)?)$', expand=False)
+    return line.fillna('')
+
+def consensus(df, market_id=None):
+    """
+    Quota di consenso per (partita, mercato, selezione):
+    1. per ogni bookmaker le probabilità implicite 1/price vengono normalizzate a somma 1 sul mercato
+       (rimozione del margine, metodo proporzionale);
+       (per i mercati a più linee, TOTAL_MARKETS e HANDICAP_MARKETS, sulla singola linea:
+       'Over 2.5' + 'Under 2.5'; gli altri, es. Risultato Esatto, sull'intero mercato);
+    2. mediana tra bookmaker delle probabilità senza margine, rinormalizzata sul mercato;
+    3. quota di consenso = 1 / probabilità.
+    `df` deve contenere una sola rilevazione per linea (es. l'output di latest o closing_lines).
+    Colonne in uscita: fixture_id, market_id, market, selection, n_bookmakers, fair_prob, consensus_price,
+    median_price, best_price.
+    """
+    import pandas as pd
+
+    if market_id is not None:
+        df = df[df['market_id'] == market_id]
+    if df.empty:
+        return pd.DataFrame(columns=['fixture_id', 'market_id', 'market', 'selection', 'n_bookmakers',
+                                     'fair_prob', 'consensus_price', 'median_price', 'best_price'])
+
+    df = df[df['price'] > 1.0].copy()
+    df['implied'] = 1.0 / df['price']
+    df['line'] = _market_lines(df)
+    book_market = ['fixture_id', 'bookmaker_id', 'market_id', 'line']
+    df['fair'] = df['implied'] / df.groupby(book_market)['implied'].transform('sum')
+
+    grouped = df.groupby(['fixture_id', 'market_id', 'line', 'selection'], sort=False)
+    out = grouped.agg(
+        market=('market', 'first'),
+        n_bookmakers=('bookmaker_id', 'nunique'),
+        fair_prob=('fair', 'median'),
+        median_price=('price', 'median'),
+        best_price=('price', 'max'),
+    ).reset_index()
+    out['fair_prob'] = out['fair_prob'] / out.groupby(['fixture_id', 'market_id', 'line'])['fair_prob'].transform('sum')
+    out['consensus_price'] = 1.0 / out['fair_prob']
+    return out[['fixture_id', 'market_id', 'market', 'selection', 'n_bookmakers',
+                'fair_prob', 'consensus_price', 'median_price', 'best_price']]
+
+def _compacted_inputs(path):
+    """Nomi dei file sorgente registrati nei metadati di un file compattato ([] per gli altri file)."""
+    import pyarrow.parquet as pq
+
+    raw = (pq.read_schema(path).metadata or {}).get(COMPACTED_FROM_KEY)
+    return json.loads(raw) if raw else []
+
+def compact(match_date, root=HISTORY_DIR):
+    """
+    Unisce i file di una partizione in uno solo (le righe restano tutte: il log è append-only).
+    Utile per le partizioni di partite già giocate, che non ricevono più quote.
+
+    Il file compattato prende il nome dai file sorgente e li elenca nei metadati: se la cancellazione
+    dei sorgenti si interrompe, la chiamata successiva rimuove quelli rimasti invece di duplicarne le righe.
+    """
+    import hashlib
+
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    folder = _partition_dir(match_date, root)
+    files = _partition_files(match_date, match_date, root)
+
+    # Ripresa di una compattazione interrotta: sorgenti già contenuti in un file compattato
+    names = {os.path.basename(f) for f in files}
+    leftovers = set()
+    for f in files:
+        if os.path.basename(f).startswith(COMPACT_PREFIX):
+            leftovers |= set(_compacted_inputs(f)) & names
+    for name in leftovers:
+        os.remove(os.path.join(folder, name))
+    files = [f for f in files if os.path.basename(f) not in leftovers]
+    if len(files) <= 1:
+        return len(files)
+
+    inputs = sorted(os.path.basename(f) for f in files)
+    df = pd.concat([pd.read_parquet(f) for f in files], ignore_index=True).sort_values('ts', kind='mergesort')
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                           COMPACTED_FROM_KEY: json.dumps(inputs).encode('utf-8')})
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer)
+    digest = hashlib.sha1('\n'.join(inputs).encode('utf-8')).hexdigest()[:12]
+    singleflight.atomic_write(os.path.join(folder, f"{COMPACT_PREFIX}{digest}.parquet"), buffer.getvalue())
+    for f in files:
+        os.remove(f)
+    return 1
@@ -0,0 +1,169 @@
+"""
+Prefetch in background delle quote bookmaker per le partite elencate nella app.
+
+Quando l'utente sceglie lega/stagione, la app passa l'elenco dei match del menu a OddsPrefetcher.prefetch():
+un thread scarica con il client asincrono (AsyncFootballAPI) calendario e quote in blocco per data
+(get_odds_bulk: una chiamata per giorno copre tutte le partite del giorno, pagine in parallelo), entro
+un budget di crediti misurato sui crediti realmente spesi (api_credits_used_total). Le quote finiscono
+in una cache condivisa tra le sessioni, così al click di "Avvia Analisi" il confronto quota fair /
+quota book è una lettura in memoria, senza attese di rete.
+
+- Date più vecchie di ODDS_WINDOW_DAYS non si chiedono (API-Football non conserva le quote passate).
+- Date già in archivio e fresche (TTL odds_bulk) non costano crediti e non entrano nel budget.
+- Budget per job (argomento di prefetch, es. l'impostazione della sessione), tetto giornaliero
+  cumulativo del prefetcher (DAILY_CREDIT_BUDGET, condiviso tra sessioni e refresh) e riserva dei
+  crediti giornalieri API (CREDIT_RESERVE, come lo scheduler).
+- I nomi delle squadre dei CSV possono differire da quelli API: l'abbinamento è per data + somiglianza
+  dei nomi (team_names.match_fixture); le partite del calendario API si abbinano esattamente.
+
+Il modulo è leggero da importare (niente pandas/numpy): le dipendenze pesanti si caricano nel thread.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from .team_names import match_fixture
+
+PREFETCH_CREDIT_BUDGET = 10     # Crediti per ogni prefetch di (lega, stagione)
+DAILY_CREDIT_BUDGET = 100       # Crediti al giorno per tutti i prefetch (tutte le sessioni e i refresh)
+CREDIT_RESERVE = 20             # Come scheduler.CREDIT_RESERVE: sotto questi crediti rimasti nessuna chiamata
+ODDS_WINDOW_DAYS = 7            # Quote disponibili via API solo per partite recenti o future
+REFRESH_SECONDS = 15 * 60       # Come il TTL 'odds_bulk' dell'archivio API
+
+class OddsPrefetcher:
+    def __init__(self, credit_budget=PREFETCH_CREDIT_BUDGET, daily_budget=DAILY_CREDIT_BUDGET,
+                 credit_reserve=CREDIT_RESERVE, max_workers=2, api_factory=None):
+        self.credit_budget = credit_budget
+        self.daily_budget = daily_budget
+        self.credit_reserve = credit_reserve
+        self._api_factory = api_factory
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="odds-prefetch")
+        self._lock = threading.Lock()
+        self._jobs = {}     # (lega, stagione, date) -> (avvio, Future)
+        self._last = {}     # (lega, stagione) -> chiave dell'ultimo job richiesto
+        self._odds = {}     # (lega, stagione) -> {(data, casa, ospite): {mercato: quota}}
+        self._spent = {}    # giorno (YYYY-MM-DD) -> crediti spesi da tutti i job
+
+    def prefetch(self, league, season, matches, credit_budget=None):
+        """
+        Avvia (senza bloccare) il download delle quote per i match (dict con date, home, away).
+        credit_budget: crediti spendibili da questo job (default self.credit_budget), sempre entro
+        il tetto giornaliero. Lo stesso elenco di date non viene riscaricato prima di REFRESH_SECONDS.
+        """
+        budget = self.credit_budget if credit_budget is None else credit_budget
+        wanted = [(m['date'], m['home'], m['away']) for m in matches]
+        # Un job per elenco di date: cambiando giornata/menu parte il prefetch delle date nuove
+        key = (league, season, tuple(sorted({d for d, _, _ in wanted})))
+        with self._lock:
+            self._last[(league, season)] = key
+            job = self._jobs.get(key)
+            if job is not None and (not job[1].done() or time.time() - job[0] < REFRESH_SECONDS):
+                return job[1]
+            future = self._executor.submit(self._fetch, league, season, wanted, budget)
+            self._jobs[key] = (time.time(), future)
+        return future
+
+    def lookup(self, league, season, match_date, home, away):
+        """Quote book già scaricate per il match ({mercato: quota}) o None: nessuna attesa."""
+        with self._lock:
+            return self._odds.get((league, season), {}).get((match_date, home, away))
+
+    def status(self, league, season):
+        """Stato del prefetch: 'idle', 'running', 'ready' o 'error', e numero di match con quote."""
+        with self._lock:
+            job = self._jobs.get(self._last.get((league, season)))
+            n_ready = len(self._odds.get((league, season), {}))
+        if job is None:
+            return 'idle', n_ready
+        if not job[1].done():
+            return 'running', n_ready
+        return ('error' if job[1].exception() is not None else 'ready'), n_ready
+
+    def spent_today(self):
+        """Crediti spesi oggi da tutti i job del prefetcher."""
+        with self._lock:
+            return self._spent.get(date.today().isoformat(), 0)
+
+    def _fetch(self, league, season, wanted, budget):
+        if self._api_factory is not None:
+            api = self._api_factory()
+        else:
+            from .api_football_async import AsyncFootballAPI
+            api = AsyncFootballAPI()
+        return api.run(self._fetch_async(api, league, season, wanted, budget))
+
+    async def _fetch_async(self, api, league, season, wanted, budget):
+        import asyncio
+
+        from .accumulator import book_odds_from_lines
+        from .api_football import API_CREDITS_REMAINING, resolve_league_season
+
+        resolved = resolve_league_season(league, season)
+        if resolved is None:
+            return 0
+        league_id, season_year = resolved
+
+        # Spesa misurata sulle risposte ricevute dal client di questo job (api.calls: le stesse che
+        # contano in api_credits_used_total), calendario e pagine delle quote inclusi, e sommata
+        # subito al totale del giorno, così i job in parallelo vedono la spesa degli altri
+        day = date.today().isoformat()
+        calls_start = api.calls
+        charged = 0
+
+        def can_spend():
+            nonlocal charged
+            spent = api.calls - calls_start
+            with self._lock:
+                self._spent[day] = self._spent.get(day, 0) + spent - charged
+                day_spent = self._spent[day]
+            charged = spent
+            if spent >= budget or day_spent >= self.daily_budget:
+                return False
+            # Gauge a 0 = mai letto (nessuna risposta ancora): si procede
+            remaining = API_CREDITS_REMAINING.value()
+            return not remaining or remaining > self.credit_reserve
+
+        if can_spend():
+            fixtures = await api.get_fixtures(league, season)
+        else:
+            # Niente crediti: solo il calendario già in archivio (anche scaduto)
+            cached = api.store.get('fixtures', {"league": str(league_id), "season": str(season_year)})
+            fixtures = cached[0] if cached is not None else []
+        by_date = {}
+        for fx in fixtures:
+            by_date.setdefault(fx['date'], []).append(fx)
+
+        # Date utili in ordine di comparsa nel menu (dal più recente), gratuite se già fresche in archivio
+        oldest = (date.today() - timedelta(days=ODDS_WINDOW_DAYS)).isoformat()
+        dates = [d for d in dict.fromkeys(d for d, _, _ in wanted) if d >= oldest and d in by_date]
+        free, paid = [], []
+        for d in dates:
+            cached = api.store.get('odds_bulk', {"league": str(league_id), "season": str(season_year), "date": d})
+            (free if cached is not None and cached[1] else paid).append(d)
+
+        frames = list(await asyncio.gather(*(api.get_odds_bulk(league, season, date=d) for d in free)))
+        selected = list(free)
+        # Date da scaricare una alla volta (le pagine di una data restano in parallelo): nessuna
+        # nuova data parte a budget raggiunto, lo sforamento massimo sono le pagine di una data
+        for d in paid:
+            if not can_spend():
+                break
+            frames.append(await api.get_odds_bulk(league, season, date=d))
+            selected.append(d)
+        can_spend()     # Ultime pagine nel totale del giorno
+        lines = [row for frame in frames for row in frame.to_dict('records')]
+        book = book_odds_from_lines(lines)
+
+        found = {}
+        for d, home, away in wanted:
+            if d not in selected:
+                continue
+            fx = match_fixture(by_date[d], home, away)
+            if fx is not None and fx['id'] in book:
+                found[(d, home, away)] = book[fx['id']]
+
+        with self._lock:
+            self._odds.setdefault((league, season), {}).update(found)
+        print(f"📡 Prefetch quote {league} {season}: {len(found)} match ({len(selected)} giorni, {api.calls - calls_start} crediti)")
+        return len(found)
@@ -0,0 +1,309 @@
+"""
+Scheduler di aggiornamento: tiene caldi dati, archivio API, snapshot e previsioni delle prossime
+partite, così le UI non aspettano mai un download o una ricostruzione al click.
+
+Job (priorità: numero più basso = prima):
+    snapshot     ricostruisce snapshot + indici se i CSV sono più recenti        (ogni ora)
+    csv          riscarica i CSV della stagione corrente (download_data)          (ogni 6 ore)
+    api          calendari e quote API-Football entro il budget di crediti        (ogni ora)
+    predictions  previsioni delle partite dei prossimi N giorni (file parquet)    (ogni 3 ore)
+
+Job che usano risorse diverse girano in parallelo (es. csv e api); un job non parte se una sua
+risorsa è occupata. Un job fallito viene ritentato con backoff esponenziale; al successo può
+attivarne altri (csv -> snapshot -> predictions, api -> predictions).
+
+La app (slate della giornata API-Football) serve le partite dal parquet delle previsioni quando sono
+state calcolate sullo snapshot in uso (cached_predictions) e prezza al momento solo le altre.
+
+Avvio:
+    python -m src.cli schedule            # demone
+    python -m src.cli schedule --once     # un giro di tutti i job e uscita
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from . import config, data_loader, singleflight
+from .metrics import REGISTRY
+
+HOUR = 3600
+TICK_SECONDS = 1.0
+
+DAYS_AHEAD = 3          # Previsioni precalcolate per le partite dei prossimi N giorni
+CREDIT_BUDGET = 50      # Crediti API spendibili per ogni esecuzione del job 'api'
+CREDIT_RESERVE = 20     # Sotto questi crediti giornalieri rimasti il job 'api' non chiama l'API
+
+PREDICTIONS_FILE = os.path.join(config.CACHE_DIR, 'upcoming_predictions.parquet')
+
+JOB_RUNS = REGISTRY.counter("scheduler_job_runs_total", "Esecuzioni dei job dello scheduler per esito",
+                            labelnames=("job", "status"))
+JOB_LATENCY = REGISTRY.histogram("scheduler_job_seconds", "Durata dei job dello scheduler",
+                                 buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800), labelnames=("job",))
+
+class Job:
+    def __init__(self, name, func, interval, priority=10, resources=(), then=(), max_retries=3, retry_delay=60):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.priority = priority
+        self.resources = frozenset(resources)
+        self.then = tuple(then)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self.next_run = 0.0
+        self.running = False
+        self.rerun = False      # Attivato mentre era in esecuzione: riparte appena finisce
+        self.failures = 0
+        self.last_run = None
+        self.last_status = None
+        self.last_error = None
+
+class Scheduler:
+    def __init__(self, jobs, workers=3):
+        self.jobs = {job.name: job for job in jobs}
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._busy = set()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scheduler")
+        self._counter = itertools.count()
+
+    def trigger(self, name, delay=0.0):
+        """Anticipa un job (es. subito dopo il job da cui dipende)."""
+        with self._lock:
+            job = self.jobs[name]
+            if job.running:
+                job.rerun = True
+            else:
+                job.next_run = min(job.next_run, time.time() + delay)
+
+    def run_pending(self, now=None):
+        """Avvia i job scaduti in ordine di priorità, se le loro risorse sono libere. Restituisce i nomi avviati."""
+        now = time.time() if now is None else now
+        started = []
+        with self._lock:
+            due = [(job.priority, job.next_run, next(self._counter), job)
+                   for job in self.jobs.values() if not job.running and job.next_run <= now]
+            heapq.heapify(due)
+            while due:
+                job = heapq.heappop(due)[-1]
+                if job.resources & self._busy:
+                    continue  # Riprova al prossimo tick
+                job.running = True
+                self._busy |= job.resources
+                self._executor.submit(self._run, job)
+                started.append(job.name)
+        return started
+
+    def _run(self, job):
+        start = time.perf_counter()
+        print(f"⏳ [scheduler] {job.name}...")
+        try:
+            job.func()
+            status, error = "ok", None
+        except Exception as e:
+            status, error = "error", f"{e}"
+            traceback.print_exc()
+        elapsed = time.perf_counter() - start
+        JOB_RUNS.inc(job=job.name, status=status)
+        JOB_LATENCY.observe(elapsed, job=job.name)
+
+        with self._lock:
+            job.running = False
+            self._busy -= job.resources
+            job.last_run = time.time()
+            job.last_status = status
+            job.last_error = error
+            if status == "ok":
+                job.failures = 0
+                job.next_run = job.last_run + job.interval
+            else:
+                job.failures += 1
+                if job.failures <= job.max_retries:
+                    job.next_run = job.last_run + job.retry_delay * 2 ** (job.failures - 1)
+                else:
+                    job.failures = 0
+                    job.next_run = job.last_run + job.interval
+            if job.rerun:
+                job.rerun = False
+                job.next_run = min(job.next_run, job.last_run)
+
+        if status == "ok":
+            print(f"✅ [scheduler] {job.name} in {elapsed:.1f}s")
+            for name in job.then:
+                self.trigger(name)
+        else:
+            print(f"❌ [scheduler] {job.name}: {error} (tentativo {job.failures}/{job.max_retries})")
+
+    def idle(self):
+        with self._lock:
+            return not any(job.running for job in self.jobs.values())
+
+    def run_forever(self, stop_event=None):
+        stop_event = stop_event or threading.Event()
+        try:
+            while not stop_event.is_set():
+                self.run_pending()
+                stop_event.wait(TICK_SECONDS)
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def run_once(self):
+        """Un giro completo: ogni job una volta (più quelli attivati a catena e i retry), poi ritorna."""
+        pending = set(self.jobs)
+        for job in self.jobs.values():
+            job.next_run = 0.0
+        while True:
+            # Dopo il primo avvio un job riparte solo se attivato da un altro (next_run = ora) o da un retry
+            for name in self.run_pending():
+                pending.discard(name)
+            if not pending and self.idle() and not self._due() and not self._retrying():
+                break
+            time.sleep(0.05)
+        self._executor.shutdown(wait=True)
+
+    def _due(self):
+        now = time.time()
+        with self._lock:
+            return any(not job.running and job.next_run <= now for job in self.jobs.values())
+
+    def _retrying(self):
+        with self._lock:
+            return any(job.failures for job in self.jobs.values())
+
+    def status(self):
+        with self._lock:
+            return {
+                name: {
+                    'priority': job.priority,
+                    'running': job.running,
+                    'last_run': job.last_run,
+                    'last_status': job.last_status,
+                    'last_error': job.last_error,
+                    'next_run': job.next_run,
+                    'failures': job.failures,
+                }
+                for name, job in self.jobs.items()
+            }
+
+# --- JOB ---
+
+def refresh_csv():
+    """CSV della stagione corrente (europee) e dei campionati extra."""
+    data_loader.download_data(seasons=[config.SEASONS[-1]])
+
+def rebuild_snapshot():
+    """Snapshot + indici ricostruiti solo se i CSV sono cambiati (load_snapshot controlla le date)."""
+    data_loader.load_snapshot()
+
+def refresh_api(days_ahead=DAYS_AHEAD, budget=CREDIT_BUDGET, reserve=CREDIT_RESERVE):
+    """
+    Calendari (aggiornamento incrementale) e quote in blocco dei prossimi giorni per le leghe mappate,
+    fermandosi quando la spesa di questa esecuzione raggiunge `budget` o i crediti rimasti scendono a `reserve`.
+    """
+    from .api_football import API_CREDITS, API_CREDITS_REMAINING, LEAGUE_MAP, FootballAPI
+
+    api = FootballAPI()
+    season = config.SEASONS[-1]
+    spent_start = API_CREDITS.total()
+    today = date.today()
+    days = [(today + timedelta(days=d)).isoformat() for d in range(days_ahead + 1)]
+
+    def can_spend():
+        remaining = API_CREDITS_REMAINING.value()
+        if API_CREDITS.total() - spent_start >= budget:
+            return False
+        # Gauge a 0 = mai letto (nessuna risposta ancora): si procede
+        return not remaining or remaining > reserve
+
+    for league in LEAGUE_MAP:
+        if not can_spend():
+            print(f"⚠️ [scheduler] Budget crediti raggiunto ({API_CREDITS.total() - spent_start:.0f})")
+            break
+        matches = api.get_fixtures(league, season)
+        match_days = {m['date'] for m in matches if m.get('type') == 'FUTURE'}
+        for day in days:
+            if day in match_days and can_spend():
+                api.get_odds_bulk(league, season, date=day)
+
+def precompute_predictions(days_ahead=DAYS_AHEAD, path=PREDICTIONS_FILE):
+    """
+    Previsioni delle partite in archivio API nei prossimi giorni, salvate in un parquet (scrittura atomica).
+    I nomi API sono tradotti nei nomi dei CSV della lega (team_names); quelli originali restano
+    nelle colonne api_home / api_away.
+    """
+    import io
+
+    from . import api_store, stats_engine, team_names
+    from .api_football import LEAGUE_MAP
+    from .cli import results_to_frame
+
+    store = api_store.get_store()
+    today = date.today()
+    date_from, date_to = today.isoformat(), (today + timedelta(days=days_ahead)).isoformat()
+    snapshot = data_loader.load_snapshot()
+    fixtures, api_names, leagues, fixture_ids = [], [], [], []
+    for league, league_id in LEAGUE_MAP.items():
+        upcoming = [m for m in store.fixtures_by_date(date_from, date_to, league_id=league_id)
+                    if m.get('type') == 'FUTURE']
+        resolved = team_names.resolve_fixtures(
+            [{'date': m['date'], 'home': m['home'], 'away': m['away']} for m in upcoming],
+            team_names.snapshot_teams(snapshot, league),
+        )
+        fixtures.extend(resolved)
+        api_names.extend((m['home'], m['away']) for m in upcoming)
+        leagues.extend([league] * len(upcoming))
+        fixture_ids.extend(m['id'] for m in upcoming)
+    if not fixtures:
+        print("⚠️ [scheduler] Nessuna partita in programma nell'archivio API")
+        return
+
+    df = data_loader.snapshot_dataframe(snapshot)
+    results = stats_engine.calculate_slate_predictions(df, fixtures, data_loader.snapshot_engine_index(snapshot),
+                                                       elo=data_loader.snapshot_elo(snapshot))
+    table = results_to_frame(fixtures, results)
+    table.insert(0, 'league', leagues)
+    table.insert(1, 'fixture_id', fixture_ids)
+    table.insert(5, 'api_home', [home for home, _ in api_names])
+    table.insert(6, 'api_away', [away for _, away in api_names])
+    table['snapshot_built_at'] = snapshot['built_at']
+
+    buffer = io.BytesIO()
+    table.to_parquet(buffer, index=False)
+    singleflight.atomic_write(path, buffer.getvalue())
+    n_errors = int(table['error'].notna().sum())
+    print(f"💾 [scheduler] {len(table)} previsioni salvate in {path} ({n_errors} non prezzate)")
+
+def load_upcoming_predictions(path=PREDICTIONS_FILE):
+    """Previsioni precalcolate dallo scheduler (DataFrame vuoto se non ancora disponibili)."""
+    import pandas as pd
+
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    return pd.read_parquet(path)
+
+def cached_predictions(table, fixture_ids, built_at):
+    """
+    Righe precalcolate ({fixture_id: dict riga}) delle partite richieste, solo se calcolate sullo
+    stesso snapshot (`built_at`) e senza errori: le altre vanno prezzate al momento.
+    """
+    if table.empty or 'snapshot_built_at' not in table.columns:
+        return {}
+    wanted = table[table['fixture_id'].isin(list(fixture_ids)) & (table['snapshot_built_at'] == built_at)
+                   & table['error'].isna()]
+    return {rec['fixture_id']: rec for rec in wanted.to_dict('records')}
+
+def default_jobs(days_ahead=DAYS_AHEAD, credit_budget=CREDIT_BUDGET):
+    return [
+        Job('snapshot', rebuild_snapshot, HOUR, priority=0, resources=('csv', 'snapshot'), then=('predictions',)),
+        Job('csv', refresh_csv, 6 * HOUR, priority=1, resources=('csv',), then=('snapshot',)),
+        Job('api', lambda: refresh_api(days_ahead, credit_budget), HOUR, priority=2, resources=('api',),
+            then=('predictions',)),
+        Job('predictions', lambda: precompute_predictions(days_ahead), 3 * HOUR, priority=3,
+            resources=('snapshot', 'predictions')),
+    ]
@@ -0,0 +1,134 @@
+"""
+Screener momentum: equity, SMA/EMA e RSI(5) di TUTTE le squadre di tutte le leghe/stagioni
+in un solo passaggio vettoriale, con una tabella di segnali filtrabile.
+
+Gli indicatori sono quelli di DashboardTecnica (grafico.py):
+    SMA  = rolling(window).mean()      EMA = ewm(span, adjust=False).mean()
+    RSI  = Wilder, ewm(com=period-1, min_periods=period, adjust=False), mancanti -> 50
+calcolati per gruppo (League, Season, Team) con operazioni groupby (niente cicli per squadra).
+
+Esempio:
+    table = screener.scan(df)
+    screener.screen(table, rsi_below=30)
+    screener.screen(table, cross='sma_up', within=2, league='Serie A')
+"""
+import numpy as np
+import pandas as pd
+
+from .grafico import team_equity
+
+GROUP_KEYS = ['League', 'Season', 'Team']
+
+# Parametri di default: gli stessi dei controlli della dashboard
+DEFAULT_PARAMS = {'sma_s': 5, 'sma_m': 15, 'ema_s': 5, 'ema_m': 12, 'rsi': 5}
+
+SIGNAL_COLUMNS = ['sma_up_ago', 'sma_down_ago', 'ema_up_ago', 'ema_down_ago']
+
+TABLE_COLUMNS = GROUP_KEYS + ['matches', 'last_date', 'last_outcome', 'equity', 'sma_s', 'sma_m', 'ema_s', 'ema_m',
+                              'rsi'] + SIGNAL_COLUMNS
+
+def _grouped_ewm(long, column, **ewm_kwargs):
+    """ewm(adjust=False).mean() per (League, Season, Team) in un'unica chiamata groupby, allineata a `long`."""
+    result = long.groupby(GROUP_KEYS, sort=False)[column].ewm(adjust=False, **ewm_kwargs).mean()
+    return result.reset_index(level=list(range(len(GROUP_KEYS))), drop=True).sort_index().to_numpy(dtype=float)
+
+def _grouped_sma(values, pos, window):
+    """SMA per gruppo con somme cumulate: (cs[i] - cs[i-window]) / window, NaN nelle prime window-1 partite."""
+    cs = np.concatenate([[0.0], np.cumsum(values, dtype=float)])
+    idx = np.arange(len(values))
+    sma = (cs[idx + 1] - cs[np.maximum(idx + 1 - window, 0)]) / window
+    sma[pos < window - 1] = np.nan
+    return sma
+
+def _last_cross_ago(fast, slow, pos, group_ids, direction):
+    """
+    Partite trascorse dall'ultimo incrocio di `fast` su `slow` (0 = nell'ultima partita) per ogni gruppo,
+    NaN se non c'è mai stato. direction: 'up' (fast passa sopra slow) o 'down'.
+    """
+    diff = fast - slow
+    prev = np.r_[np.nan, diff[:-1]]
+    prev[pos == 0] = np.nan  # nessun confronto a cavallo tra squadre diverse
+    if direction == 'up':
+        cross = (diff > 0) & (prev <= 0)
+    else:
+        cross = (diff < 0) & (prev >= 0)
+    last_pos = pd.Series(np.where(cross, pos, -1)).groupby(group_ids).max().to_numpy()
+    n_games = pd.Series(pos).groupby(group_ids).max().to_numpy() + 1
+    return np.where(last_pos >= 0, n_games - 1 - last_pos, np.nan)
+
+def scan(df, method='tick', params=None):
+    """
+    Ultimo stato di ogni (League, Season, Team): partite, equity, ultimo esito, SMA/EMA brevi e medie,
+    RSI e distanza (in partite) dall'ultimo incrocio rialzista/ribassista SMA e EMA.
+    """
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    long = team_equity(df, method)
+    if long.empty:
+        # Stesse colonne della tabella piena: screen() e gli ordinamenti funzionano anche senza dati
+        return pd.DataFrame(columns=TABLE_COLUMNS)
+    long = long.reset_index(drop=True)
+
+    grouped = long.groupby(GROUP_KEYS, sort=False)
+    group_ids = grouped.ngroup().to_numpy()
+    pos = long['MatchNum'].to_numpy() - 1
+    eq = long['Equity'].to_numpy(dtype=float)
+
+    sma_s = _grouped_sma(eq, pos, params['sma_s'])
+    sma_m = _grouped_sma(eq, pos, params['sma_m'])
+    ema_s = _grouped_ewm(long, 'Equity', span=params['ema_s'])
+    ema_m = _grouped_ewm(long, 'Equity', span=params['ema_m'])
+
+    # RSI di Wilder per gruppo
+    delta = grouped['Equity'].diff()
+    long['_gain'] = delta.where(delta > 0, 0)
+    long['_loss'] = -delta.where(delta < 0, 0)
+    period = params['rsi']
+    avg_gain = _grouped_ewm(long, '_gain', com=period - 1, min_periods=period)
+    avg_loss = _grouped_ewm(long, '_loss', com=period - 1, min_periods=period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+    rsi = np.where(np.isnan(rsi), 50.0, rsi)
+
+    last = np.flatnonzero(np.r_[group_ids[1:] != group_ids[:-1], True])
+    table = long.loc[last, GROUP_KEYS].reset_index(drop=True)
+    table['matches'] = pos[last] + 1
+    table['last_date'] = long['Date'].to_numpy()[last]
+    table['last_outcome'] = long['Outcome'].to_numpy()[last]
+    table['equity'] = eq[last]
+    table['sma_s'] = sma_s[last]
+    table['sma_m'] = sma_m[last]
+    table['ema_s'] = ema_s[last]
+    table['ema_m'] = ema_m[last]
+    table['rsi'] = rsi[last]
+    table['sma_up_ago'] = _last_cross_ago(sma_s, sma_m, pos, group_ids, 'up')
+    table['sma_down_ago'] = _last_cross_ago(sma_s, sma_m, pos, group_ids, 'down')
+    table['ema_up_ago'] = _last_cross_ago(ema_s, ema_m, pos, group_ids, 'up')
+    table['ema_down_ago'] = _last_cross_ago(ema_s, ema_m, pos, group_ids, 'down')
+    return table
+
+def screen(table, rsi_below=None, rsi_above=None, cross=None, within=2, league=None, season=None,
+           min_matches=None):
+    """
+    Filtra la tabella di scan():
+    - rsi_below / rsi_above: es. rsi_below=30 -> "RSI < 30";
+    - cross: 'sma_up', 'sma_down', 'ema_up', 'ema_down' -> incrocio avvenuto nelle ultime `within` partite
+      (es. cross='sma_up', within=2 -> "SMA5 ha incrociato al rialzo SMA15 nelle ultime 2 partite");
+    - league / season / min_matches: filtri anagrafici.
+    """
+    mask = pd.Series(True, index=table.index)
+    if rsi_below is not None:
+        mask &= table['rsi'] < rsi_below
+    if rsi_above is not None:
+        mask &= table['rsi'] > rsi_above
+    if cross is not None:
+        column = f"{cross}_ago"
+        if column not in SIGNAL_COLUMNS:
+            raise ValueError(f"Segnale sconosciuto: {cross}")
+        mask &= table[column] < within
+    if league is not None:
+        mask &= table['League'] == league
+    if season is not None:
+        mask &= table['Season'] == season
+    if min_matches is not None:
+        mask &= table['matches'] >= min_matches
+    return table[mask].sort_values(['League', 'Season', 'rsi']).reset_index(drop=True)
@@ -0,0 +1,224 @@
+"""
+Servizio HTTP locale (stdlib) per le previsioni, con dataset e cache del motore sempre caldi.
+
+Avvio:
+    python -m src.server --host 127.0.0.1 --port 8765
+
+Endpoint:
+    GET  /health          -> stato del servizio
+    POST /predict         -> stessi parametri di calculate_match_prediction (JSON)
+    POST /predict/batch   -> {"matches": [ {...parametri...}, ... ]}
+    POST /ingest          -> {"rows": [ {Date, HomeTeam, AwayTeam, League, Season, home_goals, ...}, ... ]}
+    GET  /metrics         -> metriche (latenza, I/O, crediti API) in formato Prometheus
+    GET  /metrics.json    -> stesse metriche in JSON
+"""
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import data_loader
+from .engine_state import EngineState
+from .metrics import REGISTRY
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    "prediction_request_seconds", "Latenza delle richieste HTTP del servizio previsioni",
+    labelnames=("endpoint", "status")
+)
+
+DELTA_PARAMS = ['delta_att_home', 'delta_def_home', 'delta_att_away', 'delta_def_away']
+
+class PredictionService:
+    """
+    Dataset + stato del motore caricati una volta sola, con cache LRU delle previsioni.
+    Nuove partite (ingest) aggiornano lo stato in modo incrementale (EngineState) e
+    invalidano solo le previsioni che potrebbero cambiare. Con i rating Elo (dallo snapshot)
+    ogni previsione ha anche il blocco 'elo'.
+    """
+
+    def __init__(self, df, engine_index=None, elo=None, cache_size=50000):
+        self.state = EngineState(df, engine_index, elo)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        # Serializza calcolo e ingest: lo stato del motore non cambia a metà di una previsione
+        self._state_lock = threading.Lock()
+
+    @property
+    def df(self):
+        return self.state.df
+
+    @property
+    def version(self):
+        return self.state.version
+
+    @staticmethod
+    def _to_fixture(params):
+        """Converte i parametri di calculate_match_prediction nel formato fixture del motore batch."""
+        missing = [k for k in ('date_match', 'home_team', 'away_team') if k not in params]
+        if missing:
+            raise ValueError(f"Parametri mancanti: {missing}")
+        fx = {'date': str(params['date_match'])[:10], 'home': params['home_team'], 'away': params['away_team']}
+        for key in DELTA_PARAMS:
+            fx[key] = float(params.get(key, 1.00))
+        return fx
+
+    @staticmethod
+    def _key(fx):
+        return (fx['date'], fx['home'], fx['away']) + tuple(fx[k] for k in DELTA_PARAMS)
+
+    def predict_many(self, params_list):
+        fixtures = [self._to_fixture(p) for p in params_list]
+        keys = [self._key(fx) for fx in fixtures]
+        results = [None] * len(fixtures)
+
+        misses = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    results[i] = self._cache[key]
+                else:
+                    misses.append(i)
+
+        if misses:
+            # Tutti i mancanti in un'unica chiamata batch sullo stato caldo. Scrittura in cache sotto
+            # _state_lock: un ingest non può invalidare le chiavi prima che vi arrivino risultati vecchi
+            with self._state_lock:
+                computed = self.state.predict([fixtures[i] for i in misses])
+                with self._lock:
+                    for i, res in zip(misses, computed):
+                        results[i] = res
+                        self._cache[keys[i]] = res
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+
+        return results
+
+    def predict(self, params):
+        return self.predict_many([params])[0]
+
+    def ingest(self, rows):
+        """
+        Aggiunge nuove partite (lista di dict o DataFrame con le colonne del dataset).
+        Dalla cache escono solo le previsioni con data successiva alla prima nuova partita:
+        la finestra Lega del motore copre tutto il dataset, quindi quelle precedenti non cambiano.
+        """
+        import pandas as pd
+
+        rows = pd.DataFrame(rows)
+        if rows.empty:
+            return {"version": self.version, "rows": 0, "invalidated": 0}
+        missing = [c for c in ('Date', 'HomeTeam', 'AwayTeam') if c not in rows.columns]
+        if missing:
+            raise ValueError(f"Colonne mancanti: {missing}")
+
+        with self._state_lock:
+            summary = self.state.ingest(rows)
+            min_date = summary['min_date'].strftime('%Y-%m-%d')
+            with self._lock:
+                stale = [key for key in self._cache if key[0] > min_date]
+                for key in stale:
+                    del self._cache[key]
+
+        return {
+            "version": summary['version'],
+            "rows": summary['rows'],
+            "rebuilt": summary['rebuilt'],
+            "teams": sorted(summary['teams']),
+            "league_seasons": sorted(f"{league} {season}" for league, season in summary['league_seasons']),
+            "min_date": min_date,
+            "invalidated": len(stale),
+        }
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    service = None  # PredictionService, assegnato in make_server
+
+    def log_message(self, format, *args):
+        # Niente log per richiesta: a centinaia di req/s riempirebbe la console
+        pass
+
+    def _send(self, status, body, content_type="application/json"):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        return status
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _timed(self, endpoint, func):
+        start = time.perf_counter()
+        status = 500
+        try:
+            status = func()
+        except (ValueError, KeyError, TypeError) as e:
+            status = self._send(400, {"error": str(e)})
+        except Exception as e:
+            status = self._send(500, {"error": str(e)})
+        finally:
+            REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint, status=status)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/health":
+            self._timed(path, lambda: self._send(200, {"status": "ok", "matches": len(self.service.df),
+                                                       "version": self.service.version}))
+        elif path == "/metrics":
+            self._send(200, REGISTRY.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+        elif path == "/metrics.json":
+            self._send(200, REGISTRY.to_dict())
+        else:
+            self._send(404, {"error": "Endpoint non trovato"})
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        if path == "/predict":
+            self._timed(path, lambda: self._send(200, self.service.predict(self._read_json())))
+        elif path == "/predict/batch":
+            def handle():
+                payload = self._read_json()
+                return self._send(200, {"results": self.service.predict_many(payload["matches"])})
+            self._timed(path, handle)
+        elif path == "/ingest":
+            self._timed(path, lambda: self._send(200, self.service.ingest(self._read_json()["rows"])))
+        else:
+            self._send(404, {"error": "Endpoint non trovato"})
+
+def make_server(host="127.0.0.1", port=8765, df=None):
+    if df is None:
+        snapshot = data_loader.load_snapshot()
+        df = data_loader.snapshot_dataframe(snapshot)
+        engine_index = data_loader.snapshot_engine_index(snapshot)
+        elo = data_loader.snapshot_elo(snapshot)
+    else:
+        from .elo import EloRatings
+        engine_index = None
+        elo = EloRatings.from_frame(df) if not df.empty else None
+    service = PredictionService(df, engine_index, elo)
+    handler = type("BoundPredictionHandler", (PredictionHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.server", description="Servizio HTTP previsioni")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port)
+    print(f"🚀 Servizio previsioni in ascolto su http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
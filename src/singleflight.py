@@ -0,0 +1,116 @@
+"""
+Single-flight: più chiamanti che chiedono lo stesso lavoro nello stesso momento
+(stessa chiave) -> uno solo lo esegue, gli altri aspettano e ne riusano il risultato.
+
+- nello stesso processo (più sessioni Streamlit, thread del server): chi arriva dopo
+  aspetta il risultato del primo;
+- tra processi diversi: lock su file (fcntl) in config.CACHE_DIR/locks. Chi ottiene il lock
+  dopo che un altro processo ha completato lo stesso lavoro (mentre aspettava) non lo ripete:
+  chiama reload() per rileggere il risultato appena scritto (es. dalla cache).
+
+Include atomic_write() per scrivere i file di cache via file temporaneo + rename,
+così nessun lettore vede mai un file scritto a metà.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+
+from . import config
+
+try:
+    import fcntl  # Solo POSIX: altrove il single-flight resta limitato al processo
+except ImportError:
+    fcntl = None
+
+LOCK_DIR = os.path.join(config.CACHE_DIR, 'locks')
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+_calls = {}
+_calls_lock = threading.Lock()
+
+def do(key, fn, reload=None):
+    """
+    Esegue fn() una sola volta per `key` tra tutti i chiamanti concorrenti e ne restituisce il risultato.
+    reload(): come recuperare il risultato se lo ha prodotto un altro processo mentre si aspettava
+    (default: None). Le eccezioni di fn() arrivano a tutti i chiamanti in attesa.
+    """
+    with _calls_lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = _run_locked(key, fn, reload)
+        return call.result
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _calls_lock:
+            del _calls[key]
+        call.done.set()
+
+def _lock_path(key):
+    readable = re.sub(r'[^A-Za-z0-9_.-]+', '_', key)[:60]
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(LOCK_DIR, f"{readable}-{digest}.lock")
+
+def _run_locked(key, fn, reload):
+    """Esegue fn() tenendo il lock su file della chiave (se disponibile)."""
+    if fcntl is None:
+        return fn()
+
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    started = time.time()
+    with open(_lock_path(key), 'a+') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            # Il file di lock contiene l'istante dell'ultimo completamento della chiave
+            lock_file.seek(0)
+            try:
+                completed_at = float(lock_file.read().strip() or 0)
+            except ValueError:
+                completed_at = 0.0
+            if completed_at >= started:
+                return reload() if reload is not None else None
+
+            result = fn()
+
+            lock_file.seek(0)
+            lock_file.truncate()
+            lock_file.write(repr(time.time()))
+            lock_file.flush()
+            return result
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def atomic_write(path, data):
+    """Scrive `data` (bytes) in `path` atomicamente: file temporaneo nella stessa cartella + os.replace."""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
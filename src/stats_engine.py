@@ -1,7 +1,6 @@
+import math
 import pandas as pd
 import numpy as np
-from scipy.stats import poisson
-import datetime
 
 # --- CONFIGURAZIONE COSTANTI ---
 RHO = -0.13             # Correzione Dixon-Coles
@@ -16,11 +15,13 @@ def calculate_match_prediction(
     delta_att_home: float = 1.00,
     delta_def_home: float = 1.00,
     delta_att_away: float = 1.00,
-    delta_def_away: float = 1.00
+    delta_def_away: float = 1.00,
+    elo=None
 ):
     """
     Funzione Principale (Orchestrator).
     Prende i dati, la data e i delta manuali. Restituisce un dizionario con l'analisi completa.
+    elo: EloRatings opzionale (src/elo.py) -> blocco 'elo' con rating alla data e controllo di coerenza.
     """
     
     # 1. TIME TRAVEL: Taglio del Database (IL MURO)
@@ -121,7 +122,7 @@ def calculate_match_prediction(
     # -------------------------------------------------------------------------
     # 6. OUTPUT FINALE
     # -------------------------------------------------------------------------
-    return {
+    result = {
         "match_info": {
             "date": date_match,
             "home": home_team,
@@ -153,6 +154,269 @@ def calculate_match_prediction(
         "exact_score_top5": probs_data['top_5_scores']
     }
 
+    # 7. ELO (opzionale): rating alla data con una ricerca binaria, niente scansioni dello storico
+    if elo is not None:
+        from .elo import attach
+        attach(result, elo, home_team, away_team, date_match)
+    return result
+
+# --- COLONNE NUMERICHE USATE DAL MOTORE BATCH ---
+ENGINE_COLUMNS = [
+    'home_goals', 'away_goals', 'home_shots', 'away_shots',
+    'home_shots_target', 'away_shots_target', 'home_corners', 'away_corners',
+    'home_red', 'away_red'
+]
+
+def build_engine_index(full_df: pd.DataFrame):
+    """
+    Precalcola (una sola volta per dataset) gli array numpy usati dal motore batch:
+    date ordinate, colonne statistiche e indice righe per squadra.
+    Da riutilizzare tra piu' chiamate a calculate_slate_predictions.
+    """
+    df = full_df.sort_values('Date', kind='mergesort').reset_index(drop=True)
+    n = len(df)
+
+    cols = {}
+    for col in ENGINE_COLUMNS:
+        if col in df.columns:
+            cols[col] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)
+        else:
+            cols[col] = np.full(n, np.nan)
+
+    home = df['HomeTeam'].to_numpy(dtype=object)
+    away = df['AwayTeam'].to_numpy(dtype=object)
+
+    # Indice squadra -> righe (ordinate per data) in cui gioca, in casa o fuori
+    team_rows = {}
+    rows_home = pd.Series(np.arange(n)).groupby(home).indices if n else {}
+    rows_away = pd.Series(np.arange(n)).groupby(away).indices if n else {}
+    for team in set(rows_home) | set(rows_away):
+        idx = np.concatenate([rows_home.get(team, np.empty(0, dtype=np.intp)),
+                              rows_away.get(team, np.empty(0, dtype=np.intp))])
+        team_rows[team] = np.sort(idx)
+
+    return {
+        'n_rows': n,
+        'dates': df['Date'].to_numpy(dtype='datetime64[ns]'),
+        'home': home,
+        'away': away,
+        'cols': cols,
+        'team_rows': team_rows
+    }
+
+def calculate_slate_predictions(full_df: pd.DataFrame, fixtures, engine_index=None, elo=None):
+    """
+    Versione Batch di calculate_match_prediction: prezza un'intera giornata (slate) in una chiamata.
+    fixtures: lista di dict con chiavi 'date', 'home', 'away' ed eventuali delta
+    ('delta_att_home', 'delta_def_home', 'delta_att_away', 'delta_def_away').
+    elo: EloRatings opzionale, come in calculate_match_prediction.
+    Restituisce una lista di dizionari nello stesso formato di calculate_match_prediction
+    (in caso di errore: {"error": ..., "match_info": ...}).
+    """
+    if engine_index is None:
+        engine_index = build_engine_index(full_df)
+    if not fixtures:
+        return []
+
+    cols = engine_index['cols']
+    dates = engine_index['dates']
+    target_dts = pd.to_datetime([fx['date'] for fx in fixtures]).values.astype('datetime64[ns]')
+    # IL MURO: per ogni match, indice della prima riga con Data >= data match
+    cutoffs = np.searchsorted(dates, target_dts, side='left')
+
+    results = [None] * len(fixtures)
+    valid = []
+    xg_home_list, xg_away_list = [], []
+
+    for i, fx in enumerate(fixtures):
+        match_info = {"date": fx['date'], "home": fx['home'], "away": fx['away']}
+        cutoff = cutoffs[i]
+        if cutoff == 0:
+            results[i] = {"error": "Nessun dato storico trovato prima della data selezionata.",
+                          "match_info": match_info}
+            continue
+
+        league = _league_params_from_index(engine_index, cutoff)
+        b, c, d = league['coef_b'], league['coef_c'], league['coef_d']
+
+        home_stats = _analyze_team_from_index(engine_index, fx['home'], cutoff, b, c, d)
+        if home_stats is None:
+            results[i] = {"error": f"Dati insufficienti per {fx['home']}", "match_info": match_info}
+            continue
+        away_stats = _analyze_team_from_index(engine_index, fx['away'], cutoff, b, c, d)
+        if away_stats is None:
+            results[i] = {"error": f"Dati insufficienti per {fx['away']}", "match_info": match_info}
+            continue
+
+        std = league['anchor_std']
+        att_home_adj = home_stats['attacco_raw'] * fx.get('delta_att_home', 1.00)
+        def_home_adj = home_stats['difesa_raw'] * fx.get('delta_def_home', 1.00)
+        att_away_adj = away_stats['attacco_raw'] * fx.get('delta_att_away', 1.00)
+        def_away_adj = away_stats['difesa_raw'] * fx.get('delta_def_away', 1.00)
+
+        xg_home = (att_home_adj / std) * (def_away_adj / std) * league['anchor_home']
+        xg_away = (att_away_adj / std) * (def_home_adj / std) * league['anchor_away']
+
+        results[i] = _prediction_payload(match_info, league, home_stats, away_stats, xg_home, xg_away)
+        valid.append(i)
+        xg_home_list.append(xg_home)
+        xg_away_list.append(xg_away)
+
+    # Poisson + Dixon-Coles per tutti i match validi in un colpo solo
+    if valid:
+        probs_list = _calculate_probabilities_batch(np.array(xg_home_list), np.array(xg_away_list))
+        for i, probs_data in zip(valid, probs_list):
+            results[i]["odds"] = probs_data['odds']
+            results[i]["probabilities"] = probs_data['probs_pct']
+            results[i]["exact_score_top5"] = probs_data['top_5_scores']
+
+    if elo is not None:
+        from .elo import attach
+        for fx, res in zip(fixtures, results):
+            attach(res, elo, fx['home'], fx['away'], fx['date'])
+
+    return results
+
+def _prediction_payload(match_info, league, home_stats, away_stats, xg_home, xg_away):
+    """Dizionario di risultato (senza quote/probabilità) nel formato di calculate_match_prediction."""
+    return {
+        "match_info": match_info,
+        "league_params": {
+            "games_analyzed": league['games_analyzed'],
+            "coef_b": round(league['coef_b'], 4),
+            "coef_c": round(league['coef_c'], 4),
+            "coef_d": round(league['coef_d'], 4),
+            "anchor_home": round(league['anchor_home'], 3),
+            "anchor_away": round(league['anchor_away'], 3),
+            "anchor_std": round(league['anchor_std'], 3)
+        },
+        "team_stats": {
+            "home_raw_att": round(home_stats['attacco_raw'], 3),
+            "home_raw_def": round(home_stats['difesa_raw'], 3),
+            "away_raw_att": round(away_stats['attacco_raw'], 3),
+            "away_raw_def": round(away_stats['difesa_raw'], 3),
+            "home_red_cards": home_stats['red_cards_count'],
+            "away_red_cards": away_stats['red_cards_count']
+        },
+        "xg_prediction": {
+            "xg_home": round(xg_home, 4),
+            "xg_away": round(xg_away, 4)
+        }
+    }
+
+# Colonne della finestra Lega: medie (ignorando i NaN) su cui si calibrano coefficienti e ancore
+LEAGUE_MEAN_COLUMNS = ['home_goals', 'away_goals', 'home_shots_target', 'away_shots_target',
+                       'home_shots_off', 'away_shots_off', 'home_corners', 'away_corners']
+
+def _league_window_values(cols, rows):
+    """Valori delle colonne LEAGUE_MEAN_COLUMNS per le righe indicate (slice o indici)."""
+    return {
+        'home_goals': cols['home_goals'][rows],
+        'away_goals': cols['away_goals'][rows],
+        'home_shots_target': cols['home_shots_target'][rows],
+        'away_shots_target': cols['away_shots_target'][rows],
+        'home_shots_off': cols['home_shots'][rows] - cols['home_shots_target'][rows],
+        'away_shots_off': cols['away_shots'][rows] - cols['away_shots_target'][rows],
+        'home_corners': cols['home_corners'][rows],
+        'away_corners': cols['away_corners'][rows],
+    }
+
+def _league_params_from_index(engine_index, cutoff):
+    """Calibrazione Lega (ultime N_GAMES_LEAGUE righe prima del cutoff) sugli array dell'indice."""
+    start = max(0, cutoff - N_GAMES_LEAGUE)
+
+    def mean(values):
+        # Come pandas .mean(): ignora i NaN
+        values = values[~np.isnan(values)]
+        return values.mean() if len(values) else np.nan
+
+    values = _league_window_values(engine_index['cols'], slice(start, cutoff))
+    means = {col: mean(v) for col, v in values.items()}
+    return _league_params_from_means(means, int(cutoff - start))
+
+def _league_params_from_means(means, games_analyzed):
+    """Coefficienti b, c, d e ancore Home/Away a partire dalle medie della finestra Lega."""
+    avg_goals_global = (means['home_goals'] + means['away_goals']) / 2
+    avg_hst_global = (means['home_shots_target'] + means['away_shots_target']) / 2
+    coef_b = avg_goals_global / avg_hst_global if avg_hst_global > 0 else 0
+    coef_c = coef_b / 5.0
+    coef_d = coef_b / 8.0
+
+    def anchor(mean_goals, mean_hst, mean_hsoff, mean_corners):
+        syn_val = (mean_hst * coef_b) + (mean_hsoff * coef_c) + (mean_corners * coef_d)
+        return (mean_goals * 0.60) + (syn_val * 0.40)
+
+    anchor_home = anchor(means['home_goals'], means['home_shots_target'], means['home_shots_off'], means['home_corners'])
+    anchor_away = anchor(means['away_goals'], means['away_shots_target'], means['away_shots_off'], means['away_corners'])
+
+    return {
+        'games_analyzed': games_analyzed,
+        'coef_b': coef_b,
+        'coef_c': coef_c,
+        'coef_d': coef_d,
+        'anchor_home': anchor_home,
+        'anchor_away': anchor_away,
+        'anchor_std': (anchor_home + anchor_away) / 2.0
+    }
+
+def _analyze_team_from_index(engine_index, team_name, cutoff, b, c, d):
+    """Stessa logica di _analyze_team, ma sugli array precalcolati (niente filtri sul DataFrame)."""
+    rows = engine_index['team_rows'].get(team_name)
+    if rows is None:
+        return None
+    k = np.searchsorted(rows, cutoff, side='left')
+    window = rows[max(0, k - N_GAMES_TEAM):k]
+    if len(window) < 5:
+        return None
+    return _team_stats_from_components(_team_window_components(engine_index, team_name, window), b, c, d)
+
+def _team_window_components(engine_index, team_name, window):
+    """
+    Medie pesate (Time Decay + Filtro Cartellino Rosso) della finestra squadra, indipendenti
+    dai coefficienti di Lega: combinate con b, c, d da _team_stats_from_components.
+    """
+    cols = engine_index['cols']
+    is_home = engine_index['home'][window] == team_name
+
+    # Time Decay + Filtro Cartellino Rosso (peso dimezzato)
+    time_weights = np.exp(np.linspace(-0.5, 0, len(window)))
+    has_red = (cols['home_red'][window] > 0) | (cols['away_red'][window] > 0)
+    w = np.where(has_red, time_weights * 0.5, time_weights)
+
+    def side(home_col, away_col, attack):
+        h, a = cols[home_col][window], cols[away_col][window]
+        return np.where(is_home == attack, h, a)
+
+    hs_h = cols['home_shots'][window] - cols['home_shots_target'][window]
+    hs_a = cols['away_shots'][window] - cols['away_shots_target'][window]
+    off_for = np.where(is_home, hs_h, hs_a)
+    off_ag = np.where(is_home, hs_a, hs_h)
+
+    return {
+        'goals_for': np.average(side('home_goals', 'away_goals', True), weights=w),
+        'hst_for': np.average(side('home_shots_target', 'away_shots_target', True), weights=w),
+        'off_for': np.average(off_for, weights=w),
+        'corn_for': np.average(side('home_corners', 'away_corners', True), weights=w),
+        'goals_ag': np.average(side('home_goals', 'away_goals', False), weights=w),
+        'hst_ag': np.average(side('home_shots_target', 'away_shots_target', False), weights=w),
+        'off_ag': np.average(off_ag, weights=w),
+        'corn_ag': np.average(side('home_corners', 'away_corners', False), weights=w),
+        'red_cards_count': int(has_red.sum())
+    }
+
+def _team_stats_from_components(comp, b, c, d):
+    syn_att = (comp['hst_for'] * b) + (comp['off_for'] * c) + (comp['corn_for'] * d)
+    attacco_raw = (comp['goals_for'] * 0.60) + (syn_att * 0.40)
+
+    syn_def = (comp['hst_ag'] * b) + (comp['off_ag'] * c) + (comp['corn_ag'] * d)
+    difesa_raw = (comp['goals_ag'] * 0.60) + (syn_def * 0.40)
+
+    return {
+        'attacco_raw': attacco_raw,
+        'difesa_raw': difesa_raw,
+        'red_cards_count': comp['red_cards_count']
+    }
+
 def _analyze_team(df_hist, team_name, b, c, d):
     """
     Analizza le ultime N10 partite della squadra (Casa+Trasferta).
@@ -256,99 +520,197 @@ def _calculate_probabilities_dixon_coles(lamb, mu):
     """
     Genera probabilità e quote usando Poisson + Correzione Dixon-Coles
     """
-    max_goals = 10
-    matrix = np.zeros((max_goals, max_goals))
-    
-    # 1. Matrice Base (Indipendente)
-    for x in range(max_goals):     # Home Goals
-        for y in range(max_goals): # Away Goals
-            prob = poisson.pmf(x, lamb) * poisson.pmf(y, mu)
-            matrix[x, y] = prob
-
-    # 2. Correzione Dixon-Coles
-    # Modifica solo 0-0, 0-1, 1-0, 1-1
-    # Rho = -0.13 (costante globale)
-    
-    # Helper per calcolo correzione
-    def correction_factor(x, y):
-        if x == 0 and y == 0:
-            return 1 - (lamb * mu * RHO)
-        elif x == 0 and y == 1:
-            return 1 + (lamb * RHO)
-        elif x == 1 and y == 0:
-            return 1 + (mu * RHO)
-        elif x == 1 and y == 1:
-            return 1 - RHO
-        else:
-            return 1.0
+    return _calculate_probabilities_batch(np.array([lamb]), np.array([mu]))[0]
+
+MAX_GOALS = 10
+
+# log(k!) per k = 0..MAX_GOALS-1 (sostituisce scipy.stats.poisson, costoso da importare)
+LOG_FACTORIALS = np.array([math.lgamma(k + 1) for k in range(MAX_GOALS)])
+
+def _poisson_pmf(goals, lam):
+    """Poisson pmf vettoriale: exp(k*log(lam) - log(k!) - lam), con 0*log(0) = 0 come scipy."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_term = np.where(goals == 0, 0.0, goals * np.log(lam))
+    return np.exp(log_term - LOG_FACTORIALS[goals] - lam)
+
+def _score_matrix_batch(lambs, mus, rho=RHO):
+    """
+    Matrici dei risultati esatti Poisson + Dixon-Coles per N match in un colpo solo.
+    Restituisce un array (N, MAX_GOALS, MAX_GOALS) normalizzato (ogni matrice somma a 1).
+    """
+    lambs = np.asarray(lambs, dtype=float)
+    mus = np.asarray(mus, dtype=float)
+    goals = np.arange(MAX_GOALS)
 
-    # Applichiamo correzione
-    for x in [0, 1]:
-        for y in [0, 1]:
-            factor = correction_factor(x, y)
-            # Safety Check: max(0, ...) per evitare probabilità negative su xG alti
-            matrix[x, y] = matrix[x, y] * max(0, factor)
+    # 1. Matrice Base (Indipendente): P(x) * P(y)
+    p_home = _poisson_pmf(goals[None, :], lambs[:, None])
+    p_away = _poisson_pmf(goals[None, :], mus[:, None])
+    matrix = p_home[:, :, None] * p_away[:, None, :]
+
+    # 2. Correzione Dixon-Coles (solo 0-0, 0-1, 1-0, 1-1)
+    # Safety Check: max(0, ...) per evitare probabilità negative su xG alti
+    matrix[:, 0, 0] *= np.maximum(0, 1 - (lambs * mus * rho))
+    matrix[:, 0, 1] *= np.maximum(0, 1 + (lambs * rho))
+    matrix[:, 1, 0] *= np.maximum(0, 1 + (mus * rho))
+    matrix[:, 1, 1] *= np.maximum(0, 1 - rho)
 
     # 3. Normalizzazione (Re-Balancing)
-    # La somma non è più 1.000, quindi dividiamo tutto per la nuova somma
-    total_prob = np.sum(matrix)
-    matrix = matrix / total_prob
-    
-    # 4. Aggregazione Risultati
-    prob_home = np.sum(np.tril(matrix, -1)) # Triangolo inferiore (x > y)
-    prob_draw = np.sum(np.diag(matrix))     # Diagonale (x == y)
-    prob_away = np.sum(np.triu(matrix, 1))  # Triangolo superiore (y > x)
-    
-    # Goal / NoGoal
-    prob_ng = matrix[0,0] + np.sum(matrix[0, 1:]) + np.sum(matrix[1:, 0]) # Uno dei due a 0
-    prob_gg = 1 - prob_ng
-    
-    # Over / Under 2.5
-    # Somma celle dove (x+y) < 2.5 (0-0, 1-0, 0-1, 1-1, 2-0, 0-2)
-    mask_under = np.fromfunction(lambda i, j: (i + j) < 2.5, (max_goals, max_goals), dtype=int)
-    prob_under = np.sum(matrix * mask_under)
-    prob_over = 1 - prob_under
-
-    # 5. Quote Decimali (Fair Odds)
-    def to_odd(p): return round(1/p, 2) if p > 0.001 else 999.00
-
-    odds = {
-        '1': to_odd(prob_home),
-        'X': to_odd(prob_draw),
-        '2': to_odd(prob_away),
-        'Gol': to_odd(prob_gg),
-        'NoGol': to_odd(prob_ng),
-        'Over2.5': to_odd(prob_over),
-        'Under2.5': to_odd(prob_under)
-    }
+    total_prob = matrix.reshape(len(matrix), -1).sum(axis=1)
+    return matrix / total_prob[:, None, None]
 
-    probabilities = {
-        '1': round(prob_home * 100, 1),
-        'X': round(prob_draw * 100, 1),
-        '2': round(prob_away * 100, 1),
-        'Gol': round(prob_gg * 100, 1),
-        'NoGol': round(prob_ng * 100, 1),
-        'Over2.5': round(prob_over * 100, 1),
-        'Under2.5': round(prob_under * 100, 1)
-    }
-    
-    # 6. Top 5 Risultati Esatti
-    scores_list = []
-    for x in range(max_goals):
-        for y in range(max_goals):
-            scores_list.append({
-                'score': f"{x}-{y}",
-                'prob': matrix[x, y]
-            })
-    
-    # Ordina per probabilità decrescente
-    scores_list.sort(key=lambda k: k['prob'], reverse=True)
-    top_5 = scores_list[:5]
-    for s in top_5:
-        s['prob'] = round(s['prob'] * 100, 1) # Converti in %
+def _market_probabilities_batch(matrix):
+    """Aggrega le matrici (N, G, G) nei mercati 1X2, GG/NG e Over/Under 2.5 (array di lunghezza N)."""
+    n_goals = matrix.shape[-1]
+    i, j = np.indices((n_goals, n_goals))
+    flat = matrix.reshape(len(matrix), -1)
+
+    prob_home = flat[:, (i > j).ravel()].sum(axis=1)  # Triangolo inferiore (x > y)
+    prob_draw = flat[:, (i == j).ravel()].sum(axis=1)  # Diagonale (x == y)
+    prob_away = flat[:, (i < j).ravel()].sum(axis=1)  # Triangolo superiore (y > x)
+
+    # Goal / NoGoal: uno dei due a 0
+    prob_ng = matrix[:, 0, 0] + matrix[:, 0, 1:].sum(axis=1) + matrix[:, 1:, 0].sum(axis=1)
+    prob_under = flat[:, ((i + j) < 2.5).ravel()].sum(axis=1)
 
     return {
-        'odds': odds,
-        'probs_pct': probabilities,
-        'top_5_scores': top_5
-    }
\ No newline at end of file
+        '1': prob_home,
+        'X': prob_draw,
+        '2': prob_away,
+        'Gol': 1 - prob_ng,
+        'NoGol': prob_ng,
+        'Over2.5': 1 - prob_under,
+        'Under2.5': prob_under
+    }
+
+# Griglia precompilata dei mercati (src/dc_grid.py): None = calcolo esatto, attivata da dc_grid.enable()
+MARKET_GRID = None
+
+def _top_scores_batch(lambs, mus, rho=RHO, n_top=5):
+    """
+    I n_top risultati esatti più probabili senza costruire le matrici (N, MAX_GOALS, MAX_GOALS):
+    candidate solo le celle tra gli n_top + 2 gol più probabili di ciascuna squadra, più le 4 celle
+    Dixon-Coles. Una cella esclusa ha almeno n_top + 2 celle sulla stessa riga/colonna con probabilità
+    Poisson maggiore, e al più 2 di queste hanno la correzione Dixon-Coles: resta fuori dalle prime n_top.
+    La normalizzazione (somma della matrice) si ottiene dalle marginali.
+    Restituisce (indici piatti x * MAX_GOALS + y, probabilità), array (N, n_top) in ordine decrescente.
+    """
+    lambs = np.asarray(lambs, dtype=float)
+    mus = np.asarray(mus, dtype=float)
+    n = len(lambs)
+    goals = np.arange(MAX_GOALS)
+    p_home = _poisson_pmf(goals[None, :], lambs[:, None])
+    p_away = _poisson_pmf(goals[None, :], mus[:, None])
+
+    # Celle Dixon-Coles 0-0, 0-1, 1-0, 1-1: fattori di correzione come in _score_matrix_batch
+    dc_x, dc_y = np.array([0, 0, 1, 1]), np.array([0, 1, 0, 1])
+    factors = np.column_stack([
+        np.maximum(0, 1 - (lambs * mus * rho)),
+        np.maximum(0, 1 + (lambs * rho)),
+        np.maximum(0, 1 + (mus * rho)),
+        np.broadcast_to(np.maximum(0, 1 - rho), n),
+    ])
+    dc_base = p_home[:, dc_x] * p_away[:, dc_y]
+    total = p_home.sum(axis=1) * p_away.sum(axis=1) + (dc_base * (factors - 1)).sum(axis=1)
+
+    k = min(n_top + 2, MAX_GOALS)
+    rows = np.arange(n)
+    top_home = np.argsort(-p_home, axis=1, kind='stable')[:, :k]
+    top_away = np.argsort(-p_away, axis=1, kind='stable')[:, :k]
+    prob = (np.take_along_axis(p_home, top_home, axis=1)[:, :, None]
+            * np.take_along_axis(p_away, top_away, axis=1)[:, None, :])
+    flat = top_home[:, :, None] * MAX_GOALS + top_away[:, None, :]
+
+    # Correzione Dixon-Coles sulle celle candidate; le celle Dixon-Coles escluse si aggiungono a parte
+    extra = dc_base * factors
+    for c in range(4):
+        in_home, in_away = top_home == dc_x[c], top_away == dc_y[c]
+        covered = in_home.any(axis=1) & in_away.any(axis=1)
+        sel = rows[covered]
+        prob[sel, in_home[sel].argmax(axis=1), in_away[sel].argmax(axis=1)] *= factors[sel, c]
+        extra[covered, c] = -1.0
+    prob = np.concatenate([prob.reshape(n, -1), extra], axis=1)
+    flat = np.concatenate([flat.reshape(n, -1), np.broadcast_to(dc_x * MAX_GOALS + dc_y, (n, 4))], axis=1)
+
+    # Prime n_top + 3 (argpartition: margine per le parità simmetriche x-y / y-x), poi in ordine:
+    # probabilità decrescente, a parità vince l'ordine (x, y) come nella matrice completa
+    best = np.argpartition(-prob, n_top + 2, axis=1)[:, :n_top + 3]
+    flat, prob = np.take_along_axis(flat, best, axis=1), np.take_along_axis(prob, best, axis=1)
+    order = np.lexsort((flat, -prob), axis=-1)[:, :n_top]
+    top_idx = np.take_along_axis(flat, order, axis=1)
+    # xG non validi (NaN): prime celle della matrice, come l'ordinamento stabile della matrice completa
+    top_idx[~np.isfinite(total)] = np.arange(n_top)
+    return top_idx, np.take_along_axis(prob, order, axis=1) / total[:, None]
+
+def _top_scores_single(lamb, mu, rho=RHO, n_top=5):
+    """_top_scores_batch per un solo match, in Python puro (niente overhead numpy su array di 1 elemento)."""
+    def pmf(lam):
+        if lam == 0:
+            return [1.0] + [0.0] * (MAX_GOALS - 1)
+        log_lam = math.log(lam) if lam > 0 else math.nan
+        return [math.exp(k * log_lam - LOG_FACTORIALS[k] - lam) for k in range(MAX_GOALS)]
+
+    p_home, p_away = pmf(lamb), pmf(mu)
+    cells = [p_h * p_a for p_h in p_home for p_a in p_away]
+    cells[0] *= max(0, 1 - (lamb * mu * rho))
+    cells[1] *= max(0, 1 + (lamb * rho))
+    cells[MAX_GOALS] *= max(0, 1 + (mu * rho))
+    cells[MAX_GOALS + 1] *= max(0, 1 - rho)
+    total = sum(cells)
+    top = sorted(range(len(cells)), key=lambda k: -cells[k])[:n_top] if math.isfinite(total) else list(range(n_top))
+    return [top], [[cells[k] / total for k in top]]
+
+_SCORE_LABELS = {}
+
+def _score_labels():
+    """Etichette 'x-y' degli indici piatti della matrice (per MAX_GOALS corrente)."""
+    if MAX_GOALS not in _SCORE_LABELS:
+        _SCORE_LABELS[MAX_GOALS] = [f"{k // MAX_GOALS}-{k % MAX_GOALS}" for k in range(MAX_GOALS * MAX_GOALS)]
+    return _SCORE_LABELS[MAX_GOALS]
+
+def _calculate_probabilities_batch(lambs, mus):
+    """
+    Versione vettoriale di _calculate_probabilities_dixon_coles:
+    restituisce una lista di dict {'odds', 'probs_pct', 'top_5_scores'}, uno per match.
+    Con la griglia dei mercati (MARKET_GRID) nessuna matrice completa: mercati interpolati
+    e top-5 da _top_scores_batch (_top_scores_single per un solo match).
+    """
+    lambs = np.asarray(lambs, dtype=float)
+    mus = np.asarray(mus, dtype=float)
+    if MARKET_GRID is not None:
+        markets = MARKET_GRID.markets(lambs, mus)
+        if len(lambs) == 1:
+            top_idx, top_prob = _top_scores_single(float(lambs[0]), float(mus[0]))
+        else:
+            top_idx, top_prob = _top_scores_batch(lambs, mus)
+    else:
+        matrix = _score_matrix_batch(lambs, mus)
+        markets = _market_probabilities_batch(matrix)
+        flat = matrix.reshape(len(matrix), -1)
+        # Ordinamento stabile: a parità di probabilità vince l'ordine (x, y)
+        top_idx = np.argsort(-flat, axis=1, kind='stable')[:, :5]
+        top_prob = np.take_along_axis(flat, top_idx, axis=1)
+
+    keys = list(markets)
+    if len(lambs) == 1:
+        # Match singolo (UI): arrotondamenti in Python, niente array temporanei
+        row = [float(markets[key][0]) for key in keys]
+        odds = [[round(1 / p, 2) if p > 0.001 else 999.00 for p in row]]
+        pct = [[round(p * 100, 1) for p in row]]
+        top_pct = [[round(float(p) * 100, 1) for p in top_prob[0]]]
+    else:
+        # Quote Decimali (Fair Odds) e percentuali arrotondate in blocco; il ciclo crea solo i dict
+        probs = np.column_stack([markets[key] for key in keys])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            odds = np.where(probs > 0.001, np.round(1 / probs, 2), 999.00).tolist()
+        pct = np.round(probs * 100, 1).tolist()
+        top_pct = np.round(top_prob * 100, 1).tolist()
+    labels = _score_labels()
+
+    out = []
+    for odds_row, pct_row, idx, top_row in zip(odds, pct, np.asarray(top_idx).tolist(), top_pct):
+        out.append({
+            'odds': dict(zip(keys, odds_row)),
+            'probs_pct': dict(zip(keys, pct_row)),
+            'top_5_scores': [{'score': labels[k], 'prob': p} for k, p in zip(idx, top_row)]
+        })
+    return out
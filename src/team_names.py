@@ -0,0 +1,125 @@
+"""
+Nomi delle squadre: API-Football ('Manchester United', 'AC Milan') <-> CSV football-data ('Man United', 'Milan').
+
+Il motore conosce solo i nomi dei CSV: le partite che arrivano dall'API (giornate, previsioni dello
+scheduler, partite live) vanno tradotte prima di prezzarle. La traduzione cerca il nome tra le
+squadre della lega nei CSV, in quest'ordine:
+    1. nome identico
+    2. ALIASES (nomi che nessuna somiglianza può abbinare, es. 'Wolverhampton Wanderers' -> 'Wolves')
+    3. nome normalizzato identico (minuscole, senza accenti, sigle tipo FC/AC, abbreviazioni espanse)
+    4. un solo nome contenuto nell'altro ('Borussia Dortmund' -> 'Dortmund')
+    5. somiglianza (difflib) sopra NAME_MATCH_MIN, se la migliore non è in parità
+
+Nel verso opposto (match CSV -> partita API dello stesso giorno) c'è match_fixture.
+
+Il modulo è leggero da importare (niente pandas/numpy).
+"""
+import difflib
+import re
+import unicodedata
+
+NAME_MATCH_MIN = 0.6    # Somiglianza minima per abbinare due nomi (media casa/ospite per le partite)
+
+_NAME_NOISE = re.compile(r"\b(fc|cf|afc|ac|as|sc|ssc|us|calcio|club|de|the)\b")
+
+# Abbreviazioni dei CSV espanse in entrambi i versi ('Man City' e 'Manchester City' -> 'manchester city')
+ABBREVIATIONS = {'man': 'manchester', 'utd': 'united', 'st': 'saint'}
+
+# Nome API normalizzato -> nome CSV (solo dove normalizzazione e somiglianza non bastano)
+ALIASES = {
+    'wolverhampton wanderers': 'Wolves',
+    'nottingham forest': "Nott'm Forest",
+    'athletic': 'Ath Bilbao',
+    'atletico madrid': 'Ath Madrid',
+    'real sociedad': 'Sociedad',
+    'rayo vallecano': 'Vallecano',
+    'celta vigo': 'Celta',
+    'espanyol': 'Espanol',
+    'paris saint germain': 'Paris SG',
+    'borussia monchengladbach': "M'gladbach",
+    'bayer leverkusen': 'Leverkusen',
+    'eintracht frankfurt': 'Ein Frankfurt',
+    'fsv mainz 05': 'Mainz',
+    'sporting cp': 'Sp Lisbon',
+    'braga': 'Sp Braga',
+    'vitoria guimaraes': 'Guimaraes',
+    'hellas verona': 'Verona',
+}
+
+def normalize(name):
+    """Nome confrontabile: minuscolo, senza accenti e punteggiatura, senza sigle societarie, abbreviazioni espanse."""
+    name = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode().lower()
+    name = _NAME_NOISE.sub(" ", re.sub(r"[^a-z0-9 ]", " ", name))
+    return " ".join(ABBREVIATIONS.get(token, token) for token in name.split())
+
+def name_similarity(a, b):
+    return difflib.SequenceMatcher(None, normalize(a), normalize(b)).ratio()
+
+def resolve(name, candidates):
+    """Nome CSV (tra `candidates`) della squadra `name`, o None se nessun abbinamento è affidabile."""
+    return resolve_many([name], candidates)[name]
+
+def resolve_many(names, candidates):
+    """{nome: nome CSV o None} per più nomi, normalizzando le candidate una volta sola."""
+    candidates = list(dict.fromkeys(candidates))
+    by_norm = {}
+    for cand in candidates:
+        by_norm.setdefault(normalize(cand), []).append(cand)
+    known = set(candidates)
+
+    resolved = {}
+    for name in dict.fromkeys(names):
+        resolved[name] = _resolve_one(name, candidates, known, by_norm)
+    return resolved
+
+def _resolve_one(name, candidates, known, by_norm):
+    if name in known:
+        return name
+    norm = normalize(name)
+    alias = ALIASES.get(norm)
+    if alias in known:
+        return alias
+    if len(by_norm.get(norm, ())) == 1:
+        return by_norm[norm][0]
+
+    tokens = set(norm.split())
+    contained = [cands[0] for cand_norm, cands in by_norm.items()
+                 if len(cands) == 1 and cand_norm and (set(cand_norm.split()) <= tokens or tokens <= set(cand_norm.split()))]
+    if len(contained) == 1:
+        return contained[0]
+
+    scores = sorted(((difflib.SequenceMatcher(None, norm, cand_norm).ratio(), cands[0])
+                     for cand_norm, cands in by_norm.items() if len(cands) == 1), reverse=True)
+    if scores and scores[0][0] >= NAME_MATCH_MIN and (len(scores) == 1 or scores[0][0] > scores[1][0]):
+        return scores[0][1]
+    return None
+
+def resolve_fixtures(fixtures, candidates):
+    """
+    Partite API (dict con date, home, away) con i nomi tradotti in nomi CSV.
+    I nomi non abbinati restano quelli API (il motore li segnala con 'error').
+    """
+    resolved = resolve_many([f[side] for f in fixtures for side in ('home', 'away')], candidates)
+    return [{**f, 'home': resolved[f['home']] or f['home'], 'away': resolved[f['away']] or f['away']} for f in fixtures]
+
+def snapshot_teams(snapshot, league):
+    """Squadre della lega nei CSV (tutte le stagioni dello snapshot, dalla più recente)."""
+    teams = []
+    for season in snapshot['seasons'].get(league, []):
+        teams.extend(snapshot['teams'].get((league, season), []))
+    return list(dict.fromkeys(teams))
+
+def dataframe_teams(df, league=None):
+    """Squadre del DataFrame storico (solo della lega, se indicata)."""
+    if league is not None:
+        df = df[df['League'] == league]
+    return list(dict.fromkeys(list(df['HomeTeam'].unique()) + list(df['AwayTeam'].unique())))
+
+def match_fixture(candidates, home, away):
+    """Partita API (dict con 'home', 'away') più simile a home/away tra le candidate dello stesso giorno, o None."""
+    best, best_score = None, NAME_MATCH_MIN
+    for fx in candidates:
+        score = (name_similarity(fx['home'], home) + name_similarity(fx['away'], away)) / 2
+        if score >= best_score:
+            best, best_score = fx, score
+    return best
@@ -0,0 +1,328 @@
+"""
+Tuning delle costanti del motore: ricerca a griglia o casuale con log-loss 1X2 walk-forward.
+
+Le costanti fisse di stats_engine diventano un dizionario di parametri (DEFAULT_PARAMS):
+    n_games_team    N_GAMES_TEAM (finestra squadra)
+    n_games_league  N_GAMES_LEAGUE (finestra Lega)
+    decay           inizio del Time Decay, exp(linspace(decay, 0, n))
+    red_weight      peso delle partite con cartellino rosso
+    real_weight     peso dei gol reali nel blend reale/sintetico (sintetico = 1 - real_weight)
+    div_c, div_d    coef_c = coef_b / div_c, coef_d = coef_b / div_d
+    rho             correzione Dixon-Coles
+
+Walk-forward: ogni partita è prezzata solo con le partite precedenti (stesso "muro" del motore)
+e valutata con la log-loss del risultato 1X2. Ogni lega è calibrata sui propri dati.
+
+Le feature che non dipendono dai parametri (somme cumulate della Lega, statistiche per/contro
+di ogni squadra partita per partita, posizione di ogni partita valutata nello storico delle due
+squadre) sono calcolate una volta sola e condivise con i processi del pool in memoria condivisa.
+
+Esempio:
+    results = tuning.search(df, tuning.random_candidates(n=200))
+    tuning.best_per_league(results)
+"""
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import stats_engine
+
+DEFAULT_PARAMS = {
+    'n_games_team': stats_engine.N_GAMES_TEAM,
+    'n_games_league': stats_engine.N_GAMES_LEAGUE,
+    'decay': -0.5,
+    'red_weight': 0.5,
+    'real_weight': 0.60,
+    'div_c': 5.0,
+    'div_d': 8.0,
+    'rho': stats_engine.RHO,
+}
+
+# Spazio di ricerca di default: liste = valori discreti, tuple (min, max) = intervallo (random search)
+SEARCH_SPACE = {
+    'n_games_team': [6, 8, 10, 12, 15],
+    'n_games_league': [190, 380, 760],
+    'decay': (-1.5, 0.0),
+    'red_weight': (0.25, 1.0),
+    'real_weight': (0.3, 0.9),
+    'div_c': (3.0, 10.0),
+    'div_d': (5.0, 15.0),
+    'rho': (-0.25, 0.05),
+}
+
+MIN_TEAM_GAMES = 5      # Come il motore: meno partite -> squadra non valutabile
+MIN_HISTORY = 380       # Partite di lega prima della prima partita valutata
+EPS = 1e-15
+
+# Statistiche squadra partita per partita: per (4) e contro (4), poi flag cartellino rosso
+TEAM_STATS = ['goals_for', 'hst_for', 'off_for', 'corn_for', 'goals_ag', 'hst_ag', 'off_ag', 'corn_ag']
+
+# --- CANDIDATI ---
+
+def grid_candidates(space=None):
+    """Prodotto cartesiano dello spazio (le tuple (min, max) diventano [min, media, max])."""
+    space = space or SEARCH_SPACE
+    values = {}
+    for name, spec in space.items():
+        if isinstance(spec, tuple):
+            low, high = spec
+            spec = [low, (low + high) / 2, high]
+        values[name] = list(spec)
+    names = list(values)
+    return [dict(DEFAULT_PARAMS, **dict(zip(names, combo))) for combo in itertools.product(*values.values())]
+
+def random_candidates(n=100, space=None, seed=0):
+    """n combinazioni casuali: scelta uniforme per le liste, uniforme continua per le tuple (min, max)."""
+    space = space or SEARCH_SPACE
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        params = dict(DEFAULT_PARAMS)
+        for name, spec in space.items():
+            if isinstance(spec, tuple):
+                low, high = spec
+                params[name] = rng.randint(low, high) if isinstance(low, int) and isinstance(high, int) else rng.uniform(low, high)
+            else:
+                params[name] = rng.choice(spec)
+        out.append(params)
+    return out
+
+# --- FEATURE INDIPENDENTI DAI PARAMETRI ---
+
+def build_features(df, leagues=None, min_history=MIN_HISTORY):
+    """
+    Array piatti (tutte le leghe concatenate) usati dalla valutazione:
+    - lg_sum / lg_cnt: somme e conteggi cumulati (NaN esclusi) delle colonne LEAGUE_MEAN_COLUMNS per lega;
+    - tm: statistiche per/contro di ogni squadra, partita per partita (ordinate per squadra e data);
+    - ev_*: partite valutate (cutoff nella lega, fine dello storico e numero di partite di ogni squadra, esito).
+    Restituisce (features, league_names).
+    """
+    league_names = sorted(leagues or df['League'].unique())
+    lg_sum, lg_cnt, tm_parts = [], [], []
+    ev = {k: [] for k in ('league', 'cs_base', 'cutoff', 'home_end', 'home_k', 'away_end', 'away_k', 'outcome')}
+    cs_offset = 0
+    tm_offset = 0
+
+    for lid, league in enumerate(league_names):
+        ldf = df[df['League'] == league]
+        if ldf.empty:
+            continue
+        index = stats_engine.build_engine_index(ldf)
+        cols, n = index['cols'], index['n_rows']
+
+        # Somme cumulate della finestra Lega: media su [start, cutoff) = differenza di due somme
+        values = stats_engine._league_window_values(cols, slice(0, n))
+        s = np.zeros((n + 1, len(values)))
+        c = np.zeros((n + 1, len(values)))
+        for j, v in enumerate(values.values()):
+            valid = ~np.isnan(v)
+            s[1:, j] = np.cumsum(np.where(valid, v, 0.0))
+            c[1:, j] = np.cumsum(valid)
+        lg_sum.append(s)
+        lg_cnt.append(c)
+
+        # Statistiche per/contro di ogni squadra
+        team_end = {}
+        for team, rows in index['team_rows'].items():
+            is_home = index['home'][rows] == team
+            hs_off = cols['home_shots'][rows] - cols['home_shots_target'][rows]
+            as_off = cols['away_shots'][rows] - cols['away_shots_target'][rows]
+
+            def side(h, a, attack):
+                return np.where(is_home == attack, h, a)
+
+            feats = np.column_stack([
+                side(cols['home_goals'][rows], cols['away_goals'][rows], True),
+                side(cols['home_shots_target'][rows], cols['away_shots_target'][rows], True),
+                side(hs_off, as_off, True),
+                side(cols['home_corners'][rows], cols['away_corners'][rows], True),
+                side(cols['home_goals'][rows], cols['away_goals'][rows], False),
+                side(cols['home_shots_target'][rows], cols['away_shots_target'][rows], False),
+                side(hs_off, as_off, False),
+                side(cols['home_corners'][rows], cols['away_corners'][rows], False),
+                (cols['home_red'][rows] > 0) | (cols['away_red'][rows] > 0),
+            ])
+            tm_parts.append(feats)
+            team_end[team] = (tm_offset, rows)
+            tm_offset += len(rows)
+
+        # Partite valutate: esito noto, storico di lega sufficiente, almeno MIN_TEAM_GAMES per squadra
+        cutoffs = np.searchsorted(index['dates'], index['dates'], side='left')
+        hg, ag = cols['home_goals'], cols['away_goals']
+        for r in np.flatnonzero((cutoffs >= min_history) & ~np.isnan(hg) & ~np.isnan(ag)):
+            cutoff = cutoffs[r]
+            h_off, h_rows = team_end[index['home'][r]]
+            a_off, a_rows = team_end[index['away'][r]]
+            h_k = np.searchsorted(h_rows, cutoff, side='left')
+            a_k = np.searchsorted(a_rows, cutoff, side='left')
+            if h_k < MIN_TEAM_GAMES or a_k < MIN_TEAM_GAMES:
+                continue
+            ev['league'].append(lid)
+            ev['cs_base'].append(cs_offset)
+            ev['cutoff'].append(cutoff)
+            ev['home_end'].append(h_off + h_k)
+            ev['home_k'].append(h_k)
+            ev['away_end'].append(a_off + a_k)
+            ev['away_k'].append(a_k)
+            ev['outcome'].append(0 if hg[r] > ag[r] else (1 if hg[r] == ag[r] else 2))
+        cs_offset += n + 1
+
+    features = {
+        'lg_sum': np.concatenate(lg_sum) if lg_sum else np.zeros((0, 8)),
+        'lg_cnt': np.concatenate(lg_cnt) if lg_cnt else np.zeros((0, 8)),
+        'tm': np.concatenate(tm_parts) if tm_parts else np.zeros((0, 9)),
+    }
+    for key, values in ev.items():
+        features[f'ev_{key}'] = np.asarray(values, dtype=np.int64)
+    return features, league_names
+
+# --- VALUTAZIONE ---
+
+def _team_strength(tm, end, k, params, b, c, d):
+    """Attacco/difesa raw per ogni partita valutata (stessa logica di _analyze_team, vettoriale)."""
+    n_team = int(params['n_games_team'])
+    length = np.minimum(k, n_team)
+    j = np.arange(n_team)[None, :]
+    mask = j < length[:, None]
+    idx = np.where(mask, end[:, None] - length[:, None] + j, 0)
+    window = tm[idx]  # (N, n_team, 9)
+
+    # Time Decay: exp(linspace(decay, 0, length)) per ogni riga
+    step = -params['decay'] / np.maximum(length - 1, 1)
+    w = np.exp(params['decay'] + j * step[:, None])
+    w = np.where(window[:, :, 8] > 0, w * params['red_weight'], w)
+    w = np.where(mask, w, 0.0)
+
+    stats = np.where(mask[:, :, None], window[:, :, :8], 0.0)
+    comp = (stats * w[:, :, None]).sum(axis=1) / w.sum(axis=1)[:, None]
+
+    real, syn = params['real_weight'], 1.0 - params['real_weight']
+    attack = comp[:, 0] * real + (comp[:, 1] * b + comp[:, 2] * c + comp[:, 3] * d) * syn
+    defense = comp[:, 4] * real + (comp[:, 5] * b + comp[:, 6] * c + comp[:, 7] * d) * syn
+    return attack, defense
+
+def evaluate(features, params, n_leagues):
+    """Log-loss 1X2 walk-forward per lega: restituisce (somma log-loss, partite valutate), array per lega."""
+    lg_sum, lg_cnt = features['lg_sum'], features['lg_cnt']
+    base, cutoff = features['ev_cs_base'], features['ev_cutoff']
+    if len(cutoff) == 0:
+        return np.zeros(n_leagues), np.zeros(n_leagues)
+
+    end = base + cutoff
+    start = base + np.maximum(cutoff - int(params['n_games_league']), 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = (lg_sum[end] - lg_sum[start]) / (lg_cnt[end] - lg_cnt[start])
+        # Colonne come in LEAGUE_MEAN_COLUMNS
+        g_h, g_a, hst_h, hst_a, off_h, off_a, cor_h, cor_a = means.T
+
+        avg_goals = (g_h + g_a) / 2
+        avg_hst = (hst_h + hst_a) / 2
+        b = np.where(avg_hst > 0, avg_goals / avg_hst, 0.0)
+        c = b / params['div_c']
+        d = b / params['div_d']
+
+        real, syn = params['real_weight'], 1.0 - params['real_weight']
+        anchor_home = g_h * real + (hst_h * b + off_h * c + cor_h * d) * syn
+        anchor_away = g_a * real + (hst_a * b + off_a * c + cor_a * d) * syn
+        std = (anchor_home + anchor_away) / 2.0
+
+        tm = features['tm']
+        att_h, def_h = _team_strength(tm, features['ev_home_end'], features['ev_home_k'], params, b, c, d)
+        att_a, def_a = _team_strength(tm, features['ev_away_end'], features['ev_away_k'], params, b, c, d)
+
+        xg_home = (att_h / std) * (def_a / std) * anchor_home
+        xg_away = (att_a / std) * (def_h / std) * anchor_away
+
+    valid = np.isfinite(xg_home) & np.isfinite(xg_away) & (xg_home > 0) & (xg_away > 0)
+    matrix = stats_engine._score_matrix_batch(xg_home[valid], xg_away[valid], rho=params['rho'])
+    markets = stats_engine._market_probabilities_batch(matrix)
+    probs = np.column_stack([markets['1'], markets['X'], markets['2']])
+    p = probs[np.arange(len(probs)), features['ev_outcome'][valid]]
+    loss = -np.log(np.clip(p, EPS, 1.0))
+
+    leagues = features['ev_league'][valid]
+    return (np.bincount(leagues, weights=loss, minlength=n_leagues),
+            np.bincount(leagues, minlength=n_leagues).astype(float))
+
+# --- MEMORIA CONDIVISA E POOL ---
+
+_WORKER_FEATURES = None
+_WORKER_SHM = []
+_WORKER_N_LEAGUES = 0
+
+def _share(features):
+    """Copia gli array in blocchi SharedMemory: restituisce (blocchi, spec per i worker)."""
+    from multiprocessing import shared_memory
+
+    blocks, spec = [], {}
+    for key, arr in features.items():
+        arr = np.ascontiguousarray(arr)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        blocks.append(shm)
+        spec[key] = (shm.name, arr.shape, arr.dtype.str)
+    return blocks, spec
+
+def _init_worker(spec, n_leagues):
+    """Inizializzatore del pool: i worker leggono le feature dalla memoria condivisa, senza copie."""
+    from multiprocessing import shared_memory
+
+    global _WORKER_FEATURES, _WORKER_SHM, _WORKER_N_LEAGUES
+    _WORKER_FEATURES = {}
+    for key, (name, shape, dtype) in spec.items():
+        shm = shared_memory.SharedMemory(name=name)
+        _WORKER_SHM.append(shm)  # il blocco resta aperto finché vive il processo
+        _WORKER_FEATURES[key] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    _WORKER_N_LEAGUES = n_leagues
+
+def _evaluate_worker(params):
+    return evaluate(_WORKER_FEATURES, params, _WORKER_N_LEAGUES)
+
+def search(df, candidates=None, leagues=None, workers=None, min_history=MIN_HISTORY, features=None):
+    """
+    Valuta i candidati (lista di dict di parametri; DEFAULT_PARAMS è sempre incluso come riferimento)
+    su un pool di processi. Restituisce un DataFrame: candidate, league, logloss, n, + colonne parametri.
+    """
+    candidates = [dict(DEFAULT_PARAMS)] + [dict(DEFAULT_PARAMS, **p) for p in (candidates or grid_candidates())]
+    if features is None:
+        features, league_names = build_features(df, leagues, min_history)
+    else:
+        features, league_names = features
+    n_leagues = len(league_names)
+
+    workers = workers or os.cpu_count() or 1
+    print(f"⏳ Tuning: {len(candidates)} combinazioni, {len(features['ev_cutoff'])} partite, {n_leagues} leghe")
+    if workers <= 1 or len(candidates) < 2:
+        scores = [evaluate(features, p, n_leagues) for p in candidates]
+    else:
+        blocks, spec = _share(features)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(spec, n_leagues)) as pool:
+                scores = list(pool.map(_evaluate_worker, candidates, chunksize=max(1, len(candidates) // (workers * 4))))
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+
+    rows = []
+    for i, (params, (loss, count)) in enumerate(zip(candidates, scores)):
+        for lid, league in enumerate(league_names):
+            if count[lid] == 0:
+                continue
+            rows.append(dict(candidate=i, league=league, logloss=loss[lid] / count[lid], n=int(count[lid]), **params))
+    return pd.DataFrame(rows)
+
+def best_per_league(results):
+    """Migliori parametri per lega, con la log-loss dei parametri attuali (candidate 0) come confronto."""
+    if results.empty:
+        return results
+    baseline = results[results['candidate'] == 0].set_index('league')['logloss']
+    best = results.loc[results.groupby('league')['logloss'].idxmin()].reset_index(drop=True)
+    best['baseline_logloss'] = best['league'].map(baseline)
+    best['improvement'] = best['baseline_logloss'] - best['logloss']
+    return best.sort_values('improvement', ascending=False).reset_index(drop=True)
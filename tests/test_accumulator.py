@@ -0,0 +1,62 @@
+"""
+optimize() contro una ricerca esaustiva (itertools) su slate piccole: stesse migliori multiple,
+anche con rapporti identici tra partite (parità sulla soglia).
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import accumulator
+
+def random_legs(rng, n_fixtures, markets=3, equal=False):
+    rows = []
+    for fixture in range(n_fixtures):
+        for market in accumulator.MARKETS[:markets]:
+            if equal:
+                prob, odd = 0.5, 2.2 - 0.05 * accumulator.MARKETS.index(market)
+            else:
+                prob = rng.uniform(0.15, 0.8)
+                odd = rng.uniform(0.85, 1.25) / prob
+            rows.append({'fixture': fixture, 'match': f'Casa{fixture} - Ospite{fixture}', 'market': market,
+                         'prob': prob, 'odd': odd})
+    return pd.DataFrame(rows)
+
+def brute_force(legs, min_legs, max_legs, min_edge, top_n):
+    """EV delle top_n multiple, enumerate tutte: partite, poi una selezione per partita."""
+    by_fixture = [group.index.to_list() for _, group in legs.groupby('fixture')]
+    ratio = (legs['prob'] * legs['odd']).to_numpy()
+    edges = []
+    for size in range(min_legs, max_legs + 1):
+        for fixtures in itertools.combinations(by_fixture, size):
+            for combo in itertools.product(*fixtures):
+                edge = ratio[list(combo)].prod() - 1
+                if edge >= min_edge:
+                    edges.append(edge)
+    return sorted(edges, reverse=True)[:top_n]
+
+@pytest.mark.parametrize('seed', range(8))
+@pytest.mark.parametrize('min_legs, max_legs, top_n', [(2, 3, 5), (2, 4, 20), (3, 5, 10)])
+def test_optimize_matches_brute_force(seed, min_legs, max_legs, top_n):
+    rng = np.random.default_rng(seed)
+    legs = random_legs(rng, n_fixtures=7)
+    best = accumulator.optimize(legs, min_legs=min_legs, max_legs=max_legs, min_edge=0.0, top_n=top_n)
+    expected = brute_force(legs, min_legs, max_legs, 0.0, top_n)
+    assert best['edge'].to_list() == [round(e, 4) for e in expected]
+
+@pytest.mark.parametrize('top_n', [1, 3, 7])
+def test_optimize_ties_on_threshold(top_n):
+    # Tutte le partite uguali: molte multiple con lo stesso EV, sulla soglia fissata dalla beam search
+    legs = random_legs(None, n_fixtures=6, equal=True)
+    best = accumulator.optimize(legs, min_legs=2, max_legs=4, top_n=top_n)
+    expected = brute_force(legs, 2, 4, 0.0, top_n)
+    assert len(best) == len(expected)
+    assert best['edge'].to_list() == [round(e, 4) for e in expected]
+
+def test_optimize_min_edge():
+    legs = random_legs(np.random.default_rng(42), n_fixtures=6)
+    best = accumulator.optimize(legs, min_legs=2, max_legs=3, min_edge=0.1, top_n=50)
+    expected = brute_force(legs, 2, 3, 0.1, 50)
+    assert best['edge'].to_list() == [round(e, 4) for e in expected]
+    assert (best['edge'] >= 0.1 - 1e-4).all()
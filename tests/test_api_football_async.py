@@ -0,0 +1,156 @@
+"""
+AsyncFootballAPI contro un server locale (ThreadingHTTPServer della stdlib) al posto di API-Football:
+retry su 429/5xx, semaforo, token bucket, header di quota e archivio locale.
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src import api_store
+from src.api_football_async import AsyncFootballAPI, TokenBucket
+
+FIXTURE = {
+    'fixture': {'id': 101, 'date': '2030-05-01T18:00:00+00:00', 'status': {'short': 'NS'}},
+    'teams': {'home': {'name': 'Milan'}, 'away': {'name': 'Inter'}},
+    'goals': {'home': None, 'away': None},
+    'league': {'round': 'Regular Season - 1'},
+}
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        stub = self.server.stub
+        with stub.lock:
+            stub.requests.append(self.path)
+            stub.in_flight += 1
+            stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+            status, headers = stub.script.pop(0) if stub.script else (200, {})
+        time.sleep(stub.delay)
+        body = json.dumps({'errors': [], 'response': [FIXTURE]}).encode('utf-8')
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with stub.lock:
+            stub.in_flight -= 1
+
+class Stub:
+    """Server di prova: `script` = risposte (status, header) in ordine, poi 200 senza header."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = []
+        self.script = []
+        self.delay = 0.0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.stub = self
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+@pytest.fixture
+def stub():
+    stub = Stub()
+    thread = threading.Thread(target=stub.server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
+
+@pytest.fixture
+def make_api(stub, tmp_path):
+    def make(**kwargs):
+        kwargs.setdefault('backoff_base', 0.01)
+        kwargs.setdefault('requests_per_minute', 600)
+        store = api_store.ApiStore(str(tmp_path / 'api.sqlite'))
+        return AsyncFootballAPI(base_url=stub.url, api_key='test', store=store, **kwargs)
+    return make
+
+def test_retry_on_429_and_5xx(stub, make_api):
+    stub.script = [(429, {}), (503, {}), (200, {})]
+    api = make_api(max_retries=3)
+    data = api.run(api._request('fixtures', {'league': '135', 'season': '2029'}))
+    assert data['response'][0]['fixture']['id'] == 101
+    assert len(stub.requests) == 3
+    assert api.calls == 3
+
+def test_gives_up_after_max_retries(stub, make_api):
+    stub.script = [(500, {})] * 10
+    api = make_api(max_retries=2)
+    assert api.run(api._request('fixtures', {'league': '135'})) is None
+    assert len(stub.requests) == 3
+
+def test_semaphore_limits_requests_in_flight(stub, make_api):
+    stub.delay = 0.1
+    api = make_api(max_concurrency=2)
+
+    async def many():
+        return await asyncio.gather(*(api._request('fixtures', {'page': str(i)}) for i in range(6)))
+
+    assert all(r is not None for r in api.run(many()))
+    assert len(stub.requests) == 6
+    assert stub.max_in_flight == 2
+
+def test_quota_headers(stub, make_api):
+    stub.script = [(200, {'x-ratelimit-requests-remaining': '42', 'x-ratelimit-requests-limit': '100',
+                          'X-RateLimit-Remaining': '3', 'X-RateLimit-Limit': '30'})]
+    api = make_api()
+    api.run(api._request('fixtures', {}))
+    assert api.quota == {'daily_remaining': 42, 'daily_limit': 100, 'minute_remaining': 3, 'minute_limit': 30}
+    # Bucket ricalibrato sul limite per minuto dichiarato dall'API
+    assert api._bucket.capacity == 30
+    assert api._bucket.tokens <= 3
+
+def test_daily_credits_exhausted_skips_requests(stub, make_api):
+    stub.script = [(200, {'x-ratelimit-requests-remaining': '0', 'x-ratelimit-requests-limit': '100'})]
+    api = make_api()
+
+    async def two():
+        first = await api._request('fixtures', {})
+        second = await api._request('fixtures', {})
+        return first, second
+
+    first, second = api.run(two())
+    assert first is not None and second is None
+    assert len(stub.requests) == 1
+
+def test_minute_limit_from_headers_throttles(stub, make_api):
+    # Nessuna richiesta rimasta nel minuto, limite 600/min: la successiva aspetta ~0.1 s
+    stub.script = [(200, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Limit': '600'})]
+    api = make_api()
+
+    async def two():
+        await api._request('fixtures', {})
+        start = time.perf_counter()
+        await api._request('fixtures', {})
+        return time.perf_counter() - start
+
+    assert api.run(two()) >= 0.09
+
+def test_token_bucket_rate():
+    async def acquire_all():
+        bucket = TokenBucket(rate=20, capacity=2)
+        start = time.perf_counter()
+        for _ in range(6):
+            await bucket.acquire()
+        return time.perf_counter() - start
+
+    # 2 token subito, gli altri 4 a 20 al secondo
+    assert asyncio.run(acquire_all()) >= 0.19
+
+def test_get_fixtures_uses_local_store(stub, make_api):
+    api = make_api()
+    matches = api.run(api.get_fixtures('Serie A', '2930'))
+    assert [(m['id'], m['home'], m['away'], m['type']) for m in matches] == [(101, 'Milan', 'Inter', 'FUTURE')]
+    # Seconda chiamata dall'archivio locale: nessuna richiesta in più
+    assert api.run(api.get_fixtures('Serie A', '2930')) == matches
+    assert len(stub.requests) == 1
@@ -0,0 +1,90 @@
+"""
+Probabilità in-play: tempo restante, coerenza con i mercati pre-partita del motore a inizio
+gara, risultato certo a fine 90', e un replay JSONL registrato (ReplayFeed) attraverso LiveTracker.
+"""
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from src import live, stats_engine
+
+def frame(ts, status, minute, home_goals, away_goals, fixture_id=7):
+    return {'ts': ts, 'data': {'errors': [], 'response': [{
+        'fixture': {'id': fixture_id, 'date': '2030-05-01T18:00:00+00:00',
+                    'status': {'short': status, 'elapsed': minute}},
+        'league': {'id': 135},
+        'teams': {'home': {'name': 'Milan'}, 'away': {'name': 'Inter'}},
+        'goals': {'home': home_goals, 'away': away_goals},
+    }]}}
+
+@pytest.mark.parametrize('minute, status, expected', [
+    (0, '1H', 1.0),
+    (46, '1H', (1 + live.HALF_MINUTES + live.SECOND_HALF_ADDED) / live.MATCH_MINUTES),   # recupero 1° tempo
+    (45, 'HT', (live.HALF_MINUTES + live.SECOND_HALF_ADDED) / live.MATCH_MINUTES),
+    (60, '2H', (30 + live.SECOND_HALF_ADDED) / live.MATCH_MINUTES),
+    (93, '2H', (live.SECOND_HALF_ADDED - 3) / live.MATCH_MINUTES),
+    (90, 'FT', 0.0),
+    (105, 'ET', 0.0),
+])
+def test_remaining_fraction(minute, status, expected):
+    assert live.remaining_fraction([minute], [status])[0] == pytest.approx(expected)
+
+def test_kickoff_matches_prematch_markets():
+    xg_home, xg_away = np.array([1.6, 0.9, 2.4]), np.array([1.1, 1.3, 0.7])
+    markets, lambs, mus = live.live_probabilities(xg_home, xg_away, [0] * 3, [0] * 3, [0] * 3, ['1H'] * 3)
+    prematch = stats_engine._market_probabilities_batch(stats_engine._score_matrix_batch(xg_home, xg_away))
+    np.testing.assert_allclose(lambs, xg_home)
+    np.testing.assert_allclose(mus, xg_away)
+    for key, probs in markets.items():
+        np.testing.assert_allclose(probs, prematch[key], atol=1e-12)
+
+def test_result_is_certain_after_full_time():
+    markets, lambs, mus = live.live_probabilities([1.5], [1.2], [90], [2], [1], ['FT'])
+    assert lambs[0] == 0 and mus[0] == 0
+    expected = {'1': 1, 'X': 0, '2': 0, 'Gol': 1, 'NoGol': 0, 'Over2.5': 1, 'Under2.5': 0}
+    for key, value in expected.items():
+        assert markets[key][0] == pytest.approx(value)
+
+def test_goal_moves_the_markets():
+    before, _, _ = live.live_probabilities([1.4], [1.4], [30], [0], [0], ['1H'])
+    after, _, _ = live.live_probabilities([1.4], [1.4], [30], [1], [0], ['1H'])
+    assert after['1'][0] > before['1'][0]
+    assert after['2'][0] < before['2'][0]
+    assert sum(after[k][0] for k in ('1', 'X', '2')) == pytest.approx(1.0)
+
+def test_replay_feed(tmp_path):
+    path = tmp_path / 'live.jsonl'
+    frames = [frame(0, '1H', 10, 0, 0), frame(60, '2H', 70, 1, 0), frame(120, 'ET', 95, 1, 0)]
+    path.write_text(''.join(json.dumps(f) + '\n' for f in frames))
+
+    updates = []
+    tracker = live.LiveTracker(prematch={7: (1.5, 1.1)})
+    matches = asyncio.run(live.run(tracker, live.ReplayFeed(str(path)), on_update=updates.append))
+
+    assert tracker.ticks == 3
+    assert [u[0]['score'] for u in updates] == ['0-0', '1-0', '1-0']
+    assert updates[0][0]['probabilities']['1'] < updates[1][0]['probabilities']['1'] < 100.0
+    # Dai tempi supplementari il risultato dei 90' è definitivo
+    assert matches[7]['probabilities']['1'] == 100.0
+    assert matches[7]['odds']['1'] == 1.0
+    assert matches[7]['xg_remaining'] == {'xg_home': 0.0, 'xg_away': 0.0}
+
+def test_replay_skips_matches_without_prematch(tmp_path):
+    path = tmp_path / 'live.jsonl'
+    path.write_text(json.dumps(frame(0, '1H', 10, 0, 0, fixture_id=8)) + '\n')
+    tracker = live.LiveTracker(prematch={7: (1.5, 1.1)})
+    assert asyncio.run(live.run(tracker, live.ReplayFeed(str(path)))) == {}
+
+def test_api_names_resolved_for_the_engine():
+    import pandas as pd
+
+    df = pd.DataFrame({'League': ['Serie A', 'Serie A', 'Premier League'],
+                       'HomeTeam': ['Milan', 'Inter', 'Man United'], 'AwayTeam': ['Inter', 'Milan', 'Wolves']})
+    tracker = live.LiveTracker(df=df)
+    matches = live.parse_live_fixtures(frame(0, '1H', 10, 0, 0)['data'])
+    matches[0]['home'] = 'AC Milan'
+    unknown = dict(matches[0], id=9, league_id=None, home='Manchester United', away='Wolverhampton Wanderers')
+    fixtures = tracker._engine_fixtures(matches + [unknown])
+    assert [(fx['home'], fx['away']) for fx in fixtures] == [('Milan', 'Inter'), ('Man United', 'Wolves')]